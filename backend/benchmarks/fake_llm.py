@@ -0,0 +1,60 @@
+import asyncio
+import hashlib
+import random
+import time
+from typing import AsyncIterator, Iterator
+
+WORDS = (
+    "the function returns a value when input is valid otherwise raises error "
+    "consider adding tests for edge cases refactor this module to reduce coupling "
+    "cache the result avoid global state handle exceptions explicitly document parameters"
+).split()
+
+class FakeMessage:
+    def __init__(self, content: str):
+        self.content = content
+
+class FakeChatModel:
+    # Deterministic stand-in for ChatOpenAI: same prompt -> same tokens,
+    # with configurable time-to-first-token, throughput and output length.
+    def __init__(self, model_name: str, temperature: float = 0.2, ttft: float = 0.3,
+                 tokens_per_second: float = 80.0, output_tokens: int = 400):
+        self.model_name = model_name
+        self.temperature = temperature
+        self.ttft = ttft
+        self.tokens_per_second = tokens_per_second
+        self.output_tokens = output_tokens
+
+    def _tokens(self, prompt_text: str) -> list:
+        seed = int.from_bytes(hashlib.sha256(prompt_text.encode("utf-8")).digest()[:8], "big")
+        rng = random.Random(seed)
+        tokens = []
+        for index in range(self.output_tokens):
+            word = rng.choice(WORDS)
+            tokens.append(word + ("\n" if index % 25 == 24 else " "))
+        return tokens
+
+    def _interval(self) -> float:
+        return 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    def invoke(self, prompt_text: str, **kwargs) -> FakeMessage:
+        tokens = self._tokens(prompt_text)
+        time.sleep(self.ttft + len(tokens) * self._interval())
+        return FakeMessage("".join(tokens))
+
+    def stream(self, prompt_text: str, **kwargs) -> Iterator[FakeMessage]:
+        time.sleep(self.ttft)
+        for token in self._tokens(prompt_text):
+            yield FakeMessage(token)
+            time.sleep(self._interval())
+
+    async def ainvoke(self, prompt_text: str, **kwargs) -> FakeMessage:
+        tokens = self._tokens(prompt_text)
+        await asyncio.sleep(self.ttft + len(tokens) * self._interval())
+        return FakeMessage("".join(tokens))
+
+    async def astream(self, prompt_text: str, **kwargs) -> AsyncIterator[FakeMessage]:
+        await asyncio.sleep(self.ttft)
+        for token in self._tokens(prompt_text):
+            yield FakeMessage(token)
+            await asyncio.sleep(self._interval())
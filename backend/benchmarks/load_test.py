@@ -0,0 +1,261 @@
+# Offline load test for the FastAPI app with a deterministic fake LLM.
+# Run from the backend directory:
+#   python -m benchmarks.load_test --concurrency 20 --requests 40 --output bench.json
+#   python -m benchmarks.load_test --baseline bench.json   # fail on p99 regressions
+import argparse
+import asyncio
+import io
+import json
+import os
+import resource
+import socket
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+from typing import List, Optional
+
+ENDPOINTS = ["single-review-stream", "single-review/pdf", "project-review-stream", "project-review/pdf"]
+PROJECT_ACTIONS = ["PROJECT_REVIEW", "PROJECT_EXPLAIN", "INTERVIEW", "DOCUMENTATION"]
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return round(ordered[index], 4)
+
+def current_rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def configure_environment(args):
+    # must run before the app modules are imported
+    state_dir = tempfile.mkdtemp(prefix="codexa_bench_")
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    os.environ["LLM_CACHE_ENABLED"] = "1" if args.cache else "0"
+    os.environ["LLM_CACHE_PATH"] = os.path.join(state_dir, "llm_cache.sqlite3")
+    os.environ["FILE_INDEX_ENABLED"] = "1" if args.cache else "0"
+    os.environ["FILE_INDEX_PATH"] = os.path.join(state_dir, "file_index.sqlite3")
+    os.environ["JOB_STORE_PATH"] = os.path.join(state_dir, "job_store.sqlite3")
+    os.environ.setdefault("MODEL_ROUTER_ENABLED", "0") # fake output never passes the quality checks
+    if not args.respect_limits:
+        unlimited = {"rpm": 10**9, "tpm": 10**12, "concurrency": 10**6}
+        os.environ["LLM_MODEL_LIMITS"] = json.dumps({"gpt-4o": unlimited, "gpt-4o-mini": unlimited})
+
+def install_fake_models(args):
+    import graph.nodes as single_nodes
+    import project_graph.nodes as project_nodes
+    from benchmarks.fake_llm import FakeChatModel
+
+    options = dict(ttft=args.ttft, tokens_per_second=args.tokens_per_second, output_tokens=args.output_tokens)
+    single_nodes.llm = FakeChatModel("gpt-4o", **options)
+    single_nodes.llm_small = FakeChatModel("gpt-4o-mini", **options)
+    project_nodes.llm1 = FakeChatModel("gpt-4o", **options)
+    project_nodes.llm2 = FakeChatModel("gpt-4o-mini", **options)
+
+class ServerThread:
+    def __init__(self, app, port: int):
+        import uvicorn
+
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        self.loop_lag: List[float] = []
+        self.peak_rss_mb = current_rss_mb()
+        self.thread = threading.Thread(target=lambda: asyncio.run(self._serve()), daemon=True)
+
+    async def _monitor(self, interval: float = 0.05):
+        # event-loop lag: how late a timer fires on the server's own loop
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(interval)
+            self.loop_lag.append(max(0.0, time.perf_counter() - started - interval))
+            self.peak_rss_mb = max(self.peak_rss_mb, current_rss_mb())
+
+    async def _serve(self):
+        monitor = asyncio.create_task(self._monitor())
+        try:
+            await self.server.serve()
+        finally:
+            monitor.cancel()
+
+    def start(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.05)
+
+    def stop(self):
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
+
+def unique_payload(payloads: dict, kind: str, index: int) -> bytes:
+    # Distinct content per request, so request coalescing and the PDF cache can't
+    # collapse concurrent requests into one generation or one render.
+    if kind == "single":
+        return f"# load-test request {index}\n".encode("utf-8") + payloads["single"]
+    buffer = io.BytesIO(payloads["zip"])
+    with zipfile.ZipFile(buffer, "a") as archive:
+        archive.writestr(f"sample/load_test_request_{index}.txt", f"load-test request {index}\n")
+    return buffer.getvalue()
+
+async def run_request(client, endpoint: str, index: int, payloads: dict, args) -> dict:
+    kind = "single" if endpoint.startswith("single") else "zip"
+    payload = unique_payload(payloads, kind, index) if args.unique_payloads else payloads[kind]
+    if kind == "single":
+        files = {"file": ("sample.py", payload, "text/x-python")}
+        data = {}
+    else:
+        files = {"file": ("sample.zip", payload, "application/zip")}
+        data = {"action": PROJECT_ACTIONS[index % len(PROJECT_ACTIONS)]}
+
+    started = time.perf_counter()
+    first_byte: Optional[float] = None
+    events = 0
+    size = 0
+    params = {"framing": args.framing} if endpoint.endswith("stream") else {}
+    async with client.stream("POST", f"/{endpoint}", files=files, data=data, params=params) as response:
+        async for chunk in response.aiter_bytes():
+            if first_byte is None:
+                first_byte = time.perf_counter() - started
+            size += len(chunk)
+            events += chunk.count(b"\n")
+        status = response.status_code
+    return {
+        "ok": status == 200,
+        "latency": time.perf_counter() - started,
+        "ttfb": first_byte if first_byte is not None else time.perf_counter() - started,
+        "events": events if endpoint.endswith("stream") else 0,
+        "bytes": size,
+    }
+
+async def run_endpoint(base_url: str, endpoint: str, args, payloads: dict, server: ServerThread) -> dict:
+    import httpx
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    lag_start = len(server.loop_lag)
+    results = []
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout) as client:
+        async def one(index: int):
+            async with semaphore:
+                try:
+                    results.append(await run_request(client, endpoint, index, payloads, args))
+                except Exception as e:
+                    results.append({"ok": False, "error": f"{type(e).__name__}: {e}"})
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(args.requests)))
+        elapsed = time.perf_counter() - started
+
+    ok = [r for r in results if r["ok"]]
+    latencies = [r["latency"] for r in ok]
+    ttfbs = [r["ttfb"] for r in ok]
+    lag = server.loop_lag[lag_start:]
+    events = sum(r["events"] for r in ok)
+    return {
+        "requests": len(results),
+        "errors": len(results) - len(ok),
+        "wall_seconds": round(elapsed, 3),
+        "throughput_rps": round(len(ok) / elapsed, 3) if elapsed else 0.0,
+        "latency_p50": percentile(latencies, 50),
+        "latency_p99": percentile(latencies, 99),
+        "ttfb_p50": percentile(ttfbs, 50),
+        "ttfb_p99": percentile(ttfbs, 99),
+        "events_per_second": round(events / elapsed, 1) if elapsed else 0.0,
+        "bytes_received": sum(r["bytes"] for r in ok),
+        "loop_lag_p50": percentile(lag, 50),
+        "loop_lag_p99": percentile(lag, 99),
+        "loop_lag_max": round(max(lag), 4) if lag else 0.0,
+    }
+
+def compare_with_baseline(report: dict, baseline_path: str, threshold: float) -> List[str]:
+    with open(baseline_path, encoding="utf-8") as baseline_file:
+        baseline = json.load(baseline_file)
+    regressions = []
+    for endpoint, stats in report["endpoints"].items():
+        previous = baseline.get("endpoints", {}).get(endpoint)
+        if not previous:
+            continue
+        for metric in ("latency_p50", "latency_p99", "ttfb_p99", "loop_lag_p99"):
+            before, after = previous.get(metric, 0.0), stats.get(metric, 0.0)
+            if before > 0 and after > before * (1 + threshold):
+                regressions.append(f"{endpoint} {metric}: {before:.4f}s -> {after:.4f}s")
+    return regressions
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline load test with a fake LLM")
+    parser.add_argument("--endpoints", nargs="+", default=ENDPOINTS, choices=ENDPOINTS)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=40, help="requests per endpoint")
+    parser.add_argument("--project-size", default="medium", choices=["small", "medium", "large"])
+    parser.add_argument("--ttft", type=float, default=0.3, help="fake time to first token, seconds")
+    parser.add_argument("--tokens-per-second", type=float, default=80.0)
+    parser.add_argument("--output-tokens", type=int, default=400)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--framing", default="token", choices=["token", "frame"], help="NDJSON framing for stream endpoints")
+    parser.add_argument(
+        "--unique-payloads", action=argparse.BooleanOptionalAction, default=True,
+        help="vary the upload per request (default); --no-unique-payloads measures coalescing and PDF cache hits instead",
+    )
+    parser.add_argument("--cache", action="store_true", help="keep the LLM cache and file index enabled")
+    parser.add_argument("--respect-limits", action="store_true", help="keep the scheduler's rate limits")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="previous results JSON to compare against")
+    parser.add_argument("--regression-threshold", type=float, default=0.2)
+    return parser.parse_args(argv)
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    configure_environment(args)
+    install_fake_models(args)
+
+    import main as api
+    from benchmarks.sample_projects import SAMPLE_SINGLE_FILE, build_sample_zip
+
+    payloads = {"single": SAMPLE_SINGLE_FILE.encode("utf-8"), "zip": build_sample_zip(args.project_size)}
+    port = free_port()
+    server = ServerThread(api.app, port)
+    server.start()
+
+    report = {
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "zip_bytes": len(payloads["zip"]),
+        "endpoints": {},
+    }
+    try:
+        for endpoint in args.endpoints:
+            stats = asyncio.run(run_endpoint(f"http://127.0.0.1:{port}", endpoint, args, payloads, server))
+            report["endpoints"][endpoint] = stats
+            print(f"{endpoint:24} p50={stats['latency_p50']:.3f}s p99={stats['latency_p99']:.3f}s "
+                  f"ttfb_p50={stats['ttfb_p50']:.3f}s ev/s={stats['events_per_second']:.0f} "
+                  f"lag_p99={stats['loop_lag_p99']:.4f}s errors={stats['errors']}")
+    finally:
+        server.stop()
+
+    report["process"] = {
+        "peak_rss_mb": round(max(server.peak_rss_mb, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024), 1),
+        "loop_lag_p99": percentile(server.loop_lag, 99),
+        "loop_lag_max": round(max(server.loop_lag), 4) if server.loop_lag else 0.0,
+    }
+    with open(args.output, "w", encoding="utf-8") as output_file:
+        json.dump(report, output_file, indent=2)
+    print(f"peak RSS {report['process']['peak_rss_mb']} MB, results written to {args.output}")
+
+    if args.baseline:
+        regressions = compare_with_baseline(report, args.baseline, args.regression_threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
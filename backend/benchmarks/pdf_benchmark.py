@@ -0,0 +1,122 @@
+# PDF rendering benchmark for 1 MB reports: the old single-flowable layout
+# against utils/pdf_renderer (chunked flowables, process pool, byte cache).
+# Run from the backend directory:
+#   python -m benchmarks.pdf_benchmark --size-kb 1024 --output pdf_bench.json
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from typing import List
+
+def sample_report(size_bytes: int) -> str:
+    # review-style prose interleaved with code, like a long project report
+    block = (
+        "### Issue: unbounded retry loop in fetch_orders()\n"
+        "Severity: High\n"
+        "The retry loop never backs off, so a failing upstream gets hammered. "
+        "Cap attempts and add jitter. Avoid <generic> & \"quoted\" edge cases.\n"
+        "```python\n"
+        "def fetch_orders(client, attempts=5):\n"
+        "    for attempt in range(attempts):\n"
+        "        try:\n"
+        "            return client.get('/orders', timeout=10)\n"
+        "        except TimeoutError:\n"
+        "            time.sleep(2 ** attempt + random.random())\n"
+        "    raise RuntimeError('orders unavailable')\n"
+        "```\n\n"
+    )
+    return (block * (size_bytes // len(block) + 1))[:size_bytes]
+
+def render_legacy(title: str, content: str) -> bytes:
+    # the previous generate_project_pdf layout: one Preformatted for the whole report
+    import io
+    from xml.sax.saxutils import escape
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+    from reportlab.platypus import Paragraph, Preformatted, SimpleDocTemplate, Spacer
+
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=40, leftMargin=40, topMargin=40, bottomMargin=40)
+    styles = getSampleStyleSheet()
+    code_style = ParagraphStyle("CodeStyle", fontName="Courier", fontSize=9, leading=12)
+    doc.build([Paragraph(escape(title), styles["Title"]), Spacer(1, 20), Preformatted(escape(content), code_style)])
+    return buffer.getvalue()
+
+async def measure_loop_lag(coroutine, interval: float = 0.01) -> dict:
+    # how late a timer fires on the event loop while the render runs
+    lags: List[float] = []
+    done = asyncio.Event()
+
+    async def monitor():
+        while not done.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(interval)
+            lags.append(max(0.0, time.perf_counter() - started - interval))
+
+    watcher = asyncio.create_task(monitor())
+    started = time.perf_counter()
+    try:
+        data = await coroutine
+    finally:
+        done.set()
+        await watcher
+    return {
+        "seconds": round(time.perf_counter() - started, 4),
+        "bytes": len(data),
+        "loop_lag_max": round(max(lags), 4) if lags else 0.0,
+        "loop_lag_mean": round(statistics.mean(lags), 4) if lags else 0.0,
+    }
+
+async def run(args) -> dict:
+    from utils import pdf_renderer
+    from utils.project_pdf_generator import render_project_pdf
+
+    content = sample_report(args.size_kb * 1024)
+    results = {"config": {"size_kb": args.size_kb, "processes": pdf_renderer.PDF_RENDER_PROCESSES}}
+
+    if not args.skip_legacy:
+        results["legacy_thread"] = await measure_loop_lag(asyncio.to_thread(render_legacy, "Benchmark", content))
+    results["chunked_thread"] = await measure_loop_lag(asyncio.to_thread(render_project_pdf, "Benchmark", content))
+
+    # the first pooled call pays for spawning the workers
+    warmup = await measure_loop_lag(pdf_renderer.render_pdf("pdf.benchmark", render_project_pdf, "Warm-up", content))
+    results["pool_warmup_seconds"] = warmup["seconds"]
+    pooled = [
+        await measure_loop_lag(pdf_renderer.render_pdf("pdf.benchmark", render_project_pdf, f"Benchmark {run}", content))
+        for run in range(args.runs)
+    ]
+    results["chunked_pool"] = {
+        "seconds_median": round(statistics.median(r["seconds"] for r in pooled), 4),
+        "loop_lag_max": max(r["loop_lag_max"] for r in pooled),
+        "bytes": pooled[0]["bytes"],
+    }
+    results["cache_hit"] = await measure_loop_lag(pdf_renderer.render_pdf("pdf.benchmark", render_project_pdf, "Benchmark 0", content))
+    results["cache"] = pdf_renderer.pdf_cache.stats()
+    pdf_renderer.shutdown_render_pool()
+    return results
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="PDF rendering benchmark")
+    parser.add_argument("--size-kb", type=int, default=1024, help="report size in KB")
+    parser.add_argument("--runs", type=int, default=3, help="uncached pooled renders to time")
+    parser.add_argument("--skip-legacy", action="store_true", help="skip the old single-flowable layout")
+    parser.add_argument("--output", default="pdf_benchmark_results.json")
+    return parser.parse_args(argv)
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    results = asyncio.run(run(args))
+    for name in ("legacy_thread", "chunked_thread", "chunked_pool", "cache_hit"):
+        if name in results:
+            stats = results[name]
+            seconds = stats.get("seconds", stats.get("seconds_median"))
+            print(f"{name:16} {seconds:.3f}s loop_lag_max={stats['loop_lag_max']:.4f}s")
+    with open(args.output, "w", encoding="utf-8") as output_file:
+        json.dump(results, output_file, indent=2)
+    print(f"results written to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+# Per-request memory for a large project upload: the old dict-of-str
+# extraction and list-join prompt rendering against utils/project_store.
+# Each variant runs in a fresh interpreter so peak RSS is its own.
+# Run from the backend directory:
+#   python -m benchmarks.project_memory --size-mb 100 --output project_memory.json
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+
+VARIANTS = ["legacy", "project_store"]
+
+def module_source(rng: random.Random, index: int, target_bytes: int) -> str:
+    # plausible Python: imports of sibling modules, functions, some non-ASCII comments
+    lines = [f"import pkg{rng.randrange(20)}.mod{rng.randrange(max(1, index))} as dep", "import os", ""]
+    accent = index % 10 == 0 # a tenth of the files widen to 2-byte str storage
+    size = 0
+    function = 0
+    while size < target_bytes:
+        body = [
+            f"def handler_{index}_{function}(request, limit={rng.randrange(100)}):",
+            f"    # {'validé ' if accent else ''}check the request before dispatching",
+            "    total = 0",
+            f"    for item in request.items[:limit]:",
+            f"        total += dep.score(item) * {rng.random():.4f}",
+            "    return total",
+            "",
+        ]
+        lines.extend(body)
+        size += sum(len(line) + 1 for line in body)
+        function += 1
+    return "\n".join(lines)
+
+def build_archive(path: str, size_bytes: int, file_bytes: int = 20_000):
+    rng = random.Random(7)
+    written = 0
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_STORED) as archive: # archive size == source size
+        index = 0
+        while written < size_bytes:
+            source = module_source(rng, index, file_bytes)
+            archive.writestr(f"project/pkg{index % 20}/mod{index}.py", source)
+            written += len(source.encode("utf-8"))
+            index += 1
+
+def legacy_extract(zip_source) -> dict:
+    # the previous extract_project_files_from_zip: one decoded str per file
+    from main import read_zip_member
+    files = {}
+    with zipfile.ZipFile(zip_source, "r") as zip_file:
+        for info in zip_file.infolist():
+            data = read_zip_member(zip_file, info, 1 << 40)
+            content = data.decode("utf-8", errors="ignore")
+            if content.strip():
+                files[info.filename] = content
+    return files
+
+def legacy_stringify(project_files) -> str:
+    output = []
+    for name, content in project_files.items():
+        output.append(f"\nFile:{name}\n{content}\n")
+    return "\n".join(output)
+
+def status_mb(field: str) -> float:
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith(field + ":"):
+                return round(int(line.split()[1]) / 1024, 1)
+    return 0.0
+
+def measure(variant: str, archive_path: str) -> dict:
+    import main as api
+    from utils.chunking import estimate_tokens
+    from utils.file_ranking import select_project_files
+    from utils.prompt_compaction import compact_project_files
+    from utils.project_store import render_project_files
+    from utils.run_log import run_key
+
+    baseline_rss = status_mb("VmRSS")
+    stages = {}
+    tracemalloc.start()
+
+    def stage(name, function, *args):
+        started = time.perf_counter()
+        result = function(*args)
+        stages[name] = round(time.perf_counter() - started, 3)
+        return result
+
+    with open(archive_path, "rb") as upload: # Starlette hands endpoints a spooled file like this
+        if variant == "legacy":
+            files = stage("extract", legacy_extract, upload)
+            stage("run_key", lambda: run_key("project", "PROJECT_REVIEW", files=files.items()))
+            stage("prompt_tokens", lambda: sum(estimate_tokens(content) for content in files.values()))
+        else:
+            files = stage("extract", api.extract_project_files_from_zip, upload)
+            stage("run_key", lambda: run_key("project", "PROJECT_REVIEW", files=files.raw_items()))
+            stage("prompt_tokens", api.project_prompt_tokens, files)
+    held_after_extract = tracemalloc.get_traced_memory()[0]
+
+    selection = stage("rank_select", select_project_files, files)
+    compacted = stage("compact", compact_project_files, selection.verbatim)
+    text_files = {name: source.text for name, source in compacted.items()}
+    render = legacy_stringify if variant == "legacy" else render_project_files
+    context = stage("render_context", render, text_files)
+    held, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "files": len(files),
+        "context_chars": len(context),
+        "held_after_extract_mb": round(held_after_extract / 2**20, 1),
+        "held_while_streaming_mb": round(held / 2**20, 1), # what the request keeps for its lifetime
+        "python_peak_mb": round(peak / 2**20, 1),
+        "rss_growth_mb": round(status_mb("VmHWM") - baseline_rss, 1),
+        "rss_anon_mb": status_mb("RssAnon"),
+        "rss_file_mb": status_mb("RssFile"), # mmap'd project pages the kernel can drop
+        "seconds": stages,
+    }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Per-request memory for a large project upload")
+    parser.add_argument("--size-mb", type=int, default=100, help="archive size in MB (stored, so equal to the source size)")
+    parser.add_argument("--archive", help="existing ZIP to measure instead of a generated one")
+    parser.add_argument("--variant", choices=VARIANTS, help="measure one variant in this process")
+    parser.add_argument("--output", default="project_memory_results.json")
+    return parser.parse_args(argv)
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    os.environ.setdefault("MAX_ZIP_UNCOMPRESSED_BYTES", str(max(256, 2 * args.size_mb) * 1024 * 1024))
+    if args.variant:
+        print(json.dumps(measure(args.variant, args.archive)))
+        return 0
+
+    with tempfile.TemporaryDirectory() as state_dir:
+        environment = {
+            **os.environ,
+            "JOB_STORE_PATH": os.path.join(state_dir, "job_store.sqlite3"),
+            "LLM_CACHE_PATH": os.path.join(state_dir, "llm_cache.sqlite3"),
+            "FILE_INDEX_PATH": os.path.join(state_dir, "file_index.sqlite3"),
+        }
+        archive = args.archive
+        if not archive:
+            archive = os.path.join(state_dir, "project.zip")
+            build_archive(archive, args.size_mb * 1024 * 1024)
+        results = {"config": {"archive_mb": round(os.path.getsize(archive) / 2**20, 1)}}
+        for variant in VARIANTS:
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.project_memory", "--variant", variant, "--archive", archive],
+                env=environment, check=True, capture_output=True, text=True,
+            ).stdout
+            results[variant] = json.loads(output.strip().splitlines()[-1])
+            stats = results[variant]
+            print(
+                f"{variant:14} held={stats['held_while_streaming_mb']:.1f}MB python_peak={stats['python_peak_mb']:.1f}MB "
+                f"rss_growth={stats['rss_growth_mb']:.1f}MB extract={stats['seconds']['extract']:.2f}s"
+            )
+
+    with open(args.output, "w", encoding="utf-8") as output_file:
+        json.dump(results, output_file, indent=2)
+    print(f"results written to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
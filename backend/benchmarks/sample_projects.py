@@ -0,0 +1,57 @@
+import io
+import random
+import zipfile
+from typing import Dict
+
+PROJECT_SIZES = {
+    "small": 20,
+    "medium": 200,
+    "large": 2000,
+} # files per sample ZIP
+
+def _python_module(rng: random.Random, index: int, total: int) -> str:
+    imports = "\n".join(
+        f"from app.pkg{dep % 10}.mod{dep} import handler_{dep}"
+        for dep in rng.sample(range(total), min(4, total)) if dep != index
+    )
+    functions = "\n\n".join(
+        f"def handler_{index}_{n}(payload):\n"
+        f"    if not payload:\n        raise ValueError('empty payload')\n"
+        f"    result = {{}}\n    for key, value in payload.items():\n"
+        f"        result[key] = str(value).strip()\n    return result"
+        for n in range(rng.randint(3, 12))
+    )
+    return f'"""Module {index}."""\nimport os\n{imports}\n\n{functions}\n\nhandler_{index} = handler_{index}_0\n'
+
+def _js_module(rng: random.Random, index: int) -> str:
+    body = "\n".join(
+        f"export function render{n}(props) {{\n  return `<div>${{props.value{n}}}</div>`;\n}}"
+        for n in range(rng.randint(3, 10))
+    )
+    return f"import React from 'react';\nimport {{ api }} from './api';\n\n{body}\n"
+
+def build_sample_project(size: str, seed: int = 7) -> Dict[str, str]:
+    rng = random.Random(seed)
+    total = PROJECT_SIZES[size]
+    files: Dict[str, str] = {
+        "sample/README.md": "# Sample service\n\nSynthetic project used for load testing.\n",
+        "sample/requirements.txt": "fastapi\nuvicorn\n",
+        "sample/app/main.py": "from app.pkg0.mod0 import handler_0\n\nprint(handler_0({'a': 1}))\n",
+        "sample/web/src/api.js": "export const api = (path) => fetch(path).then((r) => r.json());\n",
+        "sample/web/package-lock.json": "{" + ",".join(f'"dep{n}": "1.0.{n}"' for n in range(2000)) + "}",
+    }
+    for index in range(total):
+        if index % 4 == 3:
+            files[f"sample/web/src/components/Component{index}.jsx"] = _js_module(rng, index)
+        else:
+            files[f"sample/app/pkg{index % 10}/mod{index}.py"] = _python_module(rng, index, total)
+    return files
+
+def build_sample_zip(size: str, seed: int = 7) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, content in build_sample_project(size, seed).items():
+            archive.writestr(name, content)
+    return buffer.getvalue()
+
+SAMPLE_SINGLE_FILE = _python_module(random.Random(3), 1, 50) * 4 # ~ a few hundred lines
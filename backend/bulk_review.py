@@ -0,0 +1,223 @@
+# Offline batch review of local repositories, for nightly audits.
+# Run from the backend directory:
+#   python bulk_review.py ~/src/repo-a ~/src/repo-b --output audit.jsonl --concurrency 8
+#   python bulk_review.py ~/src/repo-a --output audit.jsonl --project-actions PROJECT_REVIEW DOCUMENTATION
+# Re-running with the same --output resumes: items already reviewed with
+# unchanged content are skipped.
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import json
+import os
+import sys
+import time
+from typing import Dict, List, Mapping, NamedTuple, Optional, Set
+
+SKIPPED_DIRS = {".git", "node_modules", "__pycache__", ".venv", "venv", ".tox", ".mypy_cache", ".pytest_cache"}
+
+class WorkItem(NamedTuple):
+    kind: str # "file" or "project"
+    repo: str
+    path: str # relative to the repo; "" for project items
+    action: str # project action, "" for files
+    key: str # identity in the checkpoint: kind, location and content hash
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))], 3)
+
+def item_key(kind: str, repo: str, path: str, action: str, digest: str) -> str:
+    return hashlib.sha256("\x00".join((kind, repo, path, action, digest)).encode("utf-8")).hexdigest()
+
+def walk_repository(repo: str, max_file_bytes: int):
+    # same file filter and container as ZIP uploads, read straight from disk
+    from main import is_text_file
+    from utils.project_store import ProjectFiles
+
+    files = ProjectFiles()
+    for root, dirs, names in os.walk(repo):
+        dirs[:] = sorted(d for d in dirs if d not in SKIPPED_DIRS)
+        for name in sorted(names):
+            path = os.path.join(root, name)
+            relative = os.path.relpath(path, repo).replace(os.sep, "/")
+            if not is_text_file(relative) or os.path.getsize(path) > max_file_bytes:
+                continue
+            with open(path, "rb") as source:
+                files.add_source(relative, source.read())
+    return files.seal()
+
+def plan_work(repos: List[str], args) -> tuple:
+    from utils.retrieval_index import project_hash
+
+    items: List[WorkItem] = []
+    sources: Dict[str, Mapping[str, str]] = {}
+    for repo in repos:
+        repo = os.path.abspath(repo)
+        files = walk_repository(repo, args.max_file_bytes)
+        sources[repo] = files
+        if not args.no_files:
+            items += [
+                WorkItem("file", repo, path, "", item_key("file", repo, path, "", hashlib.sha256(content).hexdigest()))
+                for path, content in files.raw_items()
+            ]
+        if files and args.project_actions:
+            digest = project_hash(files)
+            items += [WorkItem("project", repo, "", action, item_key("project", repo, "", action, digest)) for action in args.project_actions]
+    return items, sources
+
+def load_checkpoint(path: str) -> Set[str]:
+    # the results file is the checkpoint: every line with status "ok" is done.
+    # A torn last line from an interrupted run is cut off before appending.
+    done: Set[str] = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "rb+") as results:
+        data = results.read()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            results.truncate(end)
+    for line in data[:end].splitlines():
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if record.get("status") == "ok" and record.get("key"):
+            done.add(record["key"])
+    return done
+
+async def review_file(item: WorkItem, content: str, skip_clean: bool = False) -> dict:
+    from graph.nodes import astream_single_file_pipeline
+    from main import SINGLE_FILE_OUTPUT_KEYS, collect_job_output
+    from utils.prompt_compaction import detect_language
+
+    state = {"raw_code": content, "language": detect_language(item.path, content), "file_name": item.path, "skip_clean": skip_clean}
+    outputs: Dict[str, str] = {}
+    async with contextlib.aclosing(astream_single_file_pipeline(state)) as events:
+        async for event in events:
+            collect_job_output(outputs, event, SINGLE_FILE_OUTPUT_KEYS)
+    return {**outputs, "static_score": state.get("static_score", 0), "model_review": state.get("needs_review", True)}
+
+async def review_project(item: WorkItem, files: Mapping[str, str]) -> dict:
+    from project_graph.nodes import stream_project_pipeline
+    from main import collect_job_output
+
+    outputs: Dict[str, str] = {}
+    state = {"project_files": files, "user_request": item.action}
+    async with contextlib.aclosing(stream_project_pipeline(state)) as events:
+        async for event in events:
+            collect_job_output(outputs, event, {item.action: item.action})
+    return {"output": outputs.get(item.action, ""), "files": len(files)}
+
+def token_usage(summary: Optional[dict]) -> Dict[str, int]:
+    stages = (summary or {}).values()
+    return {
+        "prompt_tokens": sum(stage["prompt_tokens"] for stage in stages),
+        "output_tokens": sum(stage["output_tokens"] for stage in stages),
+    }
+
+async def run(args) -> dict:
+    from utils.llm_scheduler import PRIORITY_BATCH, llm_priority
+    from utils.metrics import request_timing_summary, start_request_timings
+
+    items, sources = plan_work(args.repos, args)
+    done = load_checkpoint(args.output)
+    pending = [item for item in items if item.key not in done]
+    print(f"{len(items)} items, {len(items) - len(pending)} already reviewed, {len(pending)} to go", file=sys.stderr)
+
+    queue: asyncio.Queue = asyncio.Queue()
+    for item in pending:
+        queue.put_nowait(item)
+    latencies: List[float] = []
+    totals = {"ok": 0, "error": 0, "prompt_tokens": 0, "output_tokens": 0}
+    started = time.perf_counter()
+
+    with open(args.output, "a", encoding="utf-8") as results:
+        def record(line: dict):
+            results.write(json.dumps(line, ensure_ascii=False) + "\n")
+            results.flush() # each finished item is durable before the next one starts
+            os.fsync(results.fileno())
+
+        async def worker():
+            llm_priority.set(PRIORITY_BATCH) # queue behind any interactive traffic sharing the limits
+            while True:
+                try:
+                    item = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                item_started = time.perf_counter()
+                start_request_timings()
+                line = {"type": item.kind, "key": item.key, "repo": item.repo, "path": item.path, "action": item.action}
+                try:
+                    if item.kind == "file":
+                        result = await review_file(item, sources[item.repo][item.path], args.skip_clean)
+                    else:
+                        result = await review_project(item, sources[item.repo])
+                    line.update(status="ok", **result)
+                except Exception as e:
+                    line.update(status="error", error=f"{type(e).__name__}: {e}") # retried on the next run
+                seconds = time.perf_counter() - item_started
+                usage = token_usage(request_timing_summary())
+                line.update(seconds=round(seconds, 3), **usage)
+                record(line)
+                latencies.append(seconds)
+                totals[line["status"]] += 1
+                totals["prompt_tokens"] += usage["prompt_tokens"]
+                totals["output_tokens"] += usage["output_tokens"]
+                if args.progress:
+                    print(f"[{totals['ok'] + totals['error']}/{len(pending)}] {line['status']} {item.kind} {item.path or item.action} {seconds:.1f}s", file=sys.stderr)
+
+        await asyncio.gather(*(worker() for _ in range(max(1, args.concurrency))))
+
+        elapsed = time.perf_counter() - started
+        summary = {
+            "type": "summary",
+            "items": len(items),
+            "resumed_skipped": len(items) - len(pending),
+            "reviewed": totals["ok"],
+            "errors": totals["error"],
+            "elapsed_seconds": round(elapsed, 2),
+            "items_per_minute": round(60 * (totals["ok"] + totals["error"]) / elapsed, 1) if elapsed > 0 else 0.0,
+            "latency_p50": percentile(latencies, 50),
+            "latency_p95": percentile(latencies, 95),
+            "prompt_tokens": totals["prompt_tokens"],
+            "output_tokens": totals["output_tokens"],
+            "concurrency": args.concurrency,
+        }
+        record(summary)
+    return summary
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Review local repositories offline, with resumable JSONL output")
+    parser.add_argument("repos", nargs="+", help="repository directories to walk")
+    parser.add_argument("--output", default="bulk_review.jsonl", help="results JSONL; doubles as the resume checkpoint")
+    parser.add_argument("--concurrency", type=int, default=4, help="items reviewed at once")
+    parser.add_argument("--project-actions", nargs="*", default=[], help="project actions to run once per repository")
+    parser.add_argument("--skip-clean", action="store_true", help="no model calls for files without static findings")
+    parser.add_argument("--no-files", action="store_true", help="skip the per-file reviews")
+    parser.add_argument("--max-file-bytes", type=int, default=1024 * 1024, help="larger files are not reviewed")
+    parser.add_argument("--progress", action="store_true", help="print a line per finished item")
+    args = parser.parse_args(argv)
+    missing = [repo for repo in args.repos if not os.path.isdir(repo)]
+    if missing:
+        parser.error(f"not a directory: {', '.join(missing)}")
+    from main import ALLOWED_ACTIONS
+    invalid = [action for action in args.project_actions if action not in ALLOWED_ACTIONS or action == "QUESTION"]
+    if invalid:
+        parser.error(f"invalid project action: {', '.join(invalid)}")
+    return args
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    try:
+        summary = asyncio.run(run(args))
+    except KeyboardInterrupt:
+        print(f"interrupted; run again with --output {args.output} to resume", file=sys.stderr)
+        return 130
+    print(json.dumps(summary, indent=2))
+    return 1 if summary["errors"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
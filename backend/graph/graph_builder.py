@@ -5,18 +5,25 @@ from graph.nodes import *
 
 graph = StateGraph(CodeState)
 
-graph.add_node("code_parser", code_parser_node)
-graph.add_node("code_reviewer", code_reviewer_node)
-graph.add_node("refactored_code", refactored_code)
-graph.add_node("test_code", test_code)
+for name, node in SINGLE_FILE_NODES.items():
+    graph.add_node(name, node)
+graph.add_node("compaction", compaction_node)
+graph.add_node("static_analysis", static_analysis_node)
 graph.add_node("human_approval", human_approval)
+graph.add_edge(START, "compaction")
+graph.add_edge("compaction", "static_analysis")
 
-graph.set_entry_point("code_parser")
+# review and test fan out after the local analysis; refactor waits on review
+downstream = set()
+for name, (_, _, _, upstream) in SINGLE_FILE_STAGES.items():
+    if not upstream:
+        graph.add_edge("static_analysis", name)
+    for dep in upstream:
+        graph.add_edge(dep, name)
+        downstream.add(dep)
 
-graph.add_edge(START, "code_parser")
-graph.add_edge("code_parser", "code_reviewer")
-graph.add_edge("code_reviewer", "refactored_code")
-graph.add_edge("refactored_code", "test_code")
-graph.add_edge("test_code", END)
+for name in SINGLE_FILE_STAGES:
+    if name not in downstream:
+        graph.add_edge(name, END)
 
-Final = graph.compile()
\ No newline at end of file
+Final = graph.compile()
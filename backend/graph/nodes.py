@@ -1,104 +1,459 @@
-from pathlib import Path
+import asyncio
+import contextvars
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import PromptTemplate
 from dotenv import load_dotenv
+from utils.llm_cache import cached_astream
+from utils.metrics import timed, timed_astream
+from utils.model_router import Escalation, cascade_astream, cascade_invoke, escalation_event, model_router
+from utils.chunking import estimate_tokens
+from utils.source_chunks import SourcePlan, plan_source_chunks
+from utils.static_analysis import StaticReport, analyze_source, focused_source, summarize_report
+from utils.prompt_compaction import LineReferenceMapper, compact_source, compaction_stats, detect_language, invert_line_map, map_line_references
+from utils.diff_hunks import FileChanges, describe_lines, render_regions
 
 load_dotenv()
 
 llm = ChatOpenAI(model="gpt-4o", temperature=0.2) # uses OpenAI model
+llm_small = ChatOpenAI(model="gpt-4o-mini", temperature=0.2) # tried first, see utils/model_router.py
+
+SINGLE_FILE_CHUNK_TOKENS = int(os.getenv("SINGLE_FILE_CHUNK_TOKENS", "8000")) # above this, review in segments
+CHUNK_CONCURRENCY = int(os.getenv("SINGLE_FILE_CHUNK_CONCURRENCY", "6"))
+DIFF_CONCURRENCY = int(os.getenv("DIFF_REVIEW_CONCURRENCY", "6")) # changed files reviewed at once
 
 def load_prompt(path, encoding="utf-8"):
     return open(path, encoding=encoding).read()
 
-PARSER_PROMPT = PromptTemplate.from_template(load_prompt("prompts/parser.txt")) # parser prompt
 REVIEWER_PROMPT = PromptTemplate.from_template(load_prompt("prompts/reviewer.txt"))
 REFACTOR_PROMPT = PromptTemplate.from_template(load_prompt("prompts/refactor_code.txt"))
 TEST_PROMPT = PromptTemplate.from_template(load_prompt("prompts/test.txt"))
+CHUNK_CONTEXT_PROMPT = PromptTemplate.from_template(load_prompt("prompts/chunk_context.txt"))
+STATIC_CONTEXT_PROMPT = PromptTemplate.from_template(load_prompt("prompts/static_context.txt"))
+DIFF_CONTEXT_PROMPT = PromptTemplate.from_template(load_prompt("prompts/diff_context.txt"))
 
-def code_parser_node(CodeState):
-    prompt = PARSER_PROMPT.format(code=CodeState["raw_code"])
-    result = llm.invoke(prompt)
-    CodeState["parsed_summary"] = result.content
-    return CodeState
+FOCUS_NOTE = "Only the hotspot excerpts are included below, each headed by its line range in the full file. The rest of the file was checked locally and is out of scope."
 
-def code_reviewer_node(CodeState):
-    prompt = REVIEWER_PROMPT.format(
-        code=CodeState["raw_code"],
+def review_source(CodeState) -> str:
+    # hotspot excerpts, else the compacted file, else the file as uploaded
+    return CodeState.get("review_focus") or CodeState.get("compact_code") or CodeState["raw_code"]
+
+def review_line_map(CodeState) -> List[int]:
+    # only whole-file compacted prompts number lines differently from the upload
+    return [] if CodeState.get("review_focus") else CodeState.get("line_map") or []
+
+def static_context(CodeState):
+    # metrics summary, plus a note when the code below is hotspots only
+    if not CodeState.get("parsed_summary"):
+        return ""
+    summary = CodeState["parsed_summary"]
+    line_map = review_line_map(CodeState)
+    if line_map: # the model sees compacted numbering, so the summary must too
+        summary = map_line_references(summary, invert_line_map(line_map, CodeState["raw_code"].count("\n") + 1))
+    return STATIC_CONTEXT_PROMPT.format(
+        summary=summary,
+        scope=FOCUS_NOTE if CodeState.get("review_focus") else ""
+    )
+
+def reviewer_prompt(CodeState):
+    return static_context(CodeState) + REVIEWER_PROMPT.format(
+        code=review_source(CodeState),
         language=CodeState["language"]
     )
-    result = llm.invoke(prompt)
-    CodeState["review_code"] = result.content
-    return CodeState
 
-def refactored_code(CodeState):
-    prompt = REFACTOR_PROMPT.format(
+def refactor_prompt(CodeState):
+    return REFACTOR_PROMPT.format(
         code=CodeState["raw_code"],
         review=CodeState["review_code"],
         language=CodeState["language"]
     )
-    result = llm.invoke(prompt)
-    CodeState["refactored_code"] = result.content
-    return CodeState
 
-def test_code(CodeState):
-    prompt = TEST_PROMPT.format(
-        code=CodeState["refactored_code"],
+def test_prompt(CodeState):
+    return static_context(CodeState) + TEST_PROMPT.format(
+        code=review_source(CodeState),
         language=CodeState["language"]
     )
-    result = llm.invoke(prompt)
-    CodeState["test_report"] = result.content
-    return CodeState
+
+@functools.lru_cache(maxsize=64)
+def _static_report(raw_code: str, file_name: str) -> StaticReport:
+    return analyze_source(raw_code, file_name)
+
+@functools.lru_cache(maxsize=16)
+def _source_plan(raw_code: str, file_name: str) -> SourcePlan:
+    return plan_source_chunks(raw_code, file_name)
+
+def plan_single_file(CodeState) -> Optional[SourcePlan]:
+    # very large files are reviewed, tested and refactored per segment
+    if estimate_tokens(CodeState["raw_code"]) <= SINGLE_FILE_CHUNK_TOKENS:
+        return None
+    plan = _source_plan(CodeState["raw_code"], CodeState.get("file_name") or "")
+    return plan if len(plan.chunks) > 1 else None
+
+def chunk_prompt(build_prompt, CodeState, plan: SourcePlan, index: int, upstream: Optional[dict] = None) -> str:
+    chunk = plan.chunks[index]
+    context = CHUNK_CONTEXT_PROMPT.format(
+        language=CodeState["language"],
+        file_name=CodeState.get("file_name") or "uploaded file",
+        total_lines=plan.total_lines,
+        start_line=chunk.start_line,
+        end_line=chunk.end_line,
+        outline=plan.outline,
+    )
+    segment = {"raw_code": chunk.text, "review_focus": "", "compact_code": "", "line_map": []}
+    return context + build_prompt({**CodeState, **segment, **(upstream or {})})
+
+def chunk_prefix(stage: str, plan: SourcePlan, index: int, previous: str) -> str:
+    # report sections are labelled; refactored segments are spliced back as-is
+    if stage == "refactored_code":
+        return "\n" if previous and not previous.endswith("\n") else ""
+    chunk = plan.chunks[index]
+    return ("\n\n" if previous else "") + f"Lines {chunk.start_line}-{chunk.end_line}\n"
+
+def stitch_chunks(stage: str, plan: SourcePlan, outputs: List[str]) -> str:
+    text = ""
+    for index, output in enumerate(outputs):
+        text += chunk_prefix(stage, plan, index, text) + output
+    return text
+
+def single_file_model(raw_code: str) -> ChatOpenAI:
+    # the model a request starts on, for admission control
+    return model_router.route("review", estimate_tokens(raw_code), llm_small, llm).models[0]
+
+def _invoke_stage(stage: str, CodeState, prompt_text: str, source: str) -> str:
+    task = SINGLE_FILE_STAGES[stage][2]
+    return cascade_invoke(task, prompt_text, llm_small, llm, CodeState.get("static_score", 0), source)
+
+def _invoke_chunks(stage: str, CodeState, plan: SourcePlan, upstream: Optional[List[dict]] = None) -> List[str]:
+    build_prompt = SINGLE_FILE_STAGES[stage][0]
+    with ThreadPoolExecutor(max_workers=CHUNK_CONCURRENCY) as pool:
+        futures = [
+            pool.submit(
+                contextvars.copy_context().run,
+                _invoke_stage,
+                stage,
+                CodeState,
+                chunk_prompt(build_prompt, CodeState, plan, index, upstream[index] if upstream else None),
+                chunk.text,
+            )
+            for index, chunk in enumerate(plan.chunks)
+        ]
+        return [future.result() for future in futures]
+
+# Trailing whitespace, blank-line runs, banners, license headers and base64
+# blobs are dropped from what review and test see; line_map maps the
+# model's line references back to the upload.
+@timed("node.compaction")
+def compaction_node(CodeState):
+    compacted = compact_source(CodeState["raw_code"], CodeState.get("file_name") or "")
+    return {
+        "compact_code": compacted.text,
+        "line_map": compacted.line_map,
+        "compaction": compaction_stats.record(compacted.original_tokens, compacted.compacted_tokens),
+    }
+
+# Local stand-in for the old LLM summary: metrics and smells from ast (or
+# brace heuristics), the hotspot excerpt the model should focus on, and,
+# when the request opted in with skip_clean, whether the file is worth a
+# model review at all.
+@timed("node.static_analysis")
+def static_analysis_node(CodeState):
+    report = _static_report(CodeState["raw_code"], CodeState.get("file_name") or "")
+    return {
+        "parsed_summary": summarize_report(report),
+        "review_focus": focused_source(CodeState["raw_code"], report) or "",
+        "needs_review": report.needs_review or not CodeState.get("skip_clean", False),
+        "static_score": report.score, # routes complex files straight to the large model
+    }
+
+def skipped_output(stage: str, CodeState) -> Optional[str]:
+    # skip_clean files below the static threshold get a local result instead of a model call
+    if CodeState.get("needs_review", True):
+        return None
+    if stage == "code_reviewer":
+        return "No model review: static analysis found nothing above the review thresholds.\n\n" + CodeState["parsed_summary"]
+    if stage == "test_code":
+        return "TESTS SKIPPED — static analysis found nothing above the review thresholds"
+    return CodeState["raw_code"] # nothing to refactor
+
+# Parallel branches must only return the keys they write, otherwise
+# LangGraph sees concurrent updates to the same channel.
+@timed("node.code_reviewer")
+def code_reviewer_node(CodeState):
+    skipped = skipped_output("code_reviewer", CodeState)
+    if skipped is not None:
+        return {"review_code": skipped}
+    plan = plan_single_file(CodeState)
+    if plan:
+        reviews = _invoke_chunks("code_reviewer", CodeState, plan)
+        return {"review_code": stitch_chunks("code_reviewer", plan, reviews), "chunk_reviews": reviews}
+    review = _invoke_stage("code_reviewer", CodeState, reviewer_prompt(CodeState), CodeState["raw_code"])
+    return {"review_code": map_line_references(review, review_line_map(CodeState))}
+
+@timed("node.refactored_code")
+def refactored_code(CodeState):
+    skipped = skipped_output("refactored_code", CodeState)
+    if skipped is not None:
+        return {"refactored_code": skipped}
+    plan = plan_single_file(CodeState)
+    if plan:
+        upstream = [{"review_code": review} for review in CodeState["chunk_reviews"]] # each segment gets its own review
+        return {"refactored_code": stitch_chunks("refactored_code", plan, _invoke_chunks("refactored_code", CodeState, plan, upstream))}
+    return {"refactored_code": _invoke_stage("refactored_code", CodeState, refactor_prompt(CodeState), CodeState["raw_code"])}
+
+@timed("node.test_code")
+def test_code(CodeState):
+    skipped = skipped_output("test_code", CodeState)
+    if skipped is not None:
+        return {"test_report": skipped}
+    plan = plan_single_file(CodeState)
+    if plan:
+        return {"test_report": stitch_chunks("test_code", plan, _invoke_chunks("test_code", CodeState, plan))}
+    report = _invoke_stage("test_code", CodeState, test_prompt(CodeState), CodeState["raw_code"]) # only needs raw_code
+    return {"test_report": map_line_references(report, review_line_map(CodeState))}
 
 def human_approval(CodeState):
     return CodeState
 
-def _stream_prompt(prompt_text: str):
-    for chunk in llm.stream(prompt_text):
-        token = chunk.content or ""
-        if token:
-            yield token
-
-def stream_single_file_pipeline(state: dict):
-    parser_prompt = PARSER_PROMPT.format(code=state["raw_code"])
-    parsed_summary = ""
-    for token in _stream_prompt(parser_prompt):
-        parsed_summary += token
-    state["parsed_summary"] = parsed_summary
-    reviewer_prompt = REVIEWER_PROMPT.format(
-        code=state["raw_code"],
-        language=state["language"]
-    )
-    review_text = ""
-    for token in _stream_prompt(reviewer_prompt):
-        review_text += token
-        yield {
-            "type": "review",
-            "content": token
-        }
-    state["review_code"] = review_text
-    test_prompt = TEST_PROMPT.format(
-        code=state["raw_code"],
-        language=state["language"]
+# Single source of truth for the single-file stage DAG, used by both the
+# LangGraph builder and the streaming pipeline. static_analysis_node runs
+# before all of them.
+# node name: (prompt builder, state key, NDJSON event type, upstream nodes)
+SINGLE_FILE_STAGES = {
+    "code_reviewer": (reviewer_prompt, "review_code", "review", ()),
+    "test_code": (test_prompt, "test_report", "test", ()),
+    "refactored_code": (refactor_prompt, "refactored_code", "refactor", ("code_reviewer",)),
+}
+
+SINGLE_FILE_NODES = {
+    "code_reviewer": code_reviewer_node,
+    "test_code": test_code,
+    "refactored_code": refactored_code,
+}
+
+async def _astream_prompt(model: ChatOpenAI, prompt_text: str, stage: str):
+    # cache hits replay as tokens
+    async for token in timed_astream(f"stream.{stage}", prompt_text, cached_astream(model, prompt_text)):
+        yield token
+
+async def _amap_stream(tokens, line_map: List[int]):
+    mapper = LineReferenceMapper(line_map)
+    async for token in tokens:
+        text = mapper.feed(token)
+        if text:
+            yield text
+    tail = mapper.flush()
+    if tail:
+        yield tail
+
+def _astream_stage(stage: str, state: dict, prompt_text: str, metric: str, source: str, line_map: Optional[List[int]] = None):
+    def stream(model, text):
+        tokens = _astream_prompt(model, text, metric)
+        return _amap_stream(tokens, line_map) if line_map else tokens
+    return cascade_astream(SINGLE_FILE_STAGES[stage][2], prompt_text, llm_small, llm, stream, state.get("static_score", 0), source)
+
+def _stage_line_map(stage: str, state: dict) -> List[int]:
+    return [] if stage == "refactored_code" else review_line_map(state) # refactor sees the upload as-is
+
+async def _astream_segments(state: dict, stages: List[str], count: int, segment_prompt, segment_source, segment_prefix, metric: str, concurrency: int):
+    # Every (stage, segment) pair runs concurrently; a segment's refactor
+    # starts as soon as that segment's review is done. Tokens are released
+    # in segment order so each pane still reads as one report.
+    events: asyncio.Queue = asyncio.Queue()
+    semaphore = asyncio.Semaphore(concurrency)
+    finished = {(name, index): asyncio.Event() for name in stages for index in range(count)}
+    outputs = {}
+
+    async def run_chunk(name, index):
+        build_prompt, _, _, upstream = SINGLE_FILE_STAGES[name]
+        upstream = [dep for dep in upstream if dep in stages]
+        try:
+            for dep in upstream:
+                await finished[(dep, index)].wait()
+            upstream_outputs = {SINGLE_FILE_STAGES[dep][1]: outputs[(dep, index)] for dep in upstream}
+            async with semaphore:
+                parts = []
+                prompt_text = segment_prompt(build_prompt, index, upstream_outputs)
+                async for token in _astream_stage(name, state, prompt_text, f"{name}.{metric}", segment_source(index)):
+                    if isinstance(token, Escalation):
+                        parts = []
+                    else:
+                        parts.append(token)
+                    await events.put((name, index, token))
+            outputs[(name, index)] = "".join(parts)
+            finished[(name, index)].set()
+            await events.put((name, index, None))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await events.put((name, index, e))
+
+    written = {name: [] for name in stages}
+    heads = {name: 0 for name in stages}
+    buffered = {(name, index): [] for name in stages for index in range(count)}
+    done = set()
+
+    def emit(name, text):
+        written[name].append(text)
+        return {"type": SINGLE_FILE_STAGES[name][2], "content": text}
+
+    # segment-major order, so the first segment of every pane starts first
+    tasks = [asyncio.create_task(run_chunk(name, index)) for index in range(count) for name in stages]
+    try:
+        for name in stages:
+            header = segment_prefix(name, 0, "")
+            if header:
+                yield emit(name, header)
+        remaining = len(tasks)
+        while remaining:
+            name, index, item = await events.get()
+            if isinstance(item, Exception):
+                raise item
+            if isinstance(item, Escalation):
+                if index == heads[name]: # already shown, roll it back on the client
+                    text = "".join(written[name])
+                    written[name] = [text[:len(text) - item.discard]]
+                    yield escalation_event(SINGLE_FILE_STAGES[name][2], item)
+                else:
+                    buffered[(name, index)] = []
+                continue
+            if item is not None:
+                if index == heads[name]:
+                    yield emit(name, item)
+                else:
+                    buffered[(name, index)].append(item) # released when it becomes the head segment
+                continue
+
+            done.add((name, index))
+            remaining -= 1
+            while (name, heads[name]) in done and heads[name] + 1 < count:
+                heads[name] += 1
+                previous = next((text for text in reversed(written[name]) if text), "")
+                for text in [segment_prefix(name, heads[name], previous)] + buffered.pop((name, heads[name])):
+                    if text:
+                        yield emit(name, text)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    for name in stages:
+        state[SINGLE_FILE_STAGES[name][1]] = "".join(written[name])
+    yield {"type": "done"}
+
+DIFF_REVIEW_STAGES = ["code_reviewer", "refactored_code"] # a change gets no test report
+
+def diff_prompt(build_prompt, changes: FileChanges, excerpt: str, upstream: Optional[dict] = None) -> str:
+    language = detect_language(changes.path, excerpt)
+    context = DIFF_CONTEXT_PROMPT.format(
+        language=language,
+        file_name=changes.path,
+        changed=describe_lines(changes.changed_lines) or "none",
+        removed=f" {changes.removed} lines were removed." if changes.removed else "",
     )
-    test_text = ""
-    for token in _stream_prompt(test_prompt):
-        test_text += token
-        yield {
-            "type": "test",
-            "content": token
-        }
-    state["test_report"] = test_text
-    refactor_prompt = REFACTOR_PROMPT.format(
-        code=state["raw_code"],
-        review=state["review_code"],
-        language=state["language"]
+    segment = {"raw_code": excerpt, "language": language, "review_focus": "", "compact_code": "", "line_map": [], "parsed_summary": ""}
+    return context + build_prompt({**segment, **(upstream or {})})
+
+def diff_prefix(files: List[FileChanges], index: int, previous: str) -> str:
+    return ("\n\n" if previous else "") + f"File: {files[index].path}\n"
+
+def diff_summary(state: dict) -> dict:
+    # how much of the change the prompts actually carry
+    files = state["file_changes"]
+    return {
+        "type": "diff",
+        "files": len(files),
+        "regions": sum(len(changes.regions) for changes in files),
+        "changed_lines": sum(len(changes.changed_lines) for changes in files),
+        "removed_lines": sum(changes.removed for changes in files),
+        "deleted_files": state.get("deleted_files", []),
+        "excerpt_tokens": sum(estimate_tokens(excerpt) for excerpt in state["excerpts"]),
+        "file_tokens": sum(changes.file_tokens for changes in files), # 0 when only a diff was uploaded
+    }
+
+async def astream_diff_pipeline(state: dict):
+    # one review and one refactor per changed file, concurrently across
+    # files; each prompt carries only the changed regions of that file
+    files = state["file_changes"]
+    state["excerpts"] = [render_regions(changes) for changes in files]
+    yield diff_summary(state)
+    if not files:
+        yield {"type": "done"}
+        return
+    async for event in _astream_segments(
+        state, DIFF_REVIEW_STAGES, len(files),
+        lambda build_prompt, index, upstream: diff_prompt(build_prompt, files[index], state["excerpts"][index], upstream),
+        lambda index: state["excerpts"][index],
+        lambda name, index, previous: diff_prefix(files, index, previous),
+        "diff", DIFF_CONCURRENCY,
+    ):
+        yield event
+
+def _astream_chunked_pipeline(state: dict, plan: SourcePlan):
+    return _astream_segments(
+        state, list(SINGLE_FILE_STAGES), len(plan.chunks),
+        lambda build_prompt, index, upstream: chunk_prompt(build_prompt, state, plan, index, upstream),
+        lambda index: plan.chunks[index].text,
+        lambda name, index, previous: chunk_prefix(name, plan, index, previous),
+        "chunk", CHUNK_CONCURRENCY,
     )
-    refactor_text = ""
-    for token in _stream_prompt(refactor_prompt):
-        refactor_text += token
-        yield {
-            "type": "refactor",
-            "content": token
-        }
-    state["refactored_code"] = refactor_text
-    yield {"type": "done"}
\ No newline at end of file
+
+async def astream_single_file_pipeline(state: dict):
+    # asyncio-native: no thread per stream, and closing the generator
+    # cancels every in-flight model call
+    state.update(await asyncio.to_thread(compaction_node, state))
+    yield state["compaction"] # token savings for this request
+    state.update(await asyncio.to_thread(static_analysis_node, state))
+    plan = await asyncio.to_thread(plan_single_file, state) if state["needs_review"] else None
+    if plan is not None:
+        async for event in _astream_chunked_pipeline(state, plan):
+            yield event
+        return
+
+    events: asyncio.Queue = asyncio.Queue()
+    finished = set()
+    tasks = {}
+
+    async def run_stage(name):
+        build_prompt, key, event_type, _ = SINGLE_FILE_STAGES[name]
+        parts = []
+        try:
+            skipped = skipped_output(name, state)
+            if skipped is not None:
+                await events.put((name, {"type": event_type, "content": skipped}))
+                state[key] = skipped
+                await events.put((name, None))
+                return
+            async for token in _astream_stage(name, state, build_prompt(state), name, state["raw_code"], _stage_line_map(name, state)):
+                if isinstance(token, Escalation):
+                    parts = []
+                    await events.put((name, escalation_event(event_type, token)))
+                    continue
+                parts.append(token)
+                await events.put((name, {"type": event_type, "content": token}))
+            state[key] = "".join(parts)
+            await events.put((name, None))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await events.put((name, e))
+
+    try:
+        while len(finished) < len(SINGLE_FILE_STAGES):
+            for name, (_, _, _, upstream) in SINGLE_FILE_STAGES.items():
+                if name not in tasks and all(dep in finished for dep in upstream):
+                    tasks[name] = asyncio.create_task(run_stage(name))
+
+            name, event = await events.get()
+            if isinstance(event, Exception):
+                raise event
+            if event is None:
+                finished.add(name)
+                continue
+            yield event # tokens from concurrent stages are multiplexed here
+    finally:
+        for task in tasks.values():
+            task.cancel()
+
+    yield {"type": "done"}
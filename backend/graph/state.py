@@ -1,12 +1,21 @@
-from typing import TypedDict 
+from typing import List, TypedDict 
 
 class CodeState(TypedDict):
     raw_code: str
     language:str 
-    parsed_summary: str
+    file_name: str
+    compact_code: str # what review and test see
+    line_map: List[int] # compacted line -> uploaded line, empty when unchanged
+    compaction: dict
+    parsed_summary: str # local static analysis summary
+    review_focus: str # hotspot excerpts, empty to review the whole file
+    skip_clean: bool # opt-in: files with no static findings skip the model
+    needs_review: bool
+    static_score: int
     review_code : str
     refactored_code: str
     test_report: str
     human_approval: str 
+    chunk_reviews: List[str] # per-segment reviews for very large files
      
 
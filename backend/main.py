@@ -1,19 +1,32 @@
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+from fastapi import FastAPI, UploadFile, File, Form, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 import asyncio
+import contextlib
 import io
-import json
 import os
 import traceback
 import zipfile
-from typing import Dict
-from utils.project_pdf_generator import generate_project_pdf
+from typing import BinaryIO, Dict, List, Optional, Union
+from utils.project_pdf_generator import render_project_pdf
 from graph.graph_builder import Final as SingleFileGraph
 from project_graph.graph_builder import FinalProjectGraph
-from utils.pdf_generator import generate_single_review_pdf
-from graph.nodes import stream_single_file_pipeline
-from project_graph.nodes import stream_project_pipeline
+from utils.pdf_generator import render_single_review_pdf
+from utils.pdf_renderer import pdf_cache, render_pdf, shutdown_render_pool
+from graph.nodes import astream_diff_pipeline, astream_single_file_pipeline, single_file_model
+from project_graph.nodes import PROJECT_CONTEXT_TOKENS, model_for_action, stream_project_actions, stream_project_pipeline
+from utils.llm_cache import llm_cache
+from utils.job_store import job_store, new_job_id
+from utils.chunking import CHARS_PER_TOKEN, estimate_tokens
+from utils.llm_scheduler import OUTPUT_TOKEN_ESTIMATE, PRIORITY_BATCH, SchedulerOverloaded, llm_priority, llm_scheduler
+from utils.metrics import render_prometheus, request_timing_summary, start_request_timings, timed
+from utils.stream_framing import FRAMING_MODES, StreamEncoder, frame_events
+from utils.run_log import RunLog, run_key, run_registry
+from utils.model_router import model_router
+from utils.prompt_compaction import compaction_stats, detect_language
+from utils.retrieval_index import retrieval_cache, retrieval_tokens
+from utils.project_store import ProjectFiles
+from utils.diff_hunks import DIFF_CONTEXT_LINES, DIFF_MAX_FILES, collect_file_changes, diff_file_sets, parse_unified_diff, render_regions
 
 app = FastAPI() # FastAPI server 
 
@@ -29,6 +42,7 @@ ALLOWED_ACTIONS = {
     "PROJECT_EXPLAIN": ("AI Project Explanation", "project_explanation"), # Project explanation
     "INTERVIEW": ("AI Interview Questions", "interview_questions"), # interview questions 
     "DOCUMENTATION": ("AI Project Documentation", "documentation_generation"), # Readme document generation
+    "QUESTION": ("AI Project Q&A", "answer"), # targeted question, answered from retrieved excerpts
 } # allowed actions 
 
 TEXT_FILE_EXTENSIONS = {
@@ -43,21 +57,67 @@ def is_text_file(filename: str) -> bool:
     lower = filename.lower()
     return any(lower.endswith(ext) for ext in TEXT_FILE_EXTENSIONS)
 
-def extract_project_files_from_zip(zip_content: bytes) -> Dict[str, str]:
-    if not zip_content:
+MAX_ZIP_UPLOAD_BYTES = int(os.getenv("MAX_ZIP_UPLOAD_BYTES", str(200 * 1024 * 1024))) # compressed upload
+MAX_ZIP_UNCOMPRESSED_BYTES = int(os.getenv("MAX_ZIP_UNCOMPRESSED_BYTES", str(256 * 1024 * 1024))) # text actually read
+MAX_ZIP_MEMBERS = int(os.getenv("MAX_ZIP_MEMBERS", "20000"))
+MAX_ZIP_COMPRESSION_RATIO = int(os.getenv("MAX_ZIP_COMPRESSION_RATIO", "100")) # zip-bomb guard
+ZIP_READ_CHUNK_BYTES = 64 * 1024
+MAX_DIFF_UPLOAD_BYTES = int(os.getenv("MAX_DIFF_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+MAX_QUESTION_CHARS = int(os.getenv("MAX_QUESTION_CHARS", "2000"))
+
+def upload_size(file: UploadFile) -> int:
+    # Starlette already spools multipart uploads to a temp file past 1MB,
+    # so the upload never has to be buffered in memory to be measured.
+    file.file.seek(0, os.SEEK_END)
+    size = file.file.tell()
+    file.file.seek(0)
+    return size
+
+def check_zip_upload(file: UploadFile):
+    size = upload_size(file)
+    if not size:
         raise HTTPException(status_code=400, detail="Uploaded ZIP file is empty") # raise error
-
-    zip_buffer = io.BytesIO(zip_content)
-
-    if not zipfile.is_zipfile(zip_buffer):
+    if size > MAX_ZIP_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail="Uploaded ZIP file is too large") # error
+
+def read_zip_member(zip_file: zipfile.ZipFile, info: zipfile.ZipInfo, limit: int) -> bytes:
+    chunks = []
+    total = 0
+    with zip_file.open(info, "r") as member:
+        while True:
+            chunk = member.read(ZIP_READ_CHUNK_BYTES)
+            if not chunk:
+                break
+            total += len(chunk)
+            if total > limit or total > info.file_size:
+                # headers can lie, so count the bytes we actually inflate
+                raise HTTPException(status_code=413, detail="ZIP archive exceeds the uncompressed size limit")
+            chunks.append(chunk)
+    return b"".join(chunks)
+
+@timed("project.extract_zip")
+def extract_project_files_from_zip(zip_source: Union[bytes, BinaryIO]) -> ProjectFiles:
+    if isinstance(zip_source, (bytes, bytearray)):
+        if not zip_source:
+            raise HTTPException(status_code=400, detail="Uploaded ZIP file is empty") # raise error
+        zip_source = io.BytesIO(zip_source)
+
+    zip_source.seek(0)
+    if not zipfile.is_zipfile(zip_source):
         raise HTTPException(status_code=400, detail="Uploaded file is not a valid ZIP archive") # error
 
-    zip_buffer.seek(0)
-    extracted_files: Dict[str, str] = {}
+    zip_source.seek(0)
+    extracted_files = ProjectFiles() # one buffer of UTF-8 bytes, decoded on access
+    remaining = MAX_ZIP_UNCOMPRESSED_BYTES
 
-    with zipfile.ZipFile(zip_buffer, "r") as zip_file:
-        for name in zip_file.namelist():
-            if name.endswith("/"):
+    with zipfile.ZipFile(zip_source, "r") as zip_file:
+        members = zip_file.infolist()
+        if len(members) > MAX_ZIP_MEMBERS:
+            raise HTTPException(status_code=413, detail="ZIP archive contains too many files") # error
+
+        for info in members:
+            name = info.filename
+            if info.is_dir():
                 continue # continue 
             lower_name = name.lower()
             if "__pycache__" in lower_name or "/.git/" in lower_name or "node_modules/" in lower_name:
@@ -66,12 +126,19 @@ def extract_project_files_from_zip(zip_content: bytes) -> Dict[str, str]:
             if not is_text_file(name):
                 continue
 
+            if info.file_size > remaining:
+                raise HTTPException(status_code=413, detail="ZIP archive exceeds the uncompressed size limit")
+            if info.compress_size and info.file_size / info.compress_size > MAX_ZIP_COMPRESSION_RATIO:
+                raise HTTPException(status_code=413, detail="ZIP archive has a suspicious compression ratio")
+
             try:
-                content = zip_file.read(name).decode("utf-8", errors="ignore")
-                if content.strip():
-                    extracted_files[name] = content
+                data = read_zip_member(zip_file, info, remaining)
+            except HTTPException:
+                raise
             except Exception:
                 continue # continue
+            remaining -= len(data)
+            extracted_files.add_source(name, data)
 
     if not extracted_files:
         raise HTTPException(
@@ -79,7 +146,12 @@ def extract_project_files_from_zip(zip_content: bytes) -> Dict[str, str]:
             detail="No supported code files were found inside the ZIP archive",
         ) # error
 
-    return extracted_files
+    return extracted_files.seal()
+
+async def load_project_files(file: UploadFile) -> ProjectFiles:
+    check_zip_upload(file)
+    # decompression and decoding are CPU-bound, keep them off the event loop
+    return await asyncio.to_thread(extract_project_files_from_zip, file.file)
 
 def validate_graph_output(graph_state, required_key: str) -> str:
     if not isinstance(graph_state, dict):
@@ -94,54 +166,275 @@ def validate_graph_output(graph_state, required_key: str) -> str:
 
     return content
 
+SINGLE_FILE_OUTPUT_KEYS = {
+    "review": "review_code",
+    "test": "test_report",
+    "refactor": "refactored_code",
+} # NDJSON event type -> stored job output
+
+DIFF_OUTPUT_KEYS = {
+    "review": "review_code",
+    "refactor": "refactored_code",
+}
+
+def collect_job_output(outputs: Dict[str, str], event: dict, keys: Dict[str, str]):
+    if event.get("type") == "escalate": # the cheap model's attempt is replaced
+        key = keys.get(event.get("stage"))
+        if key:
+            text = outputs.get(key, "")
+            outputs[key] = text[:len(text) - event["discard"]]
+        return
+    key = keys.get(event.get("type"))
+    if key and isinstance(event.get("content"), str):
+        outputs[key] = outputs.get(key, "") + event["content"]
+
+def ensure_llm_capacity(model: str, prompt_tokens: int, calls: int = 1):
+    # admission control: refuse before streaming rather than queue forever
+    try:
+        llm_scheduler.check_admission(model, calls * (prompt_tokens + OUTPUT_TOKEN_ESTIMATE))
+    except SchedulerOverloaded as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+def project_prompt_tokens(project_files: ProjectFiles, action: str = "") -> int:
+    if action == "QUESTION":
+        return retrieval_tokens() # only the top-k excerpts are sent
+    return min(sum(project_files.text_length(path) // CHARS_PER_TOKEN + 1 for path in project_files), PROJECT_CONTEXT_TOKENS) # estimate_tokens without decoding
+
+def check_question(actions: List[str], question: Optional[str]) -> str:
+    question = (question or "").strip()
+    if "QUESTION" in actions and not question:
+        raise HTTPException(status_code=400, detail="The QUESTION action needs a question") # error
+    if len(question) > MAX_QUESTION_CHARS:
+        raise HTTPException(status_code=400, detail="Question is too long") # error
+    return question if "QUESTION" in actions else ""
+
+def open_stream(framing: str, accept_encoding: Optional[str]) -> StreamEncoder:
+    # ?framing=frame coalesces tokens into (gzip'd) frames
+    if framing not in FRAMING_MODES:
+        raise HTTPException(status_code=400, detail="Invalid framing mode")
+    return StreamEncoder(framing, accept_encoding)
+
+def with_timings(event: dict, timings: bool) -> dict:
+    # per-stage latency/token summary on the final done event, opt-in via ?timings=true
+    if timings and event.get("type") == "done" and "action" not in event:
+        return {**event, "timings": request_timing_summary()}
+    return event
+
+async def recorded_run(job_id: str, kind: str, events, keys: Dict[str, str], timings: bool):
+    outputs: Dict[str, str] = {}
+    yield {"type": "job", "job_id": job_id}
+    async with contextlib.aclosing(events) as stream: # cancels in-flight model calls if the run is dropped
+        async for event in stream:
+            collect_job_output(outputs, event, keys)
+            yield with_timings(event, timings)
+    await asyncio.to_thread(job_store.save, job_id, kind, outputs) # lets the PDF endpoints skip the LLM
+
+def start_run(job_id: str, kind: str, framing: str, events, key: str) -> RunLog:
+    # the run outlives its connection: events go to a log keyed by job id,
+    # and a dropped client resumes via /runs/{job_id}/events?after=<seq>
+    return run_registry.start(job_id, kind, framing, frame_events(events, framing), key)
+
+async def follow_run(run: RunLog, after: int, stream: StreamEncoder):
+    async with contextlib.aclosing(run.follow(after)) as events: # detaches on disconnect
+        async for event in events:
+            yield stream.encode(event)
+    tail = stream.finish()
+    if tail:
+        yield tail
+
+def pdf_response(data: bytes, filename: str) -> Response:
+    # rendered in memory, nothing is left on disk
+    return Response(
+        content=data,
+        media_type="application/pdf",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@app.on_event("shutdown")
+def stop_pdf_workers():
+    shutdown_render_pool()
+
 @app.get("/")
 async def root():
     return {"message": "API is running"} #API is running 
 
+@app.get("/cache/stats")
+async def cache_stats():
+    return llm_cache.stats() # LLM response cache hit/miss counters
+
+@app.get("/scheduler/stats")
+async def scheduler_stats():
+    return llm_scheduler.stats() # queue depth, in-flight calls and wait times per model
+
+@app.get("/router/stats")
+async def router_stats():
+    return model_router.stats() # first-model choices and escalation rates per task
+
+@app.get("/retrieval/stats")
+async def retrieval_stats():
+    return retrieval_cache.stats() # BM25 indexes held in memory for project questions
+
+@app.get("/pdf/stats")
+async def pdf_stats():
+    return pdf_cache.stats() # rendered PDFs held in memory by content hash
+
+@app.get("/runs/stats")
+async def run_stats():
+    return run_registry.stats() # resumable runs held in memory and coalesced duplicate requests
+
+@app.get("/metrics")
+async def metrics():
+    # Prometheus text format: stage latency histograms, token counters, cache, scheduler and router counters
+    return PlainTextResponse(
+        render_prometheus(llm_cache.stats(), llm_scheduler.stats(), model_router.stats(), compaction_stats.stats()),
+        media_type="text/plain; version=0.0.4",
+    )
+
 @app.post("/single-review-stream")
-async def single_review_stream(file: UploadFile = File(...)):
+async def single_review_stream(
+    file: UploadFile = File(...),
+    timings: bool = False,
+    skip_clean: bool = Form(False), # same form field as /single-review/pdf
+    framing: str = "token",
+    accept_encoding: Optional[str] = Header(None)):
+    stream = open_stream(framing, accept_encoding)
+    if timings:
+        start_request_timings()
     raw_bytes = await file.read()
     if not raw_bytes:
         raise HTTPException(status_code=400, detail="Uploaded file is empty") # error 
 
     raw_code = raw_bytes.decode("utf-8", errors="ignore")
+    key = run_key("single", framing, str(timings), str(skip_clean), file.filename or "", raw_code)
+    run = run_registry.join(key) # identical upload already generating: share its stream
+    if run is None:
+        ensure_llm_capacity(single_file_model(raw_code).model_name, estimate_tokens(raw_code), calls=3)
+
+        state = {
+            "raw_code": raw_code,
+            "language": detect_language(file.filename or "", raw_code),
+            "file_name": file.filename or "", # picks the splitter for very large files
+            "skip_clean": skip_clean, # opt-in: no model calls for files without static findings
+        }
+
+        job_id = new_job_id()
+        run = start_run(
+            job_id,
+            "single",
+            framing,
+            recorded_run(job_id, "single", astream_single_file_pipeline(state), SINGLE_FILE_OUTPUT_KEYS, timings),
+            key,
+        )
+    return StreamingResponse(follow_run(run, -1, stream), media_type="text/plain", headers=stream.headers)
+
+@timed("diff.extract_hunks")
+def load_diff_changes(diff_text: Optional[str], base_files: Optional[ProjectFiles], head_files: Optional[ProjectFiles], context_lines: int):
+    patches = parse_unified_diff(diff_text) if diff_text is not None else diff_file_sets(base_files, head_files)
+    if len(patches) > DIFF_MAX_FILES:
+        raise HTTPException(status_code=413, detail="The change touches too many files") # error
+    file_changes, deleted = collect_file_changes(patches, head_files, context_lines)
+    if not file_changes and not deleted:
+        raise HTTPException(status_code=400, detail="No changed hunks were found") # error
+    return file_changes, deleted
+
+@app.post("/diff-review-stream")
+async def diff_review_stream(
+    diff: Optional[UploadFile] = File(None),
+    base: Optional[UploadFile] = File(None),
+    head: Optional[UploadFile] = File(None),
+    context_lines: int = Form(DIFF_CONTEXT_LINES),
+    timings: bool = False,
+    framing: str = "token",
+    accept_encoding: Optional[str] = Header(None)):
+    # a unified diff (optionally with the head ZIP for enclosing functions),
+    # or a base and a head ZIP; only the changed regions reach the model
+    try:
+        stream = open_stream(framing, accept_encoding)
+        if timings:
+            start_request_timings()
+        if diff is None and (base is None or head is None):
+            raise HTTPException(status_code=400, detail="Upload a unified diff, or a base and a head ZIP") # error
+
+        diff_text = None
+        if diff is not None:
+            if upload_size(diff) > MAX_DIFF_UPLOAD_BYTES:
+                raise HTTPException(status_code=413, detail="Uploaded diff is too large") # error
+            diff_text = (await diff.read()).decode("utf-8", errors="ignore")
+        head_files = await load_project_files(head) if head is not None else None
+        base_files = await load_project_files(base) if diff is None else None
+        file_changes, deleted = await asyncio.to_thread(load_diff_changes, diff_text, base_files, head_files, context_lines)
+
+        excerpts = [(changes.path, render_regions(changes)) for changes in file_changes]
+        key = run_key("diff", framing, str(timings), ",".join(deleted), files=excerpts)
+        run = run_registry.join(key) # identical change already generating: share its stream
+        if run is None:
+            if excerpts:
+                largest = max((excerpt for _, excerpt in excerpts), key=len)
+                total = sum(estimate_tokens(excerpt) for _, excerpt in excerpts)
+                ensure_llm_capacity(single_file_model(largest).model_name, total, calls=2)
+
+            state = {
+                "file_changes": file_changes,
+                "deleted_files": deleted,
+            }
+            job_id = new_job_id()
+            run = start_run(
+                job_id,
+                "diff",
+                framing,
+                recorded_run(job_id, "diff", astream_diff_pipeline(state), DIFF_OUTPUT_KEYS, timings),
+                key,
+            )
+        return StreamingResponse(
+            follow_run(run, -1, stream),
+            media_type="application/x-ndjson",
+            headers=stream.headers,
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"{type(e).__name__}: {str(e)}")
 
-    state = {
-        "raw_code": raw_code,
-        "language": "python, go, html, css, java, javascript, typescript, rust, c, cpp"
-    }
-
-    def event_generator():
-        try:
-            for event in stream_single_file_pipeline(state):
-                yield json.dumps(event, ensure_ascii=False) + "\n"
-        except Exception as e:
-            traceback.print_exc()
-            yield json.dumps(
-                {
-                    "type": "error",
-                    "message": f"{type(e).__name__}: {str(e)}",
-                },
-                ensure_ascii=False,
-            ) + "\n"
-
-    return StreamingResponse(event_generator(), media_type="text/plain")
+@app.get("/runs/{run_id}/events")
+async def resume_run(
+    run_id: str,
+    after: int = -1,
+    accept_encoding: Optional[str] = Header(None)):
+    # replays everything after the client's last seq, then follows the live run
+    run = run_registry.get(run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Run not found or expired") # error
+    stream = StreamEncoder(run.framing, accept_encoding)
+    return StreamingResponse(follow_run(run, after, stream), media_type="application/x-ndjson", headers=stream.headers)
 
 @app.post("/single-review/pdf")
-async def single_review_pdf(file: UploadFile = File(...)):
+async def single_review_pdf(
+    file: Optional[UploadFile] = File(None),
+    job_id: Optional[str] = Form(None),
+    skip_clean: bool = Form(False)):
     try:
-        raw_bytes = await file.read()
-        if not raw_bytes:
-            raise HTTPException(status_code=400, detail="Uploaded file is empty") # error
+        llm_priority.set(PRIORITY_BATCH) # PDF regeneration queues behind interactive streams
+        graph_state = await asyncio.to_thread(job_store.load, job_id, "single") if job_id else None
 
-        raw_code = raw_bytes.decode("utf-8", errors="ignore")
+        if graph_state is None:
+            if file is None:
+                raise HTTPException(status_code=404, detail="Job not found or expired") # error
 
-        state = {
-            "raw_code": raw_code,
-            "language": "python, go, html, css, java, javascript, typescript, rust, c, cpp" # add any language you want 
-        }
+            raw_bytes = await file.read()
+            if not raw_bytes:
+                raise HTTPException(status_code=400, detail="Uploaded file is empty") # error
 
-        graph_state = await asyncio.to_thread(SingleFileGraph.invoke, state)
+            raw_code = raw_bytes.decode("utf-8", errors="ignore")
+
+            state = {
+                "raw_code": raw_code,
+                "language": detect_language(file.filename or "", raw_code),
+                "file_name": file.filename or "",
+                "skip_clean": skip_clean,
+            }
+
+            graph_state = await asyncio.to_thread(SingleFileGraph.invoke, state)
 
         if not isinstance(graph_state, dict):
             raise RuntimeError(
@@ -159,20 +452,14 @@ async def single_review_pdf(file: UploadFile = File(...)):
         if not isinstance(refactored_code, str):
             raise RuntimeError("Missing or invalid 'refactored_code'")
 
-        pdf_path = await asyncio.to_thread(
-            generate_single_review_pdf,
+        pdf_bytes = await render_pdf(
+            "pdf.single_review",
+            render_single_review_pdf,
             review_code,
             test_report,
             refactored_code,
         )
-        if not pdf_path or not os.path.exists(pdf_path):
-            raise RuntimeError("Single review PDF file was not created")
-
-        return FileResponse(
-            path=pdf_path,
-            media_type="application/pdf",
-            filename="AI_Single_Code_Review_Report.pdf",
-        )
+        return pdf_response(pdf_bytes, "AI_Single_Code_Review_Report.pdf")
 
     except HTTPException:
         raise
@@ -183,34 +470,94 @@ async def single_review_pdf(file: UploadFile = File(...)):
 @app.post("/project-review-stream")
 async def project_review_stream(
     file: UploadFile = File(...),
-    action: str = Form(...),):
+    action: str = Form(...),
+    question: Optional[str] = Form(None),
+    timings: bool = False,
+    framing: str = "token",
+    accept_encoding: Optional[str] = Header(None),):
     try:
         if action not in ALLOWED_ACTIONS:
             raise HTTPException(status_code=400, detail="Invalid action")
+        question = check_question([action], question)
+        stream = open_stream(framing, accept_encoding)
+        if timings:
+            start_request_timings() # before extraction so it is included
+
+        project_files = await load_project_files(file)
+        key = await asyncio.to_thread(run_key, "project", action, question, framing, str(timings), files=project_files.raw_items())
+        run = run_registry.join(key) # identical upload already generating: share its stream
+        if run is None:
+            prompt_tokens = project_prompt_tokens(project_files, action)
+            ensure_llm_capacity(model_for_action(action, prompt_tokens).model_name, prompt_tokens)
+
+            state = {
+                "project_files": project_files,
+                "user_request": action,
+                "question": question,
+            }
+            job_id = new_job_id()
+            run = start_run(
+                job_id,
+                "project",
+                framing,
+                recorded_run(job_id, "project", stream_project_pipeline(state), {action: action}, timings), # stored per action
+                key,
+            )
+        return StreamingResponse(
+            follow_run(run, -1, stream),
+            media_type="application/x-ndjson",
+            headers=stream.headers,
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"{type(e).__name__}: {str(e)}")
 
-        zip_bytes = await file.read()
-        project_files = extract_project_files_from_zip(zip_bytes)
-
-        state = {
-            "project_files": project_files,
-            "user_request": action,
-        }
-        async def event_generator():
-            try:
-                async for event in stream_project_pipeline(state):
-                    yield json.dumps(event, ensure_ascii=False) + "\n"
-            except Exception as e:
-                traceback.print_exc()
-                yield json.dumps(
-                    {
-                        "type": "error",
-                        "message": f"{type(e).__name__}: {str(e)}"
-                    },
-                    ensure_ascii=False,
-                ) + "\n"
+@app.post("/project-review-batch-stream")
+async def project_review_batch_stream(
+    file: UploadFile = File(...),
+    actions: List[str] = Form(...),
+    question: Optional[str] = Form(None),
+    timings: bool = False,
+    framing: str = "token",
+    accept_encoding: Optional[str] = Header(None),):
+    try:
+        stream = open_stream(framing, accept_encoding)
+        if timings:
+            start_request_timings()
+        # accept repeated form fields and/or comma separated values
+        requested = [a.strip() for value in actions for a in value.split(",") if a.strip()]
+        requested = list(dict.fromkeys(requested))
+        if not requested or any(a not in ALLOWED_ACTIONS for a in requested):
+            raise HTTPException(status_code=400, detail="Invalid action")
+        question = check_question(requested, question)
+
+        project_files = await load_project_files(file)
+        key = await asyncio.to_thread(run_key, "batch", ",".join(sorted(requested)), question, framing, str(timings), files=project_files.raw_items())
+        run = run_registry.join(key)
+        if run is None:
+            for action in requested:
+                prompt_tokens = project_prompt_tokens(project_files, action)
+                ensure_llm_capacity(model_for_action(action, prompt_tokens).model_name, prompt_tokens)
+
+            state = {
+                "project_files": project_files,
+                "user_requests": requested,
+                "question": question,
+            }
+            job_id = new_job_id()
+            run = start_run(
+                job_id,
+                "project",
+                framing,
+                recorded_run(job_id, "project", stream_project_actions(state), {a: a for a in requested}, timings),
+                key,
+            )
         return StreamingResponse(
-            event_generator(),
-            media_type="application/x-ndjson"
+            follow_run(run, -1, stream),
+            media_type="application/x-ndjson",
+            headers=stream.headers,
         )
     except HTTPException:
         raise
@@ -220,36 +567,42 @@ async def project_review_stream(
 
 @app.post("/project-review/pdf")
 async def project_review_pdf(
-    file: UploadFile = File(...),
-    action: str = Form(...)):
+    file: Optional[UploadFile] = File(None),
+    action: str = Form(...),
+    question: Optional[str] = Form(None),
+    job_id: Optional[str] = Form(None)):
     try:
-        project_files = extract_project_files_from_zip(await file.read())
-        state = {
-            "project_files": project_files,
-            "user_request": action,
-        }
-        graph_state = await FinalProjectGraph.ainvoke(state)
         if action == "PROJECT_REVIEW": # project review
             name = "AI Project Review Report"
-            content = graph_state.get("review_report", "")
         elif action == "PROJECT_EXPLAIN": # project explanation
             name = "AI Project Explanation Report"
-            content = graph_state.get("project_explanation", "")
         elif action == "INTERVIEW":
             name = "AI Interview Questions Report" # Interview prep
-            content = graph_state.get("interview_questions", "")
         elif action == "DOCUMENTATION": # documentation
             name = "README FILE"
-            content = graph_state.get("documentation_generation", "")
+        elif action == "QUESTION": # question about the project
+            name = "AI Project Q&A Report"
         else:
             raise HTTPException(status_code=400, detail="Invalid action")
+
+        llm_priority.set(PRIORITY_BATCH) # PDF regeneration queues behind interactive streams
+        outputs = await asyncio.to_thread(job_store.load, job_id, "project") if job_id else None
+        content = (outputs or {}).get(action)
+
+        if content is None:
+            if file is None:
+                raise HTTPException(status_code=404, detail="Job not found or expired") # error
+            project_files = await load_project_files(file)
+            state = {
+                "project_files": project_files,
+                "user_request": action,
+                "question": check_question([action], question),
+            }
+            graph_state = await FinalProjectGraph.ainvoke(state)
+            content = graph_state.get(ALLOWED_ACTIONS[action][1], "")
         
-        pdf_path = await asyncio.to_thread(generate_project_pdf, name, content)
-        return FileResponse(
-            pdf_path,
-            media_type="application/pdf",
-            filename=f"{name.replace(' ', '_')}.pdf",
-        )
+        pdf_bytes = await render_pdf("pdf.project", render_project_pdf, name, content)
+        return pdf_response(pdf_bytes, f"{name.replace(' ', '_')}.pdf")
     except HTTPException:
         raise
     except Exception as e:
@@ -5,13 +5,15 @@ from project_graph.nodes import (
     project_explain_node,
     interview_node,
     documentation_node,
+    question_node,
 )
 
 def router_node(state):
     return {}
 
 def route_condition(state):
-    return state["user_request"]
+    # a list of actions fans out to several branches that run concurrently
+    return state.get("user_requests") or state["user_request"]
 
 graph = StateGraph(ProjectState)
 
@@ -20,6 +22,7 @@ graph.add_node("PROJECT_REVIEW", project_review_node)
 graph.add_node("PROJECT_EXPLAIN", project_explain_node)
 graph.add_node("INTERVIEW", interview_node)
 graph.add_node("DOCUMENTATION", documentation_node)
+graph.add_node("QUESTION", question_node)
 
 graph.set_entry_point("router")
 
@@ -31,6 +34,7 @@ graph.add_conditional_edges(
         "PROJECT_EXPLAIN": "PROJECT_EXPLAIN",
         "INTERVIEW": "INTERVIEW",
         "DOCUMENTATION": "DOCUMENTATION",
+        "QUESTION": "QUESTION",
     },
 )
 
@@ -38,5 +42,6 @@ graph.add_edge("PROJECT_REVIEW", END)
 graph.add_edge("PROJECT_EXPLAIN", END)
 graph.add_edge("INTERVIEW", END)
 graph.add_edge("DOCUMENTATION", END)
+graph.add_edge("QUESTION", END)
 
 FinalProjectGraph = graph.compile()
\ No newline at end of file
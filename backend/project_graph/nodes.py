@@ -1,13 +1,28 @@
+import asyncio
+import os
 from pathlib import Path
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import PromptTemplate
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Mapping
 from dotenv import load_dotenv
+from utils.llm_cache import cached_ainvoke, cached_astream
+from utils.metrics import span, timed, timed_astream
+from utils.model_router import Escalation, cascade_ainvoke, cascade_astream, escalation_event, model_router
+from utils.chunking import estimate_tokens, pack_files_into_batches, source_file_name
+from utils.file_ranking import PROJECT_CONTEXT_TOKENS, PROJECT_FILE_TOKEN_BUDGET, render_listed_files, select_project_files
+from utils.dependency_graph import build_dependency_graph, summarize_dependency_graph
+from utils.file_index import content_hash, file_index, parse_file_sections, split_summary_findings
+from utils.prompt_compaction import compact_project_files, compaction_stats
+from utils.project_store import render_project_files
+from utils.retrieval_index import RETRIEVAL_TOP_K, render_hits, retrieval_cache
 load_dotenv()
 
 llm1 = ChatOpenAI(model="gpt-4o", temperature=0.2)
 llm2 = ChatOpenAI(model="gpt-4o-mini", temperature=0.2)
 
+MAP_BATCH_TOKENS = int(os.getenv("MAP_BATCH_TOKENS", "12000"))
+MAP_CONCURRENCY = int(os.getenv("MAP_CONCURRENCY", "8"))
+
 def load_prompt(path, encoding="utf-8"):
     return open(path, encoding=encoding).read()
 
@@ -27,68 +42,295 @@ DOCUMENTATION_PROMPT = PromptTemplate.from_template(
     load_prompt("prompts/documentation.txt", encoding="utf-8")
 )
 
-def stringify_project_files(project_files: dict[str, str]) -> str:
-    output = []
-    for name, content in project_files.items():
-        output.append(f"\nFile:{name}\n{content}\n")
-    return "\n".join(output)
+QUESTION_PROMPT = PromptTemplate.from_template(
+    load_prompt("prompts/project_question.txt", encoding="utf-8")
+)
+
+BATCH_SUMMARY_PROMPT = PromptTemplate.from_template(
+    load_prompt("prompts/batch_summary.txt", encoding="utf-8")
+)
+
+@timed("project.stringify_files")
+def stringify_project_files(project_files: Mapping[str, str]) -> str:
+    return render_project_files(project_files)
+
+async def _summarize_batches(batches: list[dict[str, str]], round_number: int, results: list) -> AsyncGenerator[dict, None]:
+    semaphore = asyncio.Semaphore(MAP_CONCURRENCY)
+
+    async def summarize(index: int, batch: dict[str, str]):
+        async with semaphore:
+            prompt_text = BATCH_SUMMARY_PROMPT.format(project_files=stringify_project_files(batch))
+            return index, await cached_ainvoke(llm2, prompt_text)
+
+    yield {"type": "progress", "stage": "map", "round": round_number, "completed": 0, "total": len(batches)}
+    tasks = [asyncio.create_task(summarize(i, batch)) for i, batch in enumerate(batches)]
+    try:
+        for completed, next_done in enumerate(asyncio.as_completed(tasks), start=1):
+            index, summary = await next_done
+            results[index] = summary
+            yield {"type": "progress", "stage": "map", "round": round_number, "completed": completed, "total": len(batches)}
+    finally:
+        for task in tasks:
+            task.cancel()
+
+def _render_file_summary(summary: str, findings: str) -> str:
+    return f"{summary}\nFindings:\n{findings or '- None'}"
+
+async def _index_file_summaries(project_files: dict[str, str]) -> AsyncGenerator[dict, None]:
+    # per-file summaries are keyed by content hash, so a re-uploaded project
+    # only sends added or modified files back to the model
+    hashes = {name: content_hash(content) for name, content in project_files.items()}
+    known = await asyncio.to_thread(file_index.lookup, hashes.values(), llm2.model_name) if file_index else {}
+    pending = {name: content for name, content in project_files.items() if hashes[name] not in known}
+    yield {"type": "incremental", "reused": len(project_files) - len(pending), "recomputed": len(pending)}
+
+    documents = {
+        name: _render_file_summary(*known[hashes[name]])
+        for name in project_files if name not in pending
+    }
+    batches = pack_files_into_batches(pending, MAP_BATCH_TOKENS) if pending else []
+    results = [""] * len(batches)
+    async for event in _summarize_batches(batches, 1, results):
+        yield event
+
+    sections: dict[str, str] = {}
+    parts_by_file: dict[str, list[str]] = {}
+    for batch, text in zip(batches, results):
+        parsed = parse_file_sections(text)
+        missing = []
+        for part_name in batch:
+            parts_by_file.setdefault(source_file_name(part_name), []).append(part_name)
+            if part_name in parsed:
+                sections[part_name] = parsed[part_name]
+            else:
+                missing.append(part_name)
+        if missing:
+            documents[f"Summary of {', '.join(missing)}"] = text # model ignored the section format
+
+    fresh = {}
+    for name, part_names in parts_by_file.items():
+        if not all(part in sections for part in part_names):
+            continue
+        split = [split_summary_findings(sections[part]) for part in part_names]
+        summary = "\n".join(part_summary for part_summary, _ in split)
+        findings = "\n".join(part_findings for _, part_findings in split if part_findings)
+        documents[name] = _render_file_summary(summary, findings)
+        fresh[hashes[name]] = (name, summary, findings)
+
+    if file_index:
+        await asyncio.to_thread(file_index.store, fresh, llm2.model_name)
+    yield {"type": "documents", "content": {name: documents[name] for name in sorted(documents)}}
+
+async def iter_project_context(project_files: Mapping[str, str]) -> AsyncGenerator[dict, None]:
+    # the dependency graph goes into the same prompt, so its summary is
+    # reserved before any file is selected
+    graph_tokens = estimate_tokens(await build_dependency_summary(project_files))
+    context_budget = PROJECT_CONTEXT_TOKENS - graph_tokens
+
+    # rank files so lockfiles, generated and peripheral code don't eat the budget
+    selection = await asyncio.to_thread(select_project_files, project_files, context_budget, PROJECT_FILE_TOKEN_BUDGET)
+    yield {"type": "ranking", "selected": len(selection.verbatim), "summarized": len(selection.summarized), "omitted": len(selection.listed)}
+    listed_text = render_listed_files(selection.listed)
+
+    # strip banners, license headers and blobs before anything is counted or summarised
+    compacted = await asyncio.to_thread(compact_project_files, {**selection.verbatim, **selection.summarized})
+    yield compaction_stats.record(
+        sum(source.original_tokens for source in compacted.values()),
+        sum(source.compacted_tokens for source in compacted.values()),
+    )
+    verbatim = {name: compacted[name].text for name in selection.verbatim}
+    summarized = {name: compacted[name].text for name in selection.summarized}
+
+    files_text = stringify_project_files(verbatim)
+    if not summarized:
+        yield {"type": "context", "content": files_text + listed_text}
+        return
+
+    # map phase: per-file summaries of the files past the verbatim budget on
+    # the cheaper model (reused by content hash), then batch-level summaries
+    # until they fit what the verbatim files and the listing leave over
+    summary_budget = context_budget - estimate_tokens(files_text) - estimate_tokens(listed_text)
+    documents = {}
+    async for event in _index_file_summaries(summarized):
+        if event["type"] == "documents":
+            documents = event["content"]
+        else:
+            yield event
+
+    round_number = 1
+    while True:
+        summaries_text = (
+            "\n\nThe remaining files are too many to include verbatim. Below are summaries of them.\n"
+            + stringify_project_files(documents)
+        )
+        if estimate_tokens(summaries_text) <= summary_budget or len(documents) <= 1 or round_number >= 3:
+            break
+        round_number += 1
+        batches = pack_files_into_batches(documents, MAP_BATCH_TOKENS)
+        results = [""] * len(batches)
+        async for event in _summarize_batches(batches, round_number, results):
+            yield event
+        documents = {f"Batch {i + 1} summary": summary for i, summary in enumerate(results)}
+
+    yield {"type": "progress", "stage": "reduce"}
+    yield {"type": "context", "content": files_text + summaries_text + listed_text}
 
+async def iter_question_context(project_files: Mapping[str, str], question: str) -> AsyncGenerator[dict, None]:
+    # BM25 over the whole upload, indexed once per content hash; only the
+    # top-k chunks go to the model instead of the full project
+    index, cached = await asyncio.to_thread(retrieval_cache.get_or_build, project_files)
+    with span("project.retrieval"):
+        hits = index.search(question, RETRIEVAL_TOP_K)
+    yield {
+        "type": "retrieval",
+        "cached": cached,
+        "build_seconds": round(index.build_seconds, 4),
+        "chunks": len(hits),
+        "files": sorted({hit.chunk.path for hit in hits}),
+    }
+    yield {"type": "context", "content": render_hits(hits)}
+
+def _dependency_summary(project_files: Mapping[str, str]) -> str:
+    return summarize_dependency_graph(build_dependency_graph(project_files))
+
+async def build_dependency_summary(project_files: Mapping[str, str]) -> str:
+    # local import graph, cached per content hash; replaces architecture guesswork
+    return await asyncio.to_thread(_dependency_summary, project_files)
+
+async def build_project_context(project_files: Mapping[str, str], question: str = "") -> str:
+    files_text = ""
+    events = iter_question_context(project_files, question) if question else iter_project_context(project_files)
+    async for event in events:
+        if event["type"] == "context":
+            files_text = event["content"]
+    return files_text
+
+def model_for_action(action: str, prompt_tokens: int) -> ChatOpenAI:
+    # the model an action starts on, for admission control
+    return model_router.route(action, prompt_tokens, llm2, llm1).models[0]
+
+@timed("project.build_prompt")
+async def build_action_prompt(action: str, files_text: str, project_files: Mapping[str, str], question: str = "") -> str:
+    if action == "PROJECT_REVIEW":
+        prompt_text = PROJECT_REVIEW_PROMPT.format(
+            project_files=files_text,
+            dependency_graph=await build_dependency_summary(project_files),
+        )
+    elif action == "PROJECT_EXPLAIN":
+        prompt_text = PROJECT_EXPLAIN_PROMPT.format(
+            project_files=files_text,
+            dependency_graph=await build_dependency_summary(project_files),
+        )
+    elif action == "INTERVIEW":
+        prompt_text = INTERVIEW_PROMPT.format(project_files=files_text)
+    elif action == "DOCUMENTATION":
+        prompt_text = DOCUMENTATION_PROMPT.format(project_files=files_text)
+    elif action == "QUESTION":
+        prompt_text = QUESTION_PROMPT.format(question=question, project_files=files_text)
+    else:
+        raise ValueError("Invalid action")
+    return prompt_text
+
+async def _run_action_node(state: dict, action: str) -> str:
+    question = (state.get("question") or "") if action == "QUESTION" else ""
+    files_text = await build_project_context(state["project_files"], question)
+    prompt_text = await build_action_prompt(action, files_text, state["project_files"], question)
+    return await cascade_ainvoke(action, prompt_text, llm2, llm1)
+
+@timed("node.project_review")
 async def project_review_node(state: dict):
-    files_text = stringify_project_files(state["project_files"])
-    prompt_text = PROJECT_REVIEW_PROMPT.format(project_files=files_text)
-    result = await llm1.ainvoke(prompt_text)
-    return {"review_report": result.content}
+    return {"review_report": await _run_action_node(state, "PROJECT_REVIEW")}
 
+@timed("node.project_explain")
 async def project_explain_node(state: dict):
-    files_text = stringify_project_files(state["project_files"])
-    prompt_text = PROJECT_EXPLAIN_PROMPT.format(project_files=files_text)
-    result = await llm1.ainvoke(prompt_text)
-    return {"project_explanation": result.content}
+    return {"project_explanation": await _run_action_node(state, "PROJECT_EXPLAIN")}
 
+@timed("node.interview")
 async def interview_node(state: dict):
-    files_text = stringify_project_files(state["project_files"])
-    prompt_text = INTERVIEW_PROMPT.format(project_files=files_text)
-    result = await llm2.ainvoke(prompt_text)
-    return {"interview_questions": result.content}
+    return {"interview_questions": await _run_action_node(state, "INTERVIEW")}
 
+@timed("node.documentation")
 async def documentation_node(state: dict):
-    files_text = stringify_project_files(state["project_files"])
-    prompt_text = DOCUMENTATION_PROMPT.format(project_files=files_text)
-    result = await llm1.ainvoke(prompt_text)
-    return {"documentation_generation": result.content}
+    return {"documentation_generation": await _run_action_node(state, "DOCUMENTATION")}
+
+@timed("node.question")
+async def question_node(state: dict):
+    return {"answer": await _run_action_node(state, "QUESTION")}
 
-async def _stream_text(llm: ChatOpenAI, prompt_text: str) -> AsyncGenerator[str, None]:
-    async for chunk in llm.astream(prompt_text):
-        token = chunk.content or ""
-        if token:
-            yield token
+async def _stream_text(llm: ChatOpenAI, prompt_text: str, action: str) -> AsyncGenerator[str, None]:
+    # cache hits replay as tokens
+    async for token in timed_astream(f"stream.{action}", prompt_text, cached_astream(llm, prompt_text)):
+        yield token
+
+async def _stream_action(action: str, prompt_text: str) -> AsyncGenerator[dict, None]:
+    # cheap model first; an escalate event rolls back what it streamed
+    stream = lambda model, text: _stream_text(model, text, action)
+    async for token in cascade_astream(action, prompt_text, llm2, llm1, stream):
+        if isinstance(token, Escalation):
+            yield escalation_event(action, token)
+        else:
+            yield {"type": action, "content": token}
+
+async def _iter_context_events(state: dict, context: dict, actions: list[str]) -> AsyncGenerator[dict, None]:
+    # full context for the report actions, retrieved excerpts for a question
+    sources = []
+    if any(action != "QUESTION" for action in actions):
+        sources.append(("files_text", iter_project_context(state["project_files"])))
+    if "QUESTION" in actions:
+        sources.append(("question_text", iter_question_context(state["project_files"], state["question"])))
+    with span("project.context", attach=False):
+        for key, events in sources:
+            async for event in events:
+                if event["type"] == "context":
+                    context[key] = event["content"]
+                else:
+                    yield event # map-phase progress keeps time-to-first-byte low
+
+def _action_context(context: dict, action: str) -> str:
+    return context["question_text"] if action == "QUESTION" else context["files_text"]
 
 async def stream_project_pipeline(state: dict) -> AsyncGenerator[dict, None]:
-    files_text = stringify_project_files(state["project_files"])
     action = state["user_request"]
+    context = {}
+    async for event in _iter_context_events(state, context, [action]):
+        yield event
 
-    if action == "PROJECT_REVIEW":
-        prompt_text = PROJECT_REVIEW_PROMPT.format(project_files=files_text)
-        async for token in _stream_text(llm1, prompt_text):
-            yield {"type": "PROJECT_REVIEW", "content": token}
-        return
+    prompt_text = await build_action_prompt(action, _action_context(context, action), state["project_files"], state.get("question") or "")
+    async for event in _stream_action(action, prompt_text):
+        yield event
+    yield {"type": "done"}
 
-    if action == "PROJECT_EXPLAIN":
-        prompt_text = PROJECT_EXPLAIN_PROMPT.format(project_files=files_text)
-        async for token in _stream_text(llm1, prompt_text):
-            yield {"type": "PROJECT_EXPLAIN", "content": token}
-        return
+async def stream_project_actions(state: dict) -> AsyncGenerator[dict, None]:
+    # one extraction and one context build, then every requested action
+    # streams concurrently and is multiplexed into a single response
+    actions = state["user_requests"]
+    context = {}
+    async for event in _iter_context_events(state, context, actions):
+        yield event
 
-    if action == "INTERVIEW":
-        prompt_text = INTERVIEW_PROMPT.format(project_files=files_text)
-        async for token in _stream_text(llm2, prompt_text):
-            yield {"type": "INTERVIEW", "content": token}
-        return
+    events: asyncio.Queue = asyncio.Queue()
 
-    if action == "DOCUMENTATION":
-        prompt_text = DOCUMENTATION_PROMPT.format(project_files=files_text)
-        async for token in _stream_text(llm1, prompt_text):
-            yield {"type": "DOCUMENTATION", "content": token}
-        return
+    async def run_action(action: str):
+        try:
+            prompt_text = await build_action_prompt(action, _action_context(context, action), state["project_files"], state.get("question") or "")
+            async for event in _stream_action(action, prompt_text):
+                await events.put(event)
+            await events.put({"type": "done", "action": action})
+        except Exception as e:
+            await events.put(e)
+
+    tasks = [asyncio.create_task(run_action(action)) for action in actions]
+    try:
+        remaining = len(tasks)
+        while remaining:
+            event = await events.get()
+            if isinstance(event, Exception):
+                raise event
+            if event["type"] == "done":
+                remaining -= 1
+            yield event
+    finally:
+        for task in tasks:
+            task.cancel()
 
-    raise ValueError("Invalid action")
\ No newline at end of file
+    yield {"type": "done"}
@@ -1,9 +1,12 @@
-from typing import TypedDict, Dict, Optional
+from typing import TypedDict, List, Mapping, Optional
 
 class ProjectState(TypedDict):
-    project_files: Dict[str, str]
+    project_files: Mapping[str, str] # utils.project_store.ProjectFiles for uploads
     user_request: str
+    user_requests: Optional[List[str]]
+    question: Optional[str] # for the QUESTION action
     review_report: Optional[str]
     project_explanation: Optional[str]
     interview_questions: Optional[str]
     documentation_generation: Optional[str]
+    answer: Optional[str]
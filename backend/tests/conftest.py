@@ -0,0 +1,17 @@
+# Run from the backend directory:
+#   python -m pytest tests
+# Module-level singletons open their SQLite files on import, so the state
+# paths point at a scratch directory before any app module is imported.
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+_STATE_DIR = tempfile.mkdtemp(prefix="codexa-tests-")
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("LLM_CACHE_PATH", os.path.join(_STATE_DIR, "llm_cache.sqlite3"))
+os.environ.setdefault("JOB_STORE_PATH", os.path.join(_STATE_DIR, "job_store.sqlite3"))
+os.environ.setdefault("FILE_INDEX_PATH", os.path.join(_STATE_DIR, "file_index.sqlite3"))
+os.chdir(BACKEND_DIR) # prompt templates are loaded relative to the backend directory
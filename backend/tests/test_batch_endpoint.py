@@ -0,0 +1,103 @@
+import asyncio
+import io
+import json
+import uuid
+import zipfile
+
+import httpx
+
+import main
+import project_graph.nodes as project_nodes
+
+REPLIES = {
+    "Senior Technical Interviewer": "".join(f"{n}. Question {n}?\nAnswer: because {n}.\n" for n in range(1, 21)),
+    "technical writer": "# Project\n\n## Installation\n\npip install .\n\n## Usage\n\nRun it.\n",
+}
+
+class Reply:
+    def __init__(self, content: str):
+        self.content = content
+
+class ActionModel:
+    # answers each action prompt with text that passes its quality check
+    def __init__(self):
+        self.model_name = f"fake-{uuid.uuid4().hex}"
+        self.temperature = 0.2
+        self.active = 0
+        self.max_active = 0
+        self.prompts = []
+
+    async def astream(self, prompt_text: str, **kwargs):
+        self.prompts.append(prompt_text)
+        reply = next(text for marker, text in REPLIES.items() if marker in prompt_text)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            for line in reply.splitlines(keepends=True):
+                await asyncio.sleep(0.005)
+                yield Reply(line)
+        finally:
+            self.active -= 1
+
+def project_zip() -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("app/main.py", f"from app import core\n\ndef run_{uuid.uuid4().hex}():\n    return core.value()\n")
+        archive.writestr("app/core.py", "def value():\n    return 42\n")
+    return buffer.getvalue()
+
+def post(path: str, **kwargs) -> httpx.Response:
+    async def send():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(path, **kwargs)
+    return asyncio.run(send())
+
+def events(response: httpx.Response) -> list:
+    return [json.loads(line) for line in response.text.splitlines() if line]
+
+def install(monkeypatch) -> ActionModel:
+    model = ActionModel()
+    monkeypatch.setattr(project_nodes, "llm2", model)
+    monkeypatch.setattr(project_nodes, "llm1", model)
+    return model
+
+def test_batch_runs_every_action_on_one_context(monkeypatch):
+    model = install(monkeypatch)
+    response = post(
+        "/project-review-batch-stream",
+        files={"file": ("project.zip", project_zip())},
+        data={"actions": ["INTERVIEW", "DOCUMENTATION,INTERVIEW"]}, # repeated and comma separated
+    )
+    assert response.status_code == 200
+    stream = events(response)
+    types = [event["type"] for event in stream]
+    assert types[0] == "job"
+    assert types.count("ranking") == 1 # the project is ranked and compacted once
+    assert "escalate" not in types
+    assert [event["seq"] for event in stream] == list(range(len(stream)))
+
+    assert [event.get("action") for event in stream if event["type"] == "done"] in (
+        ["INTERVIEW", "DOCUMENTATION", None], ["DOCUMENTATION", "INTERVIEW", None],
+    )
+    interview = "".join(event["content"] for event in stream if event["type"] == "INTERVIEW")
+    documentation = "".join(event["content"] for event in stream if event["type"] == "DOCUMENTATION")
+    assert interview.count("Answer:") == 20
+    assert documentation.startswith("# Project")
+    assert len(model.prompts) == 2 and model.max_active == 2 # both actions streamed concurrently
+    assert all("File:app/core.py" in prompt for prompt in model.prompts)
+
+def test_batch_rejects_unknown_actions(monkeypatch):
+    install(monkeypatch)
+    for actions in (["INTERVIEW,DEPLOY"], [" , "]):
+        response = post("/project-review-batch-stream", files={"file": ("project.zip", project_zip())}, data={"actions": actions})
+        assert (response.status_code, response.json()["detail"]) == (400, "Invalid action")
+
+def test_batch_question_requires_text(monkeypatch):
+    install(monkeypatch)
+    response = post(
+        "/project-review-batch-stream",
+        files={"file": ("project.zip", project_zip())},
+        data={"actions": "INTERVIEW,QUESTION"},
+    )
+    assert (response.status_code, response.json()["detail"]) == (400, "The QUESTION action needs a question")
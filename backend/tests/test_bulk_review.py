@@ -0,0 +1,55 @@
+import json
+
+from bulk_review import item_key, load_checkpoint, percentile
+
+def write_lines(path, records, tail: str = ""):
+    with open(path, "w", encoding="utf-8") as results:
+        for record in records:
+            results.write(json.dumps(record) + "\n")
+        results.write(tail)
+
+def test_missing_output_means_nothing_is_done(tmp_path):
+    assert load_checkpoint(str(tmp_path / "absent.jsonl")) == set()
+
+def test_only_successful_items_count_as_done(tmp_path):
+    path = tmp_path / "audit.jsonl"
+    write_lines(path, [
+        {"type": "file", "key": "a", "status": "ok"},
+        {"type": "file", "key": "b", "status": "error", "error": "RuntimeError: boom"}, # retried
+        {"type": "file", "key": "c", "status": "ok"},
+        {"type": "summary", "items": 3},
+    ])
+    assert load_checkpoint(str(path)) == {"a", "c"}
+
+def test_a_later_success_completes_an_earlier_error(tmp_path):
+    path = tmp_path / "audit.jsonl"
+    write_lines(path, [
+        {"type": "file", "key": "a", "status": "error"},
+        {"type": "file", "key": "a", "status": "ok"},
+    ])
+    assert load_checkpoint(str(path)) == {"a"}
+
+def test_torn_last_line_is_ignored_and_truncated(tmp_path):
+    path = tmp_path / "audit.jsonl"
+    write_lines(path, [{"type": "file", "key": "a", "status": "ok"}], tail='{"type": "file", "key": "b", "sta')
+    assert load_checkpoint(str(path)) == {"a"}
+    assert path.read_text(encoding="utf-8") == json.dumps({"type": "file", "key": "a", "status": "ok"}) + "\n"
+
+def test_resumed_run_appends_after_the_truncated_line(tmp_path):
+    path = tmp_path / "audit.jsonl"
+    write_lines(path, [{"type": "file", "key": "a", "status": "ok"}], tail='{"key": "b"')
+    load_checkpoint(str(path))
+    with open(path, "a", encoding="utf-8") as results:
+        results.write(json.dumps({"type": "file", "key": "b", "status": "ok"}) + "\n")
+    assert load_checkpoint(str(path)) == {"a", "b"}
+
+def test_item_key_changes_with_content():
+    key = item_key("file", "/repo", "a.py", "", "digest-1")
+    assert key == item_key("file", "/repo", "a.py", "", "digest-1")
+    assert key != item_key("file", "/repo", "a.py", "", "digest-2")
+    assert key != item_key("file", "/other", "a.py", "", "digest-1")
+
+def test_percentile():
+    assert percentile([], 50) == 0.0
+    assert percentile([4.0, 1.0, 3.0, 2.0, 5.0], 50) == 3.0
+    assert percentile([1.0, 2.0, 3.0, 4.0, 5.0], 95) == 5.0
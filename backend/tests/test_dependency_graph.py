@@ -0,0 +1,69 @@
+from utils.dependency_graph import build_dependency_graph, extract_import_specs, in_degree, summarize_dependency_graph
+
+PROJECT = {
+    "repo/app/__init__.py": "",
+    "repo/app/main.py": (
+        "import os\n"
+        "from app import models\n"
+        "from .services.billing import (\n"
+        "    charge,\n"
+        "    refund,\n"
+        ")\n"
+        "text = 'import not_a_module'\n"
+    ),
+    "repo/app/models.py": "from . import db\n",
+    "repo/app/db.py": "import sqlite3\n",
+    "repo/app/services/__init__.py": "",
+    "repo/app/services/billing.py": "from ..models import Invoice\nfrom .. import db\n",
+    "repo/web/src/index.ts": "import { api } from './api';\nimport React from 'react';\nconst w = require('./widgets');\n",
+    "repo/web/src/api.ts": "export const api = 1;\n",
+    "repo/web/src/widgets/index.js": "export * from '../api';\n",
+    "repo/svc/go.mod": "module example.com/svc\n\ngo 1.21\n",
+    "repo/svc/main.go": 'package main\n\nimport (\n\t"fmt"\n\t"example.com/svc/store"\n)\n',
+    "repo/svc/store/store.go": "package store\n",
+    "repo/svc/store/store_test.go": "package store\n",
+    "repo/java/com/acme/App.java": "import com.acme.util.*;\nimport static com.acme.Config.load;\nimport java.util.List;\n",
+    "repo/java/com/acme/Config.java": "class Config {}\n",
+    "repo/java/com/acme/util/Strings.java": "class Strings {}\n",
+}
+
+def test_python_specs_cover_relative_multiline_and_skip_strings():
+    specs = extract_import_specs("repo/app/main.py", PROJECT["repo/app/main.py"])
+    assert specs == (("os", ()), ("app", ("models",)), (".services.billing", ("charge", "refund")))
+    assert extract_import_specs("notes.md", "import os\n") == ()
+
+def test_imports_resolve_to_project_files_per_language():
+    graph = build_dependency_graph(PROJECT)
+    assert graph["repo/app/main.py"] == {"repo/app/__init__.py", "repo/app/models.py", "repo/app/services/billing.py"}
+    assert graph["repo/app/models.py"] == {"repo/app/__init__.py", "repo/app/db.py"} # the package and the module
+    assert graph["repo/app/services/billing.py"] == {"repo/app/__init__.py", "repo/app/models.py", "repo/app/db.py"}
+    assert graph["repo/web/src/index.ts"] == {"repo/web/src/api.ts", "repo/web/src/widgets/index.js"}
+    assert graph["repo/web/src/widgets/index.js"] == {"repo/web/src/api.ts"}
+    assert graph["repo/svc/main.go"] == {"repo/svc/store/store.go"} # tests are not dependencies
+    assert graph["repo/java/com/acme/App.java"] == {"repo/java/com/acme/util/Strings.java", "repo/java/com/acme/Config.java"}
+    assert graph["repo/app/db.py"] == set() # stdlib only
+
+def test_go_without_go_mod_matches_the_path_suffix():
+    files = {
+        "src/github.com/x/proj/main.go": 'package main\nimport "github.com/x/proj/store"\n',
+        "src/github.com/x/proj/store/store.go": "package store\n", # GOPATH layout
+    }
+    assert build_dependency_graph(files)["src/github.com/x/proj/main.go"] == {"src/github.com/x/proj/store/store.go"}
+
+def test_summary_lists_central_modules_with_the_root_stripped():
+    summary = summarize_dependency_graph(build_dependency_graph(PROJECT))
+    first, second = summary.splitlines()[:2]
+    assert first.startswith("Most imported modules: app/__init__.py (3), app/db.py (2), app/models.py (2), web/src/api.ts (2)")
+    assert second == "Imports (file -> files it imports):"
+    assert "app/main.py -> app/__init__.py, app/models.py, app/services/billing.py" in summary
+    assert "repo/" not in summary
+
+def test_summary_truncates_to_the_token_budget():
+    graph = build_dependency_graph(PROJECT)
+    summary = summarize_dependency_graph(graph, max_tokens=40)
+    assert summary.splitlines()[-1].endswith("more files with imports omitted")
+    assert summarize_dependency_graph({"a.py": set()}) == "No internal imports were detected between project files."
+
+def test_in_degree_counts_importers():
+    counts = in_degree({"a": {"b", "c"}, "b": {"c"}, "c": set()})
+    assert counts == {"a": 0, "b": 1, "c": 2}
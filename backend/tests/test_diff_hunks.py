@@ -0,0 +1,107 @@
+from utils.diff_hunks import (
+    collect_file_changes,
+    describe_lines,
+    diff_file_sets,
+    extract_changes,
+    parse_unified_diff,
+    render_regions,
+)
+
+DIFF = """diff --git a/app/store.py b/app/store.py
+index 1111111..2222222 100644
+--- a/app/store.py
++++ b/app/store.py
+@@ -10,8 +10,8 @@ class Store:
+     def get(self, key):
+         value = self.data.get(key)
+         if value is None:
+             return None
+-        return value
++        return value.copy()
+         # cached reads
+         # stay here
+         # for now
+@@ -40 +40,2 @@ class Store:
+-    limit = 5
++    limit = 10
++    timeout = 3
+diff --git a/old.py b/old.py
+deleted file mode 100644
+--- a/old.py
++++ /dev/null
+@@ -1,2 +0,0 @@
+-import os
+-print(os.getcwd())
+\\ No newline at end of file
+"""
+
+def test_parse_unified_diff_reads_files_and_hunks():
+    store, old = parse_unified_diff(DIFF)
+    assert (store.path, store.deleted, len(store.hunks)) == ("app/store.py", False, 2)
+    first, second = store.hunks
+    assert (first.old_start, first.new_start, first.new_lines, first.section) == (10, 10, 8, "class Store:")
+    assert first.lines[4:6] == ["-        return value", "+        return value.copy()"]
+    assert (second.old_start, second.new_start, second.new_lines) == (40, 40, 2) # omitted count means 1
+    assert (old.path, old.deleted) == ("old.py", True)
+
+def test_collect_file_changes_separates_deleted_files():
+    changes, deleted = collect_file_changes(parse_unified_diff(DIFF))
+    assert deleted == ["old.py"]
+    assert [change.path for change in changes] == ["app/store.py"]
+    assert changes[0].changed_lines == [14, 40, 41]
+    assert changes[0].removed == 2
+    assert changes[0].file_tokens == 0 # diff only
+
+def test_diff_only_regions_honour_context_lines():
+    store = parse_unified_diff(DIFF)[0]
+    first = extract_changes(store, None, context_lines=1).regions[0]
+    # one line of context below, and up to the enclosing def above
+    assert (first.start_line, first.end_line) == (10, 15)
+    assert first.text.splitlines()[0] == "    def get(self, key):"
+    assert first.text.splitlines()[-1] == "        # cached reads"
+    assert first.scope == "class Store:"
+
+    wide = extract_changes(store, None, context_lines=3).regions[0]
+    assert (wide.start_line, wide.end_line) == (10, 17) # limited to what the hunk carries
+
+def test_diff_only_scope_includes_definitions_above_the_region():
+    diff = """--- a/m.py
++++ b/m.py
+@@ -1,9 +1,9 @@ import os
+ class Store:
+     def get(self, key):
+         a = 1
+         b = 2
+         c = 3
+         d = 4
+-        return a
++        return b
+         e = 5
+ """
+    region = extract_changes(parse_unified_diff(diff)[0], None, context_lines=0).regions[0]
+    assert (region.start_line, region.end_line) == (2, 7)
+    assert region.scope == "class Store:" # the hunk reaches top level, so the stale @@ section is dropped
+
+HEAD = "".join(f"x{n} = {n}\n" for n in range(1, 11)) + (
+    "def compute(a, b):\n"
+    "    total = a + b\n"
+    "    total *= 2\n"
+    "    return total\n"
+) + "".join(f"y{n} = {n}\n" for n in range(1, 11))
+
+def test_head_source_regions_grow_to_the_enclosing_function():
+    base = HEAD.replace("total *= 2", "total *= 3")
+    patch = diff_file_sets({"calc.py": base}, {"calc.py": HEAD})[0]
+    region = extract_changes(patch, HEAD, context_lines=1).regions[0]
+    assert (region.start_line, region.end_line) == (11, 14)
+    assert region.text.startswith("def compute(a, b):\n")
+    assert render_regions(extract_changes(patch, HEAD, context_lines=1)).startswith("L11-14:\ndef compute")
+
+def test_head_source_regions_without_a_function_use_context_lines_and_merge():
+    base = HEAD.replace("x3 = 3", "x3 = 30").replace("x7 = 7", "x7 = 70")
+    patch = diff_file_sets({"calc.py": base}, {"calc.py": HEAD})[0]
+    assert [(r.start_line, r.end_line) for r in extract_changes(patch, HEAD, context_lines=1).regions] == [(2, 4), (6, 8)]
+    assert [(r.start_line, r.end_line) for r in extract_changes(patch, HEAD, context_lines=2).regions] == [(1, 9)]
+
+def test_describe_lines():
+    assert describe_lines([3, 4, 5, 9, 11, 12]) == "3-5, 9, 11-12"
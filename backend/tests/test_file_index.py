@@ -0,0 +1,88 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+import project_graph.nodes as nodes
+from test_project_context import PROJECT, FakeSummarizer
+from utils import file_index as index_module
+from utils.file_index import FileIndex, content_hash, parse_file_sections, split_summary_findings
+
+class Clock:
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = Clock()
+    monkeypatch.setattr(index_module.time, "time", fake.time)
+    return fake
+
+def rows(path) -> int:
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM file_index").fetchone()[0]
+
+def entry(name: str):
+    return {content_hash(name): (name, f"summary of {name}", "")}
+
+def test_sections_and_findings_are_split():
+    sections = parse_file_sections("### FILE: a.py\nDoes a.\nFindings:\n- bug\n### FILE: `b.py`\nDoes b.\n")
+    assert sections == {"a.py": "Does a.\nFindings:\n- bug", "b.py": "Does b."}
+    assert split_summary_findings(sections["a.py"]) == ("Does a.", "- bug")
+    assert split_summary_findings(sections["b.py"]) == ("Does b.", "")
+
+def test_lookup_is_per_model(tmp_path, clock):
+    index = FileIndex(str(tmp_path / "index.db"))
+    index.store(entry("a"), "m1")
+    assert index.lookup([content_hash("a"), content_hash("b")], "m1") == {content_hash("a"): ("summary of a", "")}
+    assert index.lookup([content_hash("a")], "m2") == {}
+
+def test_unused_rows_expire_and_reuse_keeps_them(tmp_path, clock):
+    path = str(tmp_path / "index.db")
+    index = FileIndex(path, ttl_seconds=100, purge_seconds=10)
+    index.store({**entry("a"), **entry("b")}, "m")
+    clock.now += 60
+    assert content_hash("a") in index.lookup([content_hash("a")], "m") # touched
+    clock.now += 60
+    assert index.lookup([content_hash("b")], "m") == {} # expired, even before the purge
+    index.store(entry("c"), "m")
+    assert rows(path) == 2 # b purged on write
+    assert content_hash("a") in index.lookup([content_hash("a")], "m")
+
+def test_size_limit_drops_least_recently_used(tmp_path, clock):
+    path = str(tmp_path / "index.db")
+    index = FileIndex(path, max_entries=2, purge_seconds=0)
+    for name in "abc":
+        index.store(entry(name), "m")
+        clock.now += 1
+    assert set(index.lookup([content_hash(name) for name in "abc"], "m")) == {content_hash("b"), content_hash("c")}
+
+def test_purge_on_open(tmp_path, clock):
+    path = str(tmp_path / "index.db")
+    FileIndex(path).store({**entry("a"), **entry("b")}, "m")
+    FileIndex(path, max_entries=1)
+    assert rows(path) == 1
+
+def test_second_upload_reuses_file_summaries(monkeypatch):
+    monkeypatch.setattr(nodes, "PROJECT_CONTEXT_TOKENS", 2500)
+    monkeypatch.setattr(nodes, "PROJECT_FILE_TOKEN_BUDGET", 1000)
+    llm = FakeSummarizer()
+    monkeypatch.setattr(nodes, "llm2", llm)
+
+    async def incremental(project_files):
+        return [event async for event in nodes.iter_project_context(project_files) if event["type"] == "incremental"]
+
+    first = asyncio.run(incremental(PROJECT))[0]
+    assert first["reused"] == 0 and first["recomputed"] > 0
+    calls = len(llm.prompts)
+    assert asyncio.run(incremental(PROJECT)) == [{"type": "incremental", "reused": first["recomputed"], "recomputed": 0}]
+    assert len(llm.prompts) == calls
+
+    changed = dict(PROJECT)
+    summarized = [name for name in PROJECT if f"File:{name}\n" in "".join(llm.prompts)]
+    changed[summarized[0]] += "# edited\n"
+    third = asyncio.run(incremental(changed))[0]
+    assert (third["reused"], third["recomputed"]) == (first["recomputed"] - 1, 1)
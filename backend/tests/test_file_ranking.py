@@ -0,0 +1,55 @@
+from utils.chunking import estimate_tokens
+from utils.file_ranking import is_low_value, rank_project_files, render_listed_files, select_project_files
+
+def module(name: str, lines: int) -> str:
+    return "".join(f"def {name}_{n}(value):\n    return value * {n}\n" for n in range(lines))
+
+PROJECT = {
+    "app/main.py": "from app import core\n" + module("main", 20),
+    "app/core.py": module("core", 20),
+    "app/util.py": "from app import core\n" + module("util", 20),
+    "app/extra.py": module("extra", 20),
+    "package-lock.json": "{}\n" * 50,
+    "dist/bundle.min.js": "var a=1;" * 400,
+}
+
+def tokens(paths) -> int:
+    return sum(estimate_tokens(path) + estimate_tokens(PROJECT[path]) for path in paths)
+
+def test_low_value_files_are_detected():
+    assert is_low_value("package-lock.json", "{}")
+    assert is_low_value("dist/bundle.min.js", "x")
+    assert is_low_value("app/blob.js", "x" * 5000) # one very long line
+    assert not is_low_value("app/core.py", PROJECT["app/core.py"])
+
+def test_imported_modules_and_entry_points_rank_first():
+    ranked = [path for path, _ in rank_project_files(PROJECT)]
+    assert set(ranked[:2]) == {"app/main.py", "app/core.py"}
+    assert set(ranked[-2:]) == {"package-lock.json", "dist/bundle.min.js"}
+
+def test_everything_useful_goes_verbatim_when_it_fits():
+    selection = select_project_files(PROJECT, context_budget=100_000, token_budget=10)
+    assert list(selection.verbatim) == ["app/main.py", "app/core.py", "app/util.py", "app/extra.py"] # archive order
+    assert selection.summarized == {}
+    assert selection.listed == ["dist/bundle.min.js", "package-lock.json"]
+
+def test_files_past_the_budget_are_summarized_not_dropped():
+    useful = ["app/main.py", "app/core.py", "app/util.py", "app/extra.py"]
+    budget = tokens(["app/main.py", "app/core.py"])
+    selection = select_project_files(PROJECT, context_budget=tokens(useful) - 1, token_budget=budget)
+    assert set(selection.verbatim) == {"app/main.py", "app/core.py"}
+    assert set(selection.summarized) == {"app/util.py", "app/extra.py"}
+    assert selection.summarized["app/util.py"] == PROJECT["app/util.py"]
+    assert selection.listed == ["dist/bundle.min.js", "package-lock.json"]
+
+def test_the_listing_counts_against_the_context():
+    useful = ["app/main.py", "app/core.py", "app/util.py", "app/extra.py"]
+    listing = estimate_tokens(render_listed_files(["dist/bundle.min.js", "package-lock.json"]))
+    fits = select_project_files(PROJECT, context_budget=tokens(useful) + listing, token_budget=10)
+    assert fits.summarized == {}
+    tight = select_project_files(PROJECT, context_budget=tokens(useful) + listing - 1, token_budget=tokens(useful))
+    assert len(tight.summarized) == 1 # without room for the listing, the lowest-ranked file is summarized
+
+def test_render_listed_files():
+    assert render_listed_files([]) == ""
+    assert render_listed_files(["a.lock"]).endswith("(content omitted, lower priority):\n- a.lock\n")
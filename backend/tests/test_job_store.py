@@ -0,0 +1,73 @@
+import asyncio
+import json
+
+import httpx
+
+import graph.nodes as single_nodes
+import main
+from test_single_file_pipeline import SOURCE, StageModel
+from utils import job_store as job_store_module
+from utils.job_store import JobStore
+from utils.pdf_generator import render_single_review_pdf
+from utils.pdf_renderer import pdf_cache, pdf_key
+
+def test_outputs_round_trip_per_kind(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"), ttl_seconds=60)
+    store.save("job", "single", {"review_code": "ok", "test_report": "ünïcode"})
+    assert store.load("job", "single") == {"review_code": "ok", "test_report": "ünïcode"}
+    assert store.load("job", "project") is None
+    assert store.load("other", "single") is None
+
+def test_expired_jobs_are_not_loaded_and_are_purged_on_write(tmp_path, monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(job_store_module.time, "time", lambda: now[0])
+    store = JobStore(str(tmp_path / "jobs.db"), ttl_seconds=60)
+    store.save("old", "single", {"review_code": "a"})
+    now[0] += 61
+    assert store.load("old", "single") is None
+    store.save("new", "single", {"review_code": "b"})
+    assert store._connect().execute("SELECT job_id FROM jobs").fetchall() == [("new",)]
+
+def test_escalations_roll_back_the_stored_output():
+    outputs = {}
+    for event in [
+        {"type": "review", "content": "partial "},
+        {"type": "escalate", "stage": "review", "discard": 8},
+        {"type": "review", "content": "final"},
+        {"type": "test", "content": "report"},
+        {"type": "compaction", "content": "ignored"},
+    ]:
+        main.collect_job_output(outputs, event, main.SINGLE_FILE_OUTPUT_KEYS)
+    assert outputs == {"review_code": "final", "test_report": "report"}
+
+class NoGraph:
+    def invoke(self, state):
+        raise AssertionError("a stored job must not be regenerated")
+
+def test_pdf_export_reuses_the_streamed_job(monkeypatch):
+    model = StageModel(delay=0)
+    monkeypatch.setattr(single_nodes, "llm_small", model)
+    monkeypatch.setattr(single_nodes, "llm", model)
+    monkeypatch.setattr(main, "SingleFileGraph", NoGraph())
+
+    async def stream_then_export():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            streamed = await client.post("/single-review-stream", files={"file": ("cart.py", SOURCE.encode())})
+            events = [json.loads(line) for line in streamed.text.splitlines() if line]
+            job_id = events[0]["job_id"]
+            exported = await client.post("/single-review/pdf", data={"job_id": job_id})
+            missing = await client.post("/single-review/pdf", data={"job_id": "unknown"})
+            return events, exported, missing
+
+    events, exported, missing = asyncio.run(stream_then_export())
+    assert events[0]["type"] == "job"
+    streamed = {
+        kind: "".join(event["content"] for event in events if event["type"] == kind)
+        for kind in ("review", "test", "refactor")
+    }
+    assert exported.status_code == 200 and exported.content.startswith(b"%PDF")
+    # the PDF was rendered from exactly the streamed text
+    key = pdf_key(render_single_review_pdf, (streamed["review"], streamed["test"], streamed["refactor"]))
+    assert pdf_cache.get(key) == exported.content
+    assert (missing.status_code, missing.json()["detail"]) == (404, "Job not found or expired")
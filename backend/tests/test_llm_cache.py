@@ -0,0 +1,98 @@
+import sqlite3
+
+import pytest
+
+from utils import llm_cache as cache_module
+from utils.llm_cache import LLMCache, make_cache_key, replay_tokens
+
+class Clock:
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = Clock()
+    monkeypatch.setattr(cache_module.time, "time", fake.time)
+    return fake
+
+def rows(path) -> int:
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+def test_key_depends_on_model_temperature_and_prompt():
+    base = make_cache_key("gpt-4o", 0, "prompt")
+    assert base == make_cache_key("gpt-4o", 0, "prompt")
+    assert base != make_cache_key("gpt-4o-mini", 0, "prompt")
+    assert base != make_cache_key("gpt-4o", 0.2, "prompt")
+    assert base != make_cache_key("gpt-4o", 0, "prompt ")
+
+def test_replay_tokens_reassemble_the_text():
+    text = "def f(x):\n    return x  # done\n"
+    assert "".join(replay_tokens(text)) == text
+
+def test_memory_tier_evicts_least_recently_used(clock):
+    cache = LLMCache(None, max_memory_bytes=10, ttl_seconds=60)
+    cache.set("a", "aaaa")
+    cache.set("b", "bbbb")
+    assert cache.get("a") == "aaaa" # a is now the most recent
+    cache.set("c", "cccc")
+    assert cache.get("b") is None
+    assert cache.get("a") == "aaaa"
+    assert cache.get("c") == "cccc"
+    assert cache.stats()["memory_bytes"] == 8
+
+def test_oversized_entry_does_not_flush_the_memory_tier(clock):
+    cache = LLMCache(None, max_memory_bytes=10, ttl_seconds=60)
+    cache.set("a", "aaaa")
+    cache.set("big", "x" * 11)
+    assert cache.get("a") == "aaaa"
+    assert cache.get("big") is None
+
+def test_empty_responses_are_not_cached(clock):
+    cache = LLMCache(None, max_memory_bytes=100, ttl_seconds=60)
+    cache.set("a", "")
+    assert cache.get("a") is None
+
+def test_memory_entries_expire(clock):
+    cache = LLMCache(None, max_memory_bytes=100, ttl_seconds=60)
+    cache.set("a", "answer")
+    clock.now += 60
+    assert cache.get("a") == "answer"
+    clock.now += 1
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert (stats["memory_hits"], stats["misses"], stats["memory_entries"], stats["memory_bytes"]) == (1, 1, 0, 0)
+
+def test_disk_tier_serves_other_instances_until_the_ttl(tmp_path, clock):
+    path = str(tmp_path / "cache.sqlite3")
+    LLMCache(path, max_memory_bytes=100, ttl_seconds=60).set("a", "answer")
+    reader = LLMCache(path, max_memory_bytes=100, ttl_seconds=60)
+    clock.now += 30
+    assert reader.get("a") == "answer"
+    assert reader.stats()["disk_hits"] == 1
+    clock.now += 31 # promoted entry keeps the row's expiry, not a fresh one
+    assert reader.get("a") is None
+
+def test_expired_rows_are_deleted_on_open(tmp_path, clock):
+    path = str(tmp_path / "cache.sqlite3")
+    writer = LLMCache(path, max_memory_bytes=100, ttl_seconds=60)
+    writer.set("old", "stale")
+    clock.now += 30
+    writer.set("new", "fresh")
+    clock.now += 31
+    LLMCache(path, max_memory_bytes=100, ttl_seconds=60)
+    assert rows(path) == 1
+
+def test_expired_rows_are_deleted_periodically_on_write(tmp_path, clock):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = LLMCache(path, max_memory_bytes=100, ttl_seconds=60, purge_seconds=120)
+    cache.set("old", "stale")
+    clock.now += 100
+    cache.set("new", "fresh")
+    assert rows(path) == 2 # purge not due yet
+    clock.now += 20
+    cache.set("newer", "fresher")
+    assert rows(path) == 2
@@ -0,0 +1,97 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from utils.llm_scheduler import PRIORITY_BATCH, PRIORITY_INTERACTIVE, LLMScheduler, SchedulerOverloaded, _ModelQueue
+
+def wait_for(condition, timeout: float = 2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+def test_buckets_refill_at_the_per_minute_rate_up_to_their_size():
+    queue = _ModelQueue(rpm=60, tpm=600, concurrency=4)
+    queue.request_tokens, queue.token_tokens, queue.updated_at = 0.0, 0.0, 100.0
+    queue.refill(106.0)
+    assert queue.request_tokens == pytest.approx(6)
+    assert queue.token_tokens == pytest.approx(60)
+    queue.refill(1000.0)
+    assert (queue.request_tokens, queue.token_tokens) == (60, 600)
+
+def test_wait_covers_whichever_bucket_is_shorter():
+    queue = _ModelQueue(rpm=60, tpm=600, concurrency=4)
+    queue.request_tokens, queue.token_tokens = 1.0, 60.0
+    assert queue.seconds_until_ready(60) == 0
+    assert queue.seconds_until_ready(120) == pytest.approx(6) # 60 tokens at 10/s
+    queue.request_tokens = 0.5
+    assert queue.seconds_until_ready(60) == pytest.approx(0.5) # half a request at 1/s
+
+def test_release_settles_the_reservation_against_actual_usage():
+    scheduler = LLMScheduler({"m": {"rpm": 1000, "tpm": 6000, "concurrency": 4}})
+    scheduler.acquire("m", 1000)
+    queue = scheduler._queue("m")
+    assert queue.token_tokens == pytest.approx(5000, abs=20)
+    scheduler.release("m", 1000, 400)
+    assert queue.token_tokens == pytest.approx(5600, abs=20)
+    assert queue.in_flight == 0
+
+def test_interactive_calls_are_granted_before_queued_batch_calls():
+    scheduler = LLMScheduler({"m": {"rpm": 1000, "tpm": 100000, "concurrency": 1}})
+    scheduler.acquire("m", 10) # holds the only slot
+    granted = []
+
+    def call(name, priority):
+        scheduler.acquire("m", 10, priority)
+        granted.append(name)
+        scheduler.release("m", 10, 10)
+
+    threads = []
+    for name, priority in (("batch", PRIORITY_BATCH), ("interactive", PRIORITY_INTERACTIVE)):
+        thread = threading.Thread(target=call, args=(name, priority))
+        thread.start()
+        threads.append(thread)
+        wait_for(lambda: scheduler.stats()["m"]["queue_depth"] == len(threads))
+    scheduler.release("m", 10, 10)
+    for thread in threads:
+        thread.join(2)
+    assert granted == ["interactive", "batch"]
+
+def test_calls_wait_for_the_token_bucket():
+    scheduler = LLMScheduler({"m": {"rpm": 1000, "tpm": 600, "concurrency": 4}})
+    scheduler.acquire("m", 600) # drains the bucket; refills at 10 tokens/s
+    started = time.monotonic()
+    scheduler.acquire("m", 3)
+    assert time.monotonic() - started >= 0.2
+
+def test_admission_rejects_once_the_queue_holds_its_capacity():
+    scheduler = LLMScheduler({"m": {"rpm": 1000, "tpm": 100, "concurrency": 1}})
+    scheduler.acquire("m", 10)
+    waiter = threading.Thread(target=scheduler.acquire, args=("m", 150))
+    waiter.start()
+    wait_for(lambda: scheduler.stats()["m"]["queue_depth"] == 1)
+    with pytest.raises(SchedulerOverloaded):
+        scheduler.check_admission("m", 100) # 150 + 100 tokens > 2 minutes of TPM
+    scheduler.check_admission("m", 50)
+    assert scheduler.stats()["m"]["rejected"] == 1
+    scheduler.release("m", 10, 10)
+    waiter.join(2)
+
+def test_cancelled_async_waiter_leaves_the_queue():
+    scheduler = LLMScheduler({"m": {"rpm": 1000, "tpm": 100000, "concurrency": 1}})
+    scheduler.acquire("m", 10)
+
+    async def cancel_waiter():
+        task = asyncio.create_task(scheduler.aacquire("m", 10))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_waiter())
+    scheduler.release("m", 10, 10)
+    wait_for(lambda: scheduler.stats()["m"]["queued_tokens"] == 0)
+    stats = scheduler.stats()["m"]
+    assert (stats["in_flight"], stats["queued_tokens"], stats["granted"]) == (0, 0, 1)
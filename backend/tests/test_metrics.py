@@ -0,0 +1,93 @@
+import asyncio
+import re
+
+import httpx
+import pytest
+
+import main
+from utils import metrics
+from utils.metrics import MetricsRegistry, Span, render_prometheus, request_timing_summary, span, start_request_timings, timed
+
+SAMPLE_RE = re.compile(r'^[a-z0-9_]+(\{[a-z_]+="(?:[^"\\]|\\.)*"(,[a-z_]+="(?:[^"\\]|\\.)*")*\})? -?[0-9.e+]+$')
+
+@pytest.fixture
+def registry(monkeypatch):
+    fresh = MetricsRegistry()
+    monkeypatch.setattr(metrics, "metrics_registry", fresh)
+    return fresh
+
+def finished(name: str, seconds: float, ttft=None, prompt_tokens: int = 0, output_tokens: int = 0) -> Span:
+    item = Span(name, None)
+    item.seconds, item.ttft = seconds, ttft
+    item.prompt_tokens, item.output_tokens = prompt_tokens, output_tokens
+    return item
+
+SCHEDULER = {"gpt-4o": {"queue_depth": 2, "in_flight": 1, "granted": 9, "rejected": 0, "wait_p95_seconds": 0.5}}
+ROUTER = {"review": {"first_model": {"gpt-4o-mini": 3}, "escalations": {"empty output": 1}, "escalation_rate": 0.3333}}
+
+def test_histograms_are_cumulative_with_sum_and_count(registry):
+    registry.record(finished("stage", 0.02))
+    registry.record(finished("stage", 0.3))
+    registry.record(finished("stage", 1000))
+    text = render_prometheus({}, {})
+    assert 'codexa_stage_duration_seconds_bucket{stage="stage",le="0.025"} 1' in text
+    assert 'codexa_stage_duration_seconds_bucket{stage="stage",le="0.5"} 2' in text
+    assert 'codexa_stage_duration_seconds_bucket{stage="stage",le="300"} 2' in text
+    assert 'codexa_stage_duration_seconds_bucket{stage="stage",le="+Inf"} 3' in text
+    assert 'codexa_stage_duration_seconds_sum{stage="stage"} 1000.320000' in text
+    assert 'codexa_stage_duration_seconds_count{stage="stage"} 3' in text
+
+def test_tokens_ttft_and_speed_are_exported(registry):
+    registry.record(finished("llm.gpt-4o", 3.0, ttft=1.0, prompt_tokens=500, output_tokens=100))
+    text = render_prometheus({}, {})
+    assert 'codexa_stage_ttft_seconds_count{stage="llm.gpt-4o"} 1' in text
+    assert 'codexa_stage_prompt_tokens_total{stage="llm.gpt-4o"} 500' in text
+    assert 'codexa_stage_output_tokens_total{stage="llm.gpt-4o"} 100' in text
+    assert 'codexa_stage_tokens_per_second{stage="llm.gpt-4o"} 50.00' in text
+
+def test_every_sample_is_valid_exposition_format(registry):
+    registry.record(finished('odd "name" \\ here', 0.1))
+    text = render_prometheus(
+        {"memory_hits": 1, "disk_hits": 2, "misses": 3}, SCHEDULER, ROUTER,
+        {"original_tokens": 100, "compacted_tokens": 80},
+    )
+    assert text.endswith("\n")
+    for line in text.splitlines():
+        if line.startswith("#"):
+            assert re.match(r"^# (HELP|TYPE) [a-z0-9_]+ .+$", line)
+        else:
+            assert SAMPLE_RE.match(line), line
+    assert 'stage="odd \\"name\\" \\\\ here"' in text
+    assert 'codexa_llm_cache_lookups_total{result="disk_hit"} 2' in text
+    assert 'codexa_llm_queue_depth{model="gpt-4o"} 2' in text
+    assert 'codexa_router_escalations_total{task="review",reason="empty output"} 1' in text
+    assert 'codexa_prompt_compaction_tokens_total{kind="compacted"} 80' in text
+
+def test_nested_spans_roll_tokens_up_and_feed_request_timings(registry):
+    @timed("node")
+    async def node():
+        with span("llm.model", "x" * 400):
+            pass
+        return "done"
+
+    async def request():
+        start_request_timings()
+        await node()
+        return request_timing_summary()
+
+    summary = asyncio.run(request())
+    assert summary["llm.model"]["prompt_tokens"] == summary["node"]["prompt_tokens"] > 0
+    assert summary["node"]["count"] == 1
+    assert set(registry.snapshot()) == {"node", "llm.model"}
+    assert request_timing_summary() is None # outside a request with timings
+
+def test_metrics_endpoint_serves_text_format():
+    async def scrape():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get("/metrics")
+
+    response = asyncio.run(scrape())
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE codexa_stage_duration_seconds histogram" in response.text
@@ -0,0 +1,98 @@
+import asyncio
+import uuid
+
+import pytest
+
+from utils import model_router as router_module
+from utils.model_router import Escalation, ModelRouter, cascade_ainvoke, cascade_astream, check_output
+
+REVIEW = "1. Issue: slow loop\nSeverity: Low\nRecommended Fix: use a set\n"
+TESTS = "test_empty STATUS: PASS\ntest_full STATUS: PASS\nALL TESTS PASSED\n"
+SOURCE = "def add(a, b):\n    total = a + b\n    return total\n"
+
+@pytest.mark.parametrize("task, text, source, failure", [
+    ("review", REVIEW, None, None),
+    ("review", "No issues found.", None, None), # short, but the prompt's whole answer for clean code
+    ("review", REVIEW.replace("Recommended Fix: use a set\n", "") + " " * 40 + "x", None, "last issue truncated"),
+    ("review", "Looks fine to me overall, nothing much to add here.", None, "no issue sections"),
+    ("review", "ok", None, "empty output"),
+    ("test", TESTS, None, None),
+    ("test", TESTS.replace("ALL TESTS PASSED", "and more"), None, "missing summary line"),
+    ("refactor", "```python\n" + SOURCE + "```", SOURCE, None),
+    ("refactor", "def add(a, b:\n    return a + b\n    # tidied\n", SOURCE, "refactored Python does not parse"),
+    ("refactor", "def add(a, b):\n    return a + b  # the rest is unchanged\n", SOURCE * 10, "much shorter than the input"),
+    ("INTERVIEW", "Answer: yes\n" * 19, None, "19 of 20 answers"),
+    ("DOCUMENTATION", "# Tool\n## Installation\npip\n## Usage\n```\nrun\n```\n", None, None),
+    ("DOCUMENTATION", "# Tool\n## Installation\npip\n## Usage\n```\nrun\n", None, "unclosed code block"),
+    ("PROJECT_REVIEW", "".join(f"{n}. Section\n" for n in range(1, 14)), None, "missing sections 14-15 of 15"),
+    ("unknown_task", "anything long enough to pass the minimum length", None, None),
+])
+def test_quality_checks(task, text, source, failure):
+    assert check_output(task, text, source) == failure
+
+def test_routes_pick_the_first_model():
+    router = ModelRouter()
+    small, large = "small", "large"
+    assert router.route("review", 100, small, large) == ((small, large), "default")
+    assert router.route("review", 10**6, small, large) == ((large,), "prompt_size")
+    assert router.route("review", 100, small, large, complexity=99) == ((large,), "complexity")
+    assert router.route("INTERVIEW", 10**6, small, large) == ((small, large), "task") # small first whatever the size
+
+class Reply:
+    def __init__(self, content: str):
+        self.content = content
+
+class Scripted:
+    def __init__(self, reply: str):
+        self.model_name = f"fake-{uuid.uuid4().hex}"
+        self.temperature = 0.2
+        self.reply = reply
+        self.calls = 0
+
+    async def ainvoke(self, prompt_text: str, **kwargs):
+        self.calls += 1
+        return Reply(self.reply)
+
+    async def astream(self, prompt_text: str, **kwargs):
+        self.calls += 1
+        for word in self.reply.split(" "):
+            yield Reply(word + " ")
+
+@pytest.fixture
+def router(monkeypatch):
+    fresh = ModelRouter()
+    monkeypatch.setattr(router_module, "model_router", fresh)
+    return fresh
+
+def test_failed_small_output_escalates_to_the_large_model(router):
+    small, large = Scripted("ok"), Scripted(TESTS)
+    text = asyncio.run(cascade_ainvoke("test", f"prompt {uuid.uuid4()}", small, large))
+    assert text == TESTS and (small.calls, large.calls) == (1, 1)
+    stats = router.stats()["test"]
+    assert stats["escalations"] == {"empty output": 1}
+    assert stats["final_model"] == {large.model_name: 1}
+    assert stats["escalation_rate"] == 1.0
+
+def test_passing_small_output_is_final(router):
+    small, large = Scripted(TESTS), Scripted(TESTS)
+    asyncio.run(cascade_ainvoke("test", f"prompt {uuid.uuid4()}", small, large))
+    assert (small.calls, large.calls) == (1, 0)
+    assert router.stats()["test"]["escalation_rate"] == 0.0
+
+def test_streamed_escalation_tells_the_consumer_what_to_discard(router):
+    small, large = Scripted("too short"), Scripted(TESTS)
+
+    async def collect():
+        stream = lambda model, text: (token.content async for token in model.astream(text))
+        return [item async for item in cascade_astream("test", f"prompt {uuid.uuid4()}", small, large, stream)]
+
+    items = asyncio.run(collect())
+    escalation = next(item for item in items if isinstance(item, Escalation))
+    before = items[:items.index(escalation)]
+    assert escalation == Escalation(len("".join(before)), large.model_name, "empty output")
+    assert "".join(items[items.index(escalation) + 1:]).split() == TESTS.split()
+
+def test_last_model_is_final_even_when_its_check_fails(router):
+    small, large = Scripted("no"), Scripted("still no")
+    assert asyncio.run(cascade_ainvoke("test", f"prompt {uuid.uuid4()}", small, large)) == "still no"
+    assert router.stats()["test"]["final_model"] == {large.model_name: 1}
@@ -0,0 +1,84 @@
+import asyncio
+import uuid
+from concurrent.futures import Executor, Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from utils import pdf_renderer
+from utils.pdf_renderer import PdfCache, code_blocks, pdf_key, pdf_styles, render_pdf
+from utils.project_pdf_generator import render_project_pdf
+
+def test_cache_evicts_least_recent_by_count_and_bytes():
+    cache = PdfCache(max_entries=2, max_bytes=10)
+    cache.put("a", b"aaaa")
+    cache.put("b", b"bbbb")
+    assert cache.get("a") == b"aaaa" # a is now the most recent
+    cache.put("c", b"cc")
+    assert cache.get("b") is None and cache.get("a") == b"aaaa"
+    cache.put("d", b"dddddddd") # 4 + 8 bytes is over the limit
+    assert cache.get("a") is None and cache.get("d") == b"dddddddd"
+    cache.put("huge", b"x" * 11) # bigger than the whole cache, not stored
+    assert cache.get("huge") is None
+    assert cache.stats() == {"entries": 1, "bytes": 8, "hits": 3, "misses": 3}
+
+def test_key_covers_the_renderer_and_every_argument():
+    key = pdf_key(render_project_pdf, ("Title", "body"))
+    assert key == pdf_key(render_project_pdf, ("Title", "body"))
+    assert key != pdf_key(render_project_pdf, ("Title", "body "))
+    assert key != pdf_key(render_project_pdf, ("Title body", ""))
+    assert key != pdf_key(code_blocks, ("Title", "body"))
+
+def test_long_text_is_split_into_page_sized_blocks():
+    blocks = code_blocks("\n".join(f"line {n}" for n in range(130)), pdf_styles()["code"])
+    assert len(blocks) == 3 # 60 + 60 + 10 lines
+
+renders = []
+
+def counting_render(title: str, content: str) -> bytes:
+    renders.append(content)
+    return render_project_pdf(title, content)
+
+def test_second_render_is_served_from_the_cache(monkeypatch):
+    monkeypatch.setattr(pdf_renderer, "PDF_RENDER_PROCESSES", 0)
+    content = f"report {uuid.uuid4()}"
+    first = asyncio.run(render_pdf("pdf.test", counting_render, "Title", content))
+    second = asyncio.run(render_pdf("pdf.test", counting_render, "Title", content))
+    assert first.startswith(b"%PDF") and second == first
+    assert renders.count(content) == 1
+
+def test_tiny_output_is_an_error(monkeypatch):
+    monkeypatch.setattr(pdf_renderer, "PDF_RENDER_PROCESSES", 0)
+    with pytest.raises(RuntimeError, match="PDF generation failed"):
+        asyncio.run(render_pdf("pdf.test", lambda content: b"%PDF", str(uuid.uuid4())))
+
+class BrokenPool(Executor):
+    def __init__(self):
+        self.submitted = 0
+
+    def submit(self, fn, *args, **kwargs):
+        self.submitted += 1
+        future = Future()
+        future.set_exception(BrokenProcessPool("worker died"))
+        return future
+
+def test_broken_pool_falls_back_to_a_thread_and_is_reset(monkeypatch):
+    pool = BrokenPool()
+    monkeypatch.setattr(pdf_renderer, "PDF_RENDER_PROCESSES", 2)
+    monkeypatch.setattr(pdf_renderer, "PDF_POOL_MIN_CHARS", 0)
+    monkeypatch.setattr(pdf_renderer, "_pool", pool)
+    data = asyncio.run(render_pdf("pdf.test", render_project_pdf, "Title", f"report {uuid.uuid4()}"))
+    assert data.startswith(b"%PDF")
+    assert pool.submitted == 1
+    assert pdf_renderer._pool is None # respawned on the next large report
+
+def test_large_reports_render_in_a_worker_process(monkeypatch):
+    monkeypatch.setattr(pdf_renderer, "PDF_RENDER_PROCESSES", 1)
+    monkeypatch.setattr(pdf_renderer, "PDF_POOL_MIN_CHARS", 0)
+    monkeypatch.setattr(pdf_renderer, "_pool", None)
+    try:
+        data = asyncio.run(render_pdf("pdf.test", render_project_pdf, "Title", f"report {uuid.uuid4()}"))
+        assert data.startswith(b"%PDF")
+        assert pdf_renderer._pool is not None
+    finally:
+        pdf_renderer.shutdown_render_pool()
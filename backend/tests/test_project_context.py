@@ -0,0 +1,87 @@
+import asyncio
+import re
+import uuid
+
+import pytest
+
+import project_graph.nodes as nodes
+
+class Reply:
+    def __init__(self, content: str):
+        self.content = content
+
+class FakeSummarizer:
+    # stands in for the map model: one "### FILE:" section per framed file
+    def __init__(self, padding: int = 0):
+        self.model_name = f"fake-{uuid.uuid4().hex}" # fresh LLM cache and file index keys
+        self.temperature = 0.2
+        self.padding = padding
+        self.prompts = []
+
+    async def ainvoke(self, prompt_text: str):
+        self.prompts.append(prompt_text)
+        names = re.findall(r"^File:(.+)$", prompt_text, re.MULTILINE)
+        return Reply("".join(
+            f"### FILE: {name}\nSummary of {name}. {'detail ' * self.padding}\nFindings:\n- None\n"
+            for name in names
+        ))
+
+def module(name: str, lines: int = 40) -> str:
+    return "".join(f"def {name}_{n}(value):\n    return value * {n}\n" for n in range(lines))
+
+PROJECT = {
+    "app/main.py": "from app import core\n" + module("main"),
+    "app/core.py": module("core"),
+    **{f"app/feature_{n}.py": module(f"feature_{n}") for n in range(8)},
+    "package-lock.json": "{}\n" * 50,
+}
+
+async def collect(project_files):
+    return [event async for event in nodes.iter_project_context(project_files)]
+
+@pytest.fixture
+def small_context(monkeypatch):
+    monkeypatch.setattr(nodes, "PROJECT_CONTEXT_TOKENS", 2500)
+    monkeypatch.setattr(nodes, "PROJECT_FILE_TOKEN_BUDGET", 1000)
+    monkeypatch.setattr(nodes, "MAP_BATCH_TOKENS", 1000)
+
+def install(monkeypatch, llm):
+    monkeypatch.setattr(nodes, "llm2", llm)
+    return llm
+
+def test_project_that_fits_goes_verbatim(monkeypatch):
+    llm = install(monkeypatch, FakeSummarizer())
+    events = asyncio.run(collect(PROJECT))
+    assert events[0] == {"type": "ranking", "selected": 10, "summarized": 0, "omitted": 1}
+    assert not any(event.get("stage") == "map" for event in events)
+    assert "File:app/feature_7.py\ndef feature_7_0" in events[-1]["content"]
+    assert llm.prompts == []
+
+def test_files_past_the_context_are_mapped_and_reduced(monkeypatch, small_context):
+    llm = install(monkeypatch, FakeSummarizer())
+    events = asyncio.run(collect(PROJECT))
+    ranking = events[0]
+    assert ranking["type"] == "ranking" and ranking["summarized"] > 0 and ranking["omitted"] == 1
+    assert {"type": "incremental", "reused": 0, "recomputed": ranking["summarized"]} in events
+
+    maps = [event for event in events if event.get("stage") == "map"]
+    assert maps[0]["completed"] == 0 and maps[-1]["completed"] == maps[-1]["total"] == len(llm.prompts) > 1
+    assert {event["round"] for event in maps} == {1}
+    assert events[-2] == {"type": "progress", "stage": "reduce"}
+
+    context = events[-1]["content"]
+    assert context.startswith("\nFile:app/main.py\nfrom app import core")
+    assert "Below are summaries of them." in context
+    summarized = [name for name in PROJECT if f"File:{name}\nSummary of {name}." in context]
+    assert len(summarized) == ranking["summarized"]
+    assert "- package-lock.json" in context
+    assert nodes.estimate_tokens(context) <= nodes.PROJECT_CONTEXT_TOKENS
+
+def test_summaries_over_the_budget_get_another_reduce_round(monkeypatch, small_context):
+    install(monkeypatch, FakeSummarizer(padding=300))
+    events = asyncio.run(collect(PROJECT))
+    rounds = {event["round"] for event in events if event.get("stage") == "map"}
+    assert rounds >= {1, 2}
+    context = events[-1]["content"]
+    assert "File:Batch 1 summary\n" in context
+    assert "- package-lock.json" in context
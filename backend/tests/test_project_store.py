@@ -0,0 +1,56 @@
+import pytest
+
+from utils import project_store
+from utils.project_store import ProjectFiles, file_bytes, file_text_length, render_project_files
+
+SOURCES = {
+    "a.py": "x = 1\n",
+    "b/ü.py": "name = 'naïve — ok'\n", # multi-byte characters
+    "c.js": "const c = 3;\n",
+}
+
+def build(sources=SOURCES) -> ProjectFiles:
+    files = ProjectFiles()
+    for path, content in sources.items():
+        files.add_source(path, content.encode("utf-8"))
+    return files.seal()
+
+def test_reads_like_a_dict_in_upload_order():
+    files = build()
+    assert dict(files) == SOURCES
+    assert list(files) == list(SOURCES)
+    assert "a.py" in files and "missing.py" not in files
+    assert files.nbytes == sum(len(content.encode("utf-8")) for content in SOURCES.values())
+
+def test_offsets_give_each_files_bytes_and_text_length():
+    files = build()
+    assert bytes(files.raw("b/ü.py")) == SOURCES["b/ü.py"].encode("utf-8")
+    assert files.text_length("b/ü.py") == len(SOURCES["b/ü.py"]) < len(files.raw("b/ü.py"))
+    assert file_bytes(files, "c.js") == file_bytes(SOURCES, "c.js") # same hash input either way
+    assert file_text_length(files, "b/ü.py") == file_text_length(SOURCES, "b/ü.py")
+    assert render_project_files(files) == render_project_files(SOURCES)
+
+def test_blank_and_undecodable_files():
+    files = ProjectFiles()
+    assert not files.add_source("empty.py", b"  \n")
+    assert files.add_source("latin.py", b"caf\xe9 = 1\n")
+    files.seal()
+    assert dict(files) == {"latin.py": "caf = 1\n"} # invalid bytes dropped, as before
+
+def test_sealed_files_reject_writes():
+    files = build()
+    with pytest.raises(RuntimeError):
+        files.add_source("late.py", b"x = 1\n")
+
+def test_large_uploads_spill_to_a_memory_mapped_file(monkeypatch):
+    monkeypatch.setattr(project_store, "PROJECT_SPOOL_MAX_BYTES", 16)
+    sources = {f"m{n}.py": f"value_{n} = {n}\n" * 3 for n in range(5)}
+    files = build(sources)
+    assert files._map is not None and files._pending is None
+    assert dict(files) == sources # including the files written before the spill
+    assert files.nbytes == sum(len(content) for content in sources.values())
+
+def test_small_uploads_stay_in_memory():
+    files = build()
+    assert files._map is None and files._spill is None
+    assert files.raw("a.py").readonly
@@ -0,0 +1,81 @@
+import pytest
+
+from utils.prompt_compaction import (
+    LineReferenceMapper,
+    compact_source,
+    detect_language,
+    invert_line_map,
+    map_line_references,
+)
+
+SOURCE = """#!/usr/bin/env python
+# Copyright (c) 2024 Example Corp.
+# Licensed under the MIT License.
+# Permission is hereby granted, free of charge.
+import os
+# ==========================================
+
+
+def main():
+    return os.getcwd()
+"""
+
+def test_license_header_banner_and_blank_runs_are_removed():
+    compacted = compact_source(SOURCE, "tool.py")
+    assert compacted.text == (
+        "#!/usr/bin/env python\n"
+        "# [lines 2-4 omitted: license header]\n"
+        "import os\n"
+        "\n"
+        "def main():\n"
+        "    return os.getcwd()\n"
+    )
+    assert compacted.line_map == [1, 2, 5, 7, 9, 10]
+    assert compacted.compacted_tokens < compacted.original_tokens
+
+def test_unchanged_file_has_an_empty_line_map():
+    code = "def f():\n    return 1\n"
+    compacted = compact_source(code, "f.py")
+    assert (compacted.text, compacted.line_map) == (code, [])
+
+@pytest.mark.parametrize("file_name, line, removed", [
+    ("a.py", "# ----------", True),
+    ("a.js", "// ==========", True),
+    ("a.sql", "-- **********", True),
+    ("a.py", "// ==========", False), # not this file's comment syntax
+    ("a.md", "----------", False), # setext heading underline
+    ("a.py", "x = 1 # ----------", False),
+])
+def test_banners_only_in_the_files_own_comment_syntax(file_name, line, removed):
+    code = f"a = 1\n{line}\nb = 2\n"
+    assert (line not in compact_source(code, file_name).text) is removed
+
+def test_inline_base64_blobs_are_summarised():
+    blob = "QUJD" * 40
+    compacted = compact_source(f'ICON = "{blob}"\n', "icon.py")
+    assert compacted.text == 'ICON = "<base64 blob, 160 chars>"\n'
+
+def test_invert_line_map_points_removed_lines_at_the_kept_line_above():
+    line_map = [1, 2, 5, 7, 9, 10]
+    assert invert_line_map(line_map, 10) == [1, 2, 2, 2, 3, 3, 4, 4, 5, 6]
+
+def test_line_references_map_back_to_the_original_numbering():
+    line_map = [1, 2, 5, 7, 9, 10]
+    text = "Bug on line 5, see lines 3-4 and L6; line 40 is out of range."
+    assert map_line_references(text, line_map) == "Bug on line 9, see lines 5-7 and L10; line 40 is out of range."
+    assert map_line_references(text, []) == text
+
+def test_streamed_references_split_across_tokens_are_mapped():
+    line_map = [1, 2, 5, 7, 9, 10]
+    mapper = LineReferenceMapper(line_map)
+    tokens = ["Issue at Li", "ne", "s 3", "-", "4 and ", "L", "6", " here"]
+    streamed = "".join(mapper.feed(token) for token in tokens) + mapper.flush()
+    assert streamed == "Issue at Lines 5-7 and L10 here"
+
+@pytest.mark.parametrize("file_name, code, language", [
+    ("app.ts", "", "TypeScript"),
+    ("script", "#!/usr/bin/env python3\nprint(1)\n", "Python"),
+    ("run", "#!/bin/bash\necho hi\n", "Shell"),
+])
+def test_detect_language(file_name, code, language):
+    assert detect_language(file_name, code) == language
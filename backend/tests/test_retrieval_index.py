@@ -0,0 +1,89 @@
+import threading
+
+from utils.project_store import ProjectFiles
+from utils.retrieval_index import BM25Index, RetrievalCache, project_hash, render_hits, tokenize
+
+PROJECT = {
+    "app/auth.py": (
+        "def getUserToken(request):\n"
+        "    header = request.headers.get('Authorization')\n"
+        "    return header.split()[1]\n"
+    ),
+    "app/billing.py": (
+        "def charge_invoice(invoice, amount):\n"
+        "    invoice.total += amount\n"
+        "    return invoice\n"
+    ),
+    "app/reports.py": (
+        "def monthly_report(invoices):\n"
+        "    # totals of every invoice, every invoice line, every invoice tax\n"
+        "    return sum(invoice.total for invoice in invoices)\n"
+    ),
+}
+
+def test_tokenize_splits_identifiers_and_drops_stopwords():
+    assert tokenize("getUserToken") == ["getusertoken", "get", "user", "token"]
+    assert tokenize("charge_invoice") == ["charge_invoice", "charge", "invoice"]
+    assert tokenize("HTTPServer") == ["httpserver", "http", "server"]
+    assert tokenize("what is the return of self") == []
+
+def test_search_ranks_the_matching_chunk_first():
+    index = BM25Index(PROJECT)
+    hits = index.search("where is the user token read?")
+    assert hits[0].chunk.path == "app/auth.py"
+    assert (hits[0].chunk.start_line, hits[0].chunk.end_line) == (1, 3)
+
+def test_file_path_terms_are_indexed():
+    hits = BM25Index(PROJECT).search("billing")
+    assert [hit.chunk.path for hit in hits] == ["app/billing.py"]
+
+def test_rare_terms_outweigh_common_ones():
+    index = BM25Index(PROJECT)
+    hits = index.search("invoice amount")
+    assert hits[0].chunk.path == "app/billing.py" # "amount" only appears there
+    assert {hit.chunk.path for hit in hits} == {"app/billing.py", "app/reports.py"}
+    assert all(first.score >= second.score for first, second in zip(hits, hits[1:]))
+
+def test_search_respects_k_and_unknown_terms():
+    index = BM25Index(PROJECT)
+    assert len(index.search("invoice", k=1)) == 1
+    assert index.search("kubernetes") == []
+
+def test_project_hash_matches_across_containers_and_tracks_content():
+    files = ProjectFiles()
+    for path, content in PROJECT.items():
+        files.add_source(path, content.encode("utf-8"))
+    assert project_hash(files.seal()) == project_hash(PROJECT)
+    assert project_hash({**PROJECT, "app/auth.py": "pass\n"}) != project_hash(PROJECT)
+
+def test_render_hits_uses_file_framing_with_line_ranges():
+    hits = BM25Index(PROJECT).search("token", k=1)
+    assert render_hits(hits).startswith("\nFile:app/auth.py (lines 1-3)\ndef getUserToken")
+
+def test_cache_builds_once_per_upload_and_evicts_least_recent():
+    cache = RetrievalCache(max_entries=1)
+    first, cached = cache.get_or_build(PROJECT)
+    assert not cached
+    again, cached = cache.get_or_build(PROJECT)
+    assert cached and again is first
+    cache.get_or_build({"other.py": "x = 1\n"})
+    _, cached = cache.get_or_build(PROJECT)
+    assert not cached
+    assert cache.stats()["builds"] == 3
+
+def test_concurrent_requests_share_one_build():
+    cache = RetrievalCache(max_entries=4)
+    results = []
+    barrier = threading.Barrier(8)
+
+    def lookup():
+        barrier.wait()
+        results.append(cache.get_or_build(PROJECT)[0])
+
+    threads = [threading.Thread(target=lookup) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert len(results) == 8 and all(index is results[0] for index in results)
+    assert cache.stats()["builds"] == 1
@@ -0,0 +1,131 @@
+import asyncio
+
+import pytest
+
+from utils import run_log as run_log_module
+from utils.run_log import RunLog, RunRegistry, run_key
+
+async def slow_events(count: int, delay: float = 0.01, started: list = None):
+    for n in range(count):
+        if started is not None:
+            started.append(n)
+        await asyncio.sleep(delay)
+        yield {"type": "review", "content": str(n)}
+
+async def take(generator, count: int):
+    events = []
+    async for event in generator:
+        events.append(event)
+        if len(events) == count:
+            break
+    await generator.aclose()
+    return events
+
+@pytest.fixture
+def grace(monkeypatch):
+    monkeypatch.setattr(run_log_module, "RUN_DETACH_GRACE_SECONDS", 0.05)
+
+def test_events_carry_seq_and_resume_after_the_last_one(grace):
+    async def scenario():
+        run = RunRegistry(60, 1 << 20).start("job", "single", "token", slow_events(5))
+        first = await take(run.follow(), 2)
+        rest = [event async for event in run.follow(after=first[-1]["seq"])]
+        replay = [event async for event in run.follow(after=-1)]
+        return first, rest, replay
+
+    first, rest, replay = asyncio.run(scenario())
+    assert [event["seq"] for event in first] == [0, 1]
+    assert [event["seq"] for event in rest] == [2, 3, 4]
+    assert [event["content"] for event in replay] == ["0", "1", "2", "3", "4"]
+
+def test_run_continues_while_a_client_reconnects_within_the_grace(grace):
+    async def scenario():
+        run = RunRegistry(60, 1 << 20).start("job", "single", "token", slow_events(5))
+        seen = await take(run.follow(), 1)
+        await asyncio.sleep(0.02) # shorter than the grace
+        seen += [event async for event in run.follow(after=seen[-1]["seq"])]
+        return run, seen
+
+    run, seen = asyncio.run(scenario())
+    assert [event["content"] for event in seen] == ["0", "1", "2", "3", "4"]
+    assert run.finished and not run.task.cancelled()
+
+def test_abandoned_run_is_cancelled_after_the_grace(grace):
+    started = []
+
+    async def scenario():
+        run = RunRegistry(60, 1 << 20).start("job", "single", "token", slow_events(100, 0.01, started))
+        await take(run.follow(), 1)
+        await asyncio.sleep(0.2)
+        return run
+
+    run = asyncio.run(scenario())
+    assert run.finished and run.task.cancelled() # the cancellation reaches the task
+    assert run.events[-1]["type"] == "error" and "cancelled" in run.events[-1]["message"]
+    assert len(started) < 30
+
+def test_run_nobody_attaches_to_is_cancelled(grace):
+    async def scenario():
+        run = RunRegistry(60, 1 << 20).start("job", "single", "token", slow_events(100))
+        await asyncio.sleep(0.2)
+        return run
+
+    assert asyncio.run(scenario()).task.cancelled()
+
+def test_produce_reraises_cancellation():
+    async def scenario():
+        run = RunLog("job", "single", "token")
+        task = asyncio.create_task(run.produce(slow_events(100)))
+        await asyncio.sleep(0.02)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return run
+
+    run = asyncio.run(scenario())
+    assert run.finished and run.events[-1]["type"] == "error"
+
+def test_registry_evicts_expired_and_oversized_finished_runs(grace):
+    async def scenario():
+        registry = RunRegistry(ttl_seconds=60, max_bytes=1 << 20)
+        old = registry.start("old", "single", "token", slow_events(1, 0))
+        await old.task
+        old.finished_at -= 61
+        live = registry.start("live", "single", "token", slow_events(100))
+        expired = registry.get("old")
+
+        small = RunRegistry(ttl_seconds=60, max_bytes=1)
+        done = small.start("done", "single", "token", slow_events(1, 0))
+        await done.task
+        running = small.start("running", "single", "token", slow_events(100))
+        kept = (small.get("done"), small.get("running"))
+        live.task.cancel()
+        running.task.cancel()
+        return expired, live, registry.get("live"), kept, running
+
+    expired, live, fetched, (done, running_fetched), running = asyncio.run(scenario())
+    assert expired is None
+    assert fetched is live # in-flight runs are never dropped
+    assert done is None and running_fetched is running # over the byte limit, finished runs go first
+
+def test_join_follows_an_identical_run_only_while_it_generates(grace):
+    async def scenario():
+        registry = RunRegistry(60, 1 << 20)
+        assert registry.join("key") is None
+        run = registry.start("job", "single", "token", slow_events(3), key="key")
+        joined = registry.join("key")
+        replay = [event async for event in joined.follow()]
+        await asyncio.sleep(0) # done callbacks run on the next loop pass
+        return registry, run, joined, replay
+
+    registry, run, joined, replay = asyncio.run(scenario())
+    assert joined is run
+    assert [event["seq"] for event in replay] == [0, 1, 2] # a joined client sees the run from the start
+    assert registry.join("key") is None # finished runs are not shared
+    assert registry.stats()["coalesced"] == 1
+
+def test_run_key_covers_options_and_content():
+    key = run_key("single", "token", "a.py", files=[("a.py", "x = 1\n")])
+    assert key == run_key("single", "token", "a.py", files=[("a.py", b"x = 1\n")]) # str or stored bytes
+    assert key != run_key("single", "frame", "a.py", files=[("a.py", "x = 1\n")])
+    assert key != run_key("single", "token", "a.py", files=[("a.py", "x = 2\n")])
@@ -0,0 +1,113 @@
+import asyncio
+import uuid
+
+import pytest
+
+import graph.nodes as single_nodes
+
+SOURCE = f'''def total_{uuid.uuid4().hex}(items):
+    result = 0
+    for item in items:
+        result += item.price * item.quantity
+    return result
+'''
+
+REPLIES = {
+    "review": "No issues found.",
+    "test": "test_empty_cart STATUS: PASS\ntest_two_items STATUS: PASS\nALL TESTS PASSED",
+    "refactor": SOURCE,
+}
+
+def stage_of(prompt_text: str) -> str:
+    if "Refactor the following" in prompt_text:
+        return "refactor"
+    if "Simulate a full test suite" in prompt_text:
+        return "test"
+    return "review"
+
+class Reply:
+    def __init__(self, content: str):
+        self.content = content
+
+class StageModel:
+    # streams a passing answer per stage and records overlap and cancellation
+    def __init__(self, delay: float = 0.02, fail: str = ""):
+        self.model_name = f"fake-{uuid.uuid4().hex}"
+        self.temperature = 0.2
+        self.delay = delay
+        self.fail = fail
+        self.active = 0
+        self.max_active = 0
+        self.prompts = {}
+        self.cancelled = []
+
+    async def astream(self, prompt_text: str, **kwargs):
+        stage = stage_of(prompt_text)
+        self.prompts[stage] = prompt_text
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            if stage == self.fail:
+                raise RuntimeError(f"{stage} failed")
+            for word in REPLIES[stage].split(" "):
+                await asyncio.sleep(self.delay)
+                yield Reply(word + " ")
+        except asyncio.CancelledError:
+            self.cancelled.append(stage)
+            raise
+        finally:
+            self.active -= 1
+
+@pytest.fixture
+def model(monkeypatch):
+    fake = StageModel()
+    monkeypatch.setattr(single_nodes, "llm_small", fake)
+    monkeypatch.setattr(single_nodes, "llm", fake)
+    return fake
+
+def run_pipeline(state: dict):
+    async def collect():
+        return [event async for event in single_nodes.astream_single_file_pipeline(state)]
+    return asyncio.run(collect())
+
+def test_review_and_test_stream_concurrently_and_refactor_waits_for_the_review(model):
+    state = {"raw_code": SOURCE, "language": "Python", "file_name": "cart.py"}
+    events = run_pipeline(state)
+    types = [event["type"] for event in events]
+    assert types[0] == "compaction" and types[-1] == "done"
+    assert "escalate" not in types
+    assert model.max_active >= 2 # review and test overlapped
+
+    first_refactor = types.index("refactor")
+    last_review = len(types) - 1 - types[::-1].index("review")
+    assert first_refactor > last_review
+    assert "No issues found." in model.prompts["refactor"] # the review is the refactor's input
+    assert state["review_code"].strip() == "No issues found."
+    assert "ALL TESTS PASSED" in state["test_report"]
+
+def test_closing_the_stream_cancels_in_flight_stages(monkeypatch):
+    fake = StageModel(delay=0.5)
+    monkeypatch.setattr(single_nodes, "llm_small", fake)
+    monkeypatch.setattr(single_nodes, "llm", fake)
+
+    async def first_token_then_close():
+        pipeline = single_nodes.astream_single_file_pipeline({"raw_code": SOURCE, "language": "Python", "file_name": "cart.py"})
+        await pipeline.__anext__() # compaction
+        task = asyncio.ensure_future(pipeline.__anext__())
+        await asyncio.sleep(0.1) # both stages are now waiting on the model
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await pipeline.aclose()
+        await asyncio.sleep(0)
+
+    asyncio.run(first_token_then_close())
+    assert sorted(fake.cancelled) == ["review", "test"]
+    assert fake.active == 0
+
+def test_a_failing_stage_fails_the_stream(monkeypatch):
+    fake = StageModel(fail="test")
+    monkeypatch.setattr(single_nodes, "llm_small", fake)
+    monkeypatch.setattr(single_nodes, "llm", fake)
+    with pytest.raises(RuntimeError, match="test failed"):
+        run_pipeline({"raw_code": SOURCE, "language": "Python", "file_name": "cart.py"})
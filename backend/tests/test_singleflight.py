@@ -0,0 +1,51 @@
+import asyncio
+import uuid
+
+import httpx
+
+import graph.nodes as single_nodes
+import main
+from utils.run_log import run_registry
+
+class Reply:
+    def __init__(self, content: str):
+        self.content = content
+
+class SlowModel:
+    # counts provider calls; slow enough for a second request to arrive mid-run
+    def __init__(self):
+        self.model_name = f"fake-{uuid.uuid4().hex}"
+        self.temperature = 0.2
+        self.calls = 0
+
+    async def astream(self, prompt_text: str, **kwargs):
+        self.calls += 1
+        for word in ["No", "issues", "found."]:
+            await asyncio.sleep(0.02)
+            yield Reply(word + " ")
+
+    async def ainvoke(self, prompt_text: str, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        return Reply("No issues found.")
+
+def test_identical_uploads_share_one_generation(monkeypatch):
+    small, large = SlowModel(), SlowModel()
+    monkeypatch.setattr(single_nodes, "llm_small", small)
+    monkeypatch.setattr(single_nodes, "llm", large)
+    code = f"def handler_{uuid.uuid4().hex}(value):\n    return value + 1\n"
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            async def upload():
+                return await client.post("/single-review-stream", files={"file": ("a.py", code.encode())})
+            return await asyncio.gather(upload(), upload())
+
+    coalesced = run_registry.coalesced
+    first, second = asyncio.run(scenario())
+    assert first.status_code == second.status_code == 200
+    assert first.text == second.text # same job id, same events
+    assert run_registry.coalesced == coalesced + 1
+    assert first.text.splitlines()[0].startswith('{"type": "job"')
+    assert small.calls == len(single_nodes.SINGLE_FILE_STAGES) # one generation for both clients
@@ -0,0 +1,72 @@
+from utils.chunking import estimate_tokens
+from utils.source_chunks import plan_source_chunks
+
+def python_function(name: str, body_lines: int = 12) -> str:
+    body = "".join(f"    total += {name}_{n} * {n}\n" for n in range(body_lines))
+    return f"def {name}(items):\n    total = 0\n{body}    return total\n\n\n"
+
+def assert_tiles(plan, code: str):
+    # chunks cover the file exactly once, in order, with matching line numbers
+    lines = code.splitlines(keepends=True)
+    assert "".join(chunk.text for chunk in plan.chunks) == code
+    expected_start = 1
+    for chunk in plan.chunks:
+        assert chunk.start_line == expected_start
+        assert chunk.text == "".join(lines[chunk.start_line - 1:chunk.end_line])
+        expected_start = chunk.end_line + 1
+    assert plan.total_lines == len(lines)
+
+def test_small_file_is_one_chunk():
+    code = python_function("only")
+    plan = plan_source_chunks(code, "small.py", max_tokens=1000)
+    assert [(chunk.start_line, chunk.end_line) for chunk in plan.chunks] == [(1, len(code.splitlines()))]
+
+def test_python_splits_at_function_boundaries():
+    code = "import os\n\n\n" + "".join(python_function(f"f{n}") for n in range(8))
+    plan = plan_source_chunks(code, "module.py", max_tokens=150)
+    assert_tiles(plan, code)
+    assert len(plan.chunks) > 1
+    for chunk in plan.chunks[1:]:
+        assert chunk.text.startswith("def ")
+        assert estimate_tokens(chunk.text) <= 150
+
+def test_decorators_and_comments_stay_with_their_function():
+    code = "".join(f"# helper {n}\n@cached\n" + python_function(f"g{n}") for n in range(6))
+    plan = plan_source_chunks(code, "decorated.py", max_tokens=150)
+    assert_tiles(plan, code)
+    assert len(plan.chunks) > 1
+    assert all(chunk.text.startswith("# helper") for chunk in plan.chunks)
+
+def test_large_class_splits_at_methods():
+    methods = "".join("    " + line if line.strip() else line for function in range(6) for line in python_function(f"m{function}").splitlines(keepends=True))
+    code = "class Big:\n" + methods
+    plan = plan_source_chunks(code, "big.py", max_tokens=150)
+    assert_tiles(plan, code)
+    assert len(plan.chunks) > 1
+    assert all(chunk.text.lstrip().startswith(("class Big", "def m")) for chunk in plan.chunks)
+    assert "L1: class Big:" in plan.outline
+    assert "def m0(items):" in plan.outline
+
+def test_brace_languages_split_at_top_level_functions():
+    body = "".join(f"  total += item{n} * {n};\n" for n in range(12))
+    code = "".join(f"function f{n}(items) {{\n  let total = 0;\n{body}  return total;\n}}\n\n" for n in range(6))
+    plan = plan_source_chunks(code, "module.js", max_tokens=150)
+    assert_tiles(plan, code)
+    assert len(plan.chunks) > 1
+    assert all(chunk.text.startswith("function f") for chunk in plan.chunks)
+    assert "L1: function f0(items) {" in plan.outline
+
+def test_oversized_function_is_cut_on_blank_lines():
+    blocks = "".join("".join(f"    step_{block}_{n} = {n}\n" for n in range(8)) + "\n" for block in range(10))
+    code = "def huge():\n" + blocks
+    plan = plan_source_chunks(code, "huge.py", max_tokens=120)
+    assert_tiles(plan, code)
+    assert len(plan.chunks) > 1
+    for chunk in plan.chunks[:-1]:
+        assert chunk.text.endswith("\n\n") # cuts land after a blank line
+
+def test_unparsable_python_falls_back_to_indentation():
+    code = "".join(python_function(f"h{n}") for n in range(6)) + "def broken(:\n"
+    plan = plan_source_chunks(code, "broken.py", max_tokens=150)
+    assert_tiles(plan, code)
+    assert len(plan.chunks) > 1
@@ -0,0 +1,119 @@
+import asyncio
+
+import httpx
+import pytest
+
+import graph.nodes as single_nodes
+import main
+from utils.static_analysis import analyze_source, focused_source, summarize_report
+
+CLEAN = '''import os
+
+def cwd():
+    return os.getcwd()
+'''
+
+def branchy(name: str, branches: int) -> str:
+    body = "".join(f"    if value == {n}:\n        return {n}\n" for n in range(branches))
+    return f"def {name}(value):\n{body}    return -1\n"
+
+SMELLY = '''import json
+import sys
+
+def load(path, cache={}):
+    try:
+        return open(path).read()
+    except:
+        return eval(path)
+'''
+
+def test_clean_python_scores_zero_and_is_skippable():
+    report = analyze_source(CLEAN, "clean.py")
+    assert (report.language, report.score, report.hotspots) == ("python", 0, [])
+    assert not report.needs_review
+
+def test_smells_and_unused_imports_add_to_the_score():
+    report = analyze_source(SMELLY, "smelly.py")
+    messages = [finding.message for finding in report.smells]
+    assert any("mutable default" in message for message in messages)
+    assert any("bare except" in message for message in messages)
+    assert "eval() call" in messages
+    assert [finding.message for finding in report.unused_imports] == ["unused import json", "unused import sys"]
+    assert report.score == 2 * len(report.smells) + 2
+    assert report.needs_review
+
+def test_complex_functions_are_hotspots_and_weigh_three():
+    report = analyze_source(branchy("route", 12), "route.py")
+    (hotspot,) = report.hotspots
+    assert (hotspot.name, hotspot.complexity) == ("route", 13)
+    assert report.score == 3
+    assert "Hotspot route L1-" in summarize_report(report)
+
+def test_moderate_complexity_counts_once():
+    report = analyze_source(branchy("pick", 6), "pick.py")
+    assert report.hotspots == [] and report.score == 1 and report.needs_review
+
+def test_brace_languages_use_heuristics():
+    code = (
+        "import { used, unused } from './lib';\n"
+        "function run(a) {\n"
+        "  try { used(a); } catch (e) {}\n"
+        "  return a && a.b;\n"
+        "}\n"
+    )
+    report = analyze_source(code, "run.js")
+    assert report.language == "heuristic"
+    assert [(f.name, f.start_line, f.end_line) for f in report.functions] == [("run", 2, 5)]
+    assert [finding.message for finding in report.unused_imports] == ["unused import unused"]
+    assert [finding.message for finding in report.smells] == ["empty catch block swallows errors"]
+
+def test_unknown_file_types_always_need_review():
+    report = analyze_source("whatever", "notes.txt")
+    assert report.language == "" and report.score == 0 and report.needs_review
+
+def test_threshold_is_configurable(monkeypatch):
+    from utils import static_analysis
+    monkeypatch.setattr(static_analysis, "STATIC_SKIP_SCORE", 4)
+    assert not analyze_source(branchy("route", 12), "route.py").needs_review # score 3
+
+def test_focused_source_keeps_only_hotspots():
+    code = CLEAN + "\n" * 3 + "".join(f"x{n} = {n}\n" for n in range(200)) + branchy("route", 12)
+    excerpt = focused_source(code, analyze_source(code, "big.py"))
+    assert excerpt.startswith("L208-")
+    assert "def route(value):" in excerpt and "x10 = 10" not in excerpt
+    assert focused_source(CLEAN, analyze_source(CLEAN, "clean.py")) is None
+
+@pytest.mark.parametrize("skip_clean, code, needs_review", [
+    (False, CLEAN, True), # default: every file goes to the model
+    (True, CLEAN, False),
+    (True, SMELLY, True),
+])
+def test_static_analysis_node_gates_on_skip_clean(skip_clean, code, needs_review):
+    state = single_nodes.static_analysis_node({"raw_code": code, "file_name": "a.py", "skip_clean": skip_clean})
+    assert state["needs_review"] is needs_review
+
+class Unused:
+    model_name = "unused"
+    temperature = 0.2
+
+    async def astream(self, prompt_text: str, **kwargs):
+        raise AssertionError("clean files with skip_clean must not reach the model")
+        yield
+
+def test_skip_clean_form_field_skips_the_model(monkeypatch):
+    monkeypatch.setattr(single_nodes, "llm_small", Unused())
+    monkeypatch.setattr(single_nodes, "llm", Unused())
+
+    async def upload():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(
+                "/single-review-stream",
+                files={"file": ("clean.py", CLEAN.encode())},
+                data={"skip_clean": "true"},
+            )
+
+    response = asyncio.run(upload())
+    assert response.status_code == 200
+    assert "No model review: static analysis found nothing" in response.text
+    assert '"type": "error"' not in response.text
@@ -0,0 +1,110 @@
+import asyncio
+import json
+import zlib
+
+import pytest
+
+from utils.stream_framing import FRAMING_FRAME, FRAMING_TOKEN, StreamEncoder, accepts_gzip, coalesce_events, frame_events
+
+class Source:
+    # async event source that records whether it was closed
+    def __init__(self, events, delay: float = 0.0, error: Exception = None):
+        self.events = events
+        self.delay = delay
+        self.error = error
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.events:
+            return self.events.pop(0)
+        if self.error is not None:
+            raise self.error
+        raise StopAsyncIteration
+
+    async def aclose(self):
+        self.closed = True
+
+async def collect(generator):
+    return [event async for event in generator]
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+@pytest.mark.parametrize("header, expected", [
+    (None, False),
+    ("gzip", True),
+    ("deflate, gzip;q=0.5", True),
+    ("gzip;q=0", False),
+    ("br, *", True),
+    ("identity", False),
+])
+def test_accepts_gzip(header, expected):
+    assert accepts_gzip(header) is expected
+
+def test_tokens_are_merged_per_type_and_flushed_before_other_events():
+    source = Source([
+        {"type": "review", "content": "a"},
+        {"type": "test", "content": "x"},
+        {"type": "review", "content": "b"},
+        {"type": "escalate", "stage": "review"},
+        {"type": "review", "content": "c"},
+    ])
+    frames = run(collect(coalesce_events(source, window=10)))
+    assert frames == [
+        {"type": "review", "content": "ab"},
+        {"type": "test", "content": "x"},
+        {"type": "escalate", "stage": "review"},
+        {"type": "review", "content": "c"},
+    ]
+    assert source.closed
+
+def test_frames_flush_when_the_window_expires():
+    source = Source([{"type": "review", "content": str(n)} for n in range(4)], delay=0.03)
+    frames = run(collect(coalesce_events(source, window=0.05, max_bytes=1 << 20)))
+    assert "".join(frame["content"] for frame in frames) == "0123"
+    assert 1 < len(frames) < 4
+
+def test_frames_flush_once_they_reach_max_bytes():
+    source = Source([{"type": "review", "content": "abc"} for _ in range(4)])
+    frames = run(collect(coalesce_events(source, window=10, max_bytes=6)))
+    assert frames == [{"type": "review", "content": "abcabc"}, {"type": "review", "content": "abcabc"}]
+
+def test_pending_tokens_are_sent_before_a_source_error():
+    source = Source([{"type": "review", "content": "partial"}], error=RuntimeError("model failed"))
+    received = []
+
+    async def consume():
+        async for frame in coalesce_events(source, window=10):
+            received.append(frame)
+
+    with pytest.raises(RuntimeError, match="model failed"):
+        run(consume())
+    assert received == [{"type": "review", "content": "partial"}]
+
+def test_token_framing_passes_events_through_and_closes_the_source():
+    events = [{"type": "review", "content": "a"}, {"type": "review", "content": "b"}, {"type": "done"}]
+    source = Source(list(events))
+    assert run(collect(frame_events(source, FRAMING_TOKEN))) == events
+    assert source.closed
+
+def test_gzip_stream_decodes_after_every_frame():
+    encoder = StreamEncoder(FRAMING_FRAME, "gzip")
+    assert encoder.headers["Content-Encoding"] == "gzip"
+    decoder = zlib.decompressobj(31)
+    events = [{"type": "review", "content": "naïve"}, {"type": "done"}]
+    for event in events:
+        # each chunk is sync-flushed, so the client can decode it right away
+        assert json.loads(decoder.decompress(encoder.encode(event))) == event
+    assert decoder.decompress(encoder.finish()) == b""
+    assert decoder.eof
+
+def test_plain_encoder_writes_ndjson():
+    encoder = StreamEncoder(FRAMING_FRAME, None)
+    assert encoder.headers == {}
+    assert encoder.encode({"type": "done"}) == '{"type": "done"}\n'
+    assert encoder.finish() == b""
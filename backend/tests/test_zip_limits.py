@@ -0,0 +1,63 @@
+import io
+import zipfile
+
+import pytest
+from fastapi import HTTPException
+
+import main
+from main import extract_project_files_from_zip, read_zip_member
+
+def make_zip(files: dict, compression=zipfile.ZIP_DEFLATED) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression) as archive:
+        for name, content in files.items():
+            archive.writestr(name, content)
+    return buffer.getvalue()
+
+def rejected(data: bytes) -> HTTPException:
+    with pytest.raises(HTTPException) as error:
+        extract_project_files_from_zip(data)
+    return error.value
+
+def test_code_files_are_extracted_and_noise_skipped():
+    files = extract_project_files_from_zip(make_zip({
+        "app/main.py": "print('hi')\n",
+        "app/__pycache__/main.cpython-311.pyc": "x",
+        "web/node_modules/lib/index.js": "x",
+        "repo/.git/config": "x",
+        "logo.png": "x",
+        "docs/": "",
+    }))
+    assert dict(files.items()) == {"app/main.py": "print('hi')\n"}
+
+def test_read_zip_member_counts_inflated_bytes():
+    archive = zipfile.ZipFile(io.BytesIO(make_zip({"a.py": "x = 1\n" * 1000})))
+    info = archive.getinfo("a.py")
+    assert read_zip_member(archive, info, 10_000) == b"x = 1\n" * 1000
+    with pytest.raises(HTTPException) as error:
+        read_zip_member(archive, info, 5_000)
+    assert error.value.status_code == 413
+
+def test_high_compression_ratio_is_rejected():
+    error = rejected(make_zip({"bomb.py": "0" * (1 << 20)}))
+    assert (error.status_code, error.detail) == (413, "ZIP archive has a suspicious compression ratio")
+
+def test_too_many_members_is_rejected(monkeypatch):
+    monkeypatch.setattr(main, "MAX_ZIP_MEMBERS", 3)
+    error = rejected(make_zip({f"m{n}.py": "x = 1\n" for n in range(4)}))
+    assert (error.status_code, error.detail) == (413, "ZIP archive contains too many files")
+
+def test_total_uncompressed_size_is_capped(monkeypatch):
+    monkeypatch.setattr(main, "MAX_ZIP_UNCOMPRESSED_BYTES", 1000)
+    files = {f"m{n}.py": "y = 2\n" * 60 for n in range(3)} # 360 bytes each, stored
+    error = rejected(make_zip(files, zipfile.ZIP_STORED))
+    assert (error.status_code, error.detail) == (413, "ZIP archive exceeds the uncompressed size limit")
+
+@pytest.mark.parametrize("data, detail", [
+    (b"", "Uploaded ZIP file is empty"),
+    (b"not a zip", "Uploaded file is not a valid ZIP archive"),
+    (make_zip({"logo.png": "x"}), "No supported code files were found inside the ZIP archive"),
+])
+def test_invalid_uploads_are_bad_requests(data, detail):
+    error = rejected(data)
+    assert (error.status_code, error.detail) == (400, detail)
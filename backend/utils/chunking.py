@@ -0,0 +1,52 @@
+import re
+from typing import Dict, List, Tuple
+
+CHARS_PER_TOKEN = 4 # rough average for source code on OpenAI tokenizers
+
+_PART_SUFFIX_RE = re.compile(r" \(part \d+/\d+\)$")
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def split_oversized_file(name: str, content: str, max_tokens: int) -> List[Tuple[str, str]]:
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(content) <= max_chars:
+        return [(name, content)]
+
+    pieces = []
+    start = 0
+    while start < len(content):
+        end = min(start + max_chars, len(content))
+        if end < len(content):
+            newline = content.rfind("\n", start, end)
+            if newline > start:
+                end = newline + 1 # cut on a line boundary where possible
+        pieces.append(content[start:end])
+        start = end
+    return [
+        (f"{name} (part {index + 1}/{len(pieces)})", piece)
+        for index, piece in enumerate(pieces)
+    ]
+
+def source_file_name(part_name: str) -> str:
+    return _PART_SUFFIX_RE.sub("", part_name)
+
+def pack_files_into_batches(project_files: Dict[str, str], max_batch_tokens: int) -> List[Dict[str, str]]:
+    batches: List[Dict[str, str]] = []
+    current: Dict[str, str] = {}
+    current_tokens = 0
+
+    # keep files of the same directory together so each summary stays coherent
+    for name in sorted(project_files):
+        for part_name, content in split_oversized_file(name, project_files[name], max_batch_tokens):
+            tokens = estimate_tokens(part_name) + estimate_tokens(content)
+            if current and current_tokens + tokens > max_batch_tokens:
+                batches.append(current)
+                current = {}
+                current_tokens = 0
+            current[part_name] = content
+            current_tokens += tokens
+
+    if current:
+        batches.append(current)
+    return batches
@@ -0,0 +1,275 @@
+import ast
+import hashlib
+import os
+import posixpath
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Mapping, Optional, Set, Tuple
+
+from utils.chunking import estimate_tokens
+from utils.project_store import file_bytes
+from utils.source_chunks import parse_python
+
+DEPENDENCY_SUMMARY_TOKENS = int(os.getenv("DEPENDENCY_SUMMARY_TOKENS", "4000")) # adjacency list size in prompts
+GRAPH_CACHE_ENTRIES = 64
+SPEC_CACHE_ENTRIES = 50_000
+
+_PY_IMPORT_LINE_RE = re.compile(r"^[ \t]*(?:from[ \t]+\.*[\w.]*[ \t]+import\b|import[ \t]+\w)[^\n]*", re.MULTILINE)
+_JS_IMPORT_RE = re.compile(
+    r"""(?:import\s+(?:[\w*{}\s,]+\s+from\s+)?|export\s+[\w*{}\s,]+\s+from\s+|require\(\s*|import\(\s*)['"]([^'"]+)['"]"""
+)
+_GO_IMPORT_BLOCK_RE = re.compile(r"^\s*import\s*\((.*?)\)", re.MULTILINE | re.DOTALL)
+_GO_IMPORT_LINE_RE = re.compile(r"^\s*import\s+(?:[\w.]+\s+)?\"([^\"]+)\"", re.MULTILINE)
+_GO_QUOTED_RE = re.compile(r"\"([^\"]+)\"")
+_GO_MODULE_RE = re.compile(r"^\s*module\s+(\S+)", re.MULTILINE)
+_JAVA_IMPORT_RE = re.compile(r"^\s*import\s+(static\s+)?([\w.]+(?:\.\*)?)\s*;", re.MULTILINE)
+
+JS_EXTENSIONS = (".js", ".jsx", ".ts", ".tsx")
+
+_graph_cache: "OrderedDict[str, Dict[str, Set[str]]]" = OrderedDict()
+_spec_cache: "OrderedDict[Tuple[str, str], tuple]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+def _language(path: str) -> Optional[str]:
+    if path.endswith(".py"):
+        return "python"
+    if path.endswith(JS_EXTENSIONS):
+        return "js"
+    if path.endswith(".go"):
+        return "go"
+    if path.endswith(".java"):
+        return "java"
+    return None
+
+def _python_import_statements(content: str) -> List[str]:
+    # cut out just the import statements (with their continuation lines);
+    # parsing whole modules with ast is too slow for 500-file uploads
+    statements = []
+    for match in _PY_IMPORT_LINE_RE.finditer(content):
+        statement = match.group(0).strip()
+        stop = match.end()
+        if "(" in statement and ")" not in statement:
+            close = content.find(")", stop)
+            statement = content[match.start():close + 1].strip() if close != -1 else statement
+        while statement.endswith("\\"):
+            next_end = content.find("\n", stop + 1)
+            next_end = len(content) if next_end == -1 else next_end
+            statement = statement[:-1] + " " + content[stop + 1:next_end].strip()
+            stop = next_end
+        statements.append(statement)
+    return statements
+
+def _python_specs(content: str) -> tuple:
+    # (module with leading dots for relative imports, imported names)
+    statements = _python_import_statements(content)
+    try:
+        trees = [parse_python("\n".join(statements))]
+    except SyntaxError:
+        trees = []
+        for statement in statements:
+            try:
+                trees.append(parse_python(statement))
+            except SyntaxError:
+                continue # import-looking line inside a string or comment
+
+    specs = []
+    for tree in trees:
+        for node in tree.body:
+            if isinstance(node, ast.Import):
+                specs.extend((alias.name, ()) for alias in node.names)
+            elif isinstance(node, ast.ImportFrom):
+                module = "." * node.level + (node.module or "")
+                specs.append((module, tuple(alias.name for alias in node.names if alias.name != "*")))
+    return tuple(specs)
+
+def _go_specs(content: str) -> tuple:
+    specs = list(_GO_IMPORT_LINE_RE.findall(content))
+    for block in _GO_IMPORT_BLOCK_RE.findall(content):
+        specs.extend(_GO_QUOTED_RE.findall(block))
+    return tuple(specs)
+
+def _java_specs(content: str) -> tuple:
+    specs = []
+    for static, name in _JAVA_IMPORT_RE.findall(content):
+        if static and not name.endswith(".*"):
+            name = name.rsplit(".", 1)[0] # import static a.b.C.member -> a.b.C
+        specs.append(name)
+    return tuple(specs)
+
+_SPEC_EXTRACTORS = {
+    "python": _python_specs,
+    "js": lambda content: tuple(_JS_IMPORT_RE.findall(content)),
+    "go": _go_specs,
+    "java": _java_specs,
+}
+
+def extract_import_specs(path: str, content: str) -> tuple:
+    language = _language(path)
+    if language is None:
+        return ()
+    key = (language, hashlib.sha256(content.encode("utf-8")).hexdigest())
+    with _cache_lock:
+        cached = _spec_cache.get(key)
+        if cached is not None:
+            _spec_cache.move_to_end(key)
+            return cached
+    specs = _SPEC_EXTRACTORS[language](content)
+    with _cache_lock:
+        _spec_cache[key] = specs
+        if len(_spec_cache) > SPEC_CACHE_ENTRIES:
+            _spec_cache.popitem(last=False)
+    return specs
+
+class _Resolver:
+    def __init__(self, project_files: Mapping[str, str]):
+        self.paths = set(project_files)
+        self.python_modules: Dict[str, str] = {}
+        self.java_classes: Dict[str, str] = {}
+        self.files_by_dir: Dict[str, List[str]] = {}
+        self.go_modules: List[Tuple[str, str]] = []
+
+        for path in sorted(project_files):
+            directory = posixpath.dirname(path)
+            self.files_by_dir.setdefault(directory, []).append(path)
+            parts = path.rsplit(".", 1)[0].split("/")
+            if path.endswith(".py"):
+                if parts[-1] == "__init__":
+                    parts = parts[:-1]
+                # index every suffix so archive root folders don't matter
+                for start in range(len(parts)):
+                    self.python_modules.setdefault(".".join(parts[start:]), path)
+            elif path.endswith(".java"):
+                for start in range(len(parts)):
+                    self.java_classes.setdefault(".".join(parts[start:]), path)
+            elif posixpath.basename(path) == "go.mod":
+                match = _GO_MODULE_RE.search(project_files[path])
+                if match:
+                    self.go_modules.append((match.group(1), directory))
+
+    def python(self, importer: str, module: str, names: tuple) -> Set[str]:
+        if module.startswith("."):
+            level = len(module) - len(module.lstrip("."))
+            base = importer.split("/")[:-1]
+            base = base[:len(base) - (level - 1)] if level > 1 else base
+            module = ".".join(base + ([module.lstrip(".")] if module.lstrip(".") else []))
+
+        targets = set()
+        for candidate in [f"{module}.{name}" for name in names] + [module]:
+            path = self.python_modules.get(candidate)
+            if path:
+                targets.add(path)
+        return targets
+
+    def js(self, importer: str, spec: str) -> Set[str]:
+        if not spec.startswith("."):
+            return set() # package import
+        base = posixpath.normpath(posixpath.join(posixpath.dirname(importer), spec))
+        candidates = [base] + [base + ext for ext in JS_EXTENSIONS] + [f"{base}/index{ext}" for ext in JS_EXTENSIONS]
+        for candidate in candidates:
+            if candidate in self.paths:
+                return {candidate}
+        return set()
+
+    def go(self, importer: str, spec: str) -> Set[str]:
+        directories = []
+        for module, root in self.go_modules:
+            if spec == module or spec.startswith(module + "/"):
+                directory = posixpath.normpath(posixpath.join(root, spec[len(module):].lstrip("/")))
+                directories.append("" if directory == "." else directory)
+        if not directories:
+            # no go.mod in the archive, fall back to matching the path suffix
+            directories = [d for d in self.files_by_dir if d == spec or d.endswith("/" + spec)]
+        targets = set()
+        for directory in directories:
+            targets.update(
+                path for path in self.files_by_dir.get(directory, [])
+                if path.endswith(".go") and not path.endswith("_test.go")
+            )
+        return targets
+
+    def java(self, importer: str, spec: str) -> Set[str]:
+        if spec.endswith(".*"):
+            package = spec[:-2]
+            return {path for name, path in self.java_classes.items() if name.rsplit(".", 1)[0] == package}
+        path = self.java_classes.get(spec)
+        return {path} if path else set()
+
+    def resolve(self, path: str, specs: tuple) -> Set[str]:
+        language = _language(path)
+        targets: Set[str] = set()
+        for spec in specs:
+            if language == "python":
+                targets |= self.python(path, *spec)
+            elif language == "js":
+                targets |= self.js(path, spec)
+            elif language == "go":
+                targets |= self.go(path, spec)
+            elif language == "java":
+                targets |= self.java(path, spec)
+        targets.discard(path)
+        return targets
+
+def _graph_key(project_files: Mapping[str, str]) -> str:
+    digest = hashlib.sha256()
+    for path in sorted(project_files):
+        digest.update(path.encode("utf-8"))
+        digest.update(b"\x00")
+        digest.update(hashlib.sha256(file_bytes(project_files, path)).digest())
+    return digest.hexdigest()
+
+def build_dependency_graph(project_files: Mapping[str, str]) -> Dict[str, Set[str]]:
+    key = _graph_key(project_files)
+    with _cache_lock:
+        cached = _graph_cache.get(key)
+        if cached is not None:
+            _graph_cache.move_to_end(key)
+            return cached
+
+    resolver = _Resolver(project_files)
+    graph = {
+        path: resolver.resolve(path, extract_import_specs(path, content))
+        for path, content in project_files.items()
+    }
+
+    with _cache_lock:
+        _graph_cache[key] = graph
+        if len(_graph_cache) > GRAPH_CACHE_ENTRIES:
+            _graph_cache.popitem(last=False)
+    return graph
+
+def in_degree(graph: Dict[str, Set[str]]) -> Dict[str, int]:
+    counts = {path: 0 for path in graph}
+    for targets in graph.values():
+        for target in targets:
+            counts[target] = counts.get(target, 0) + 1
+    return counts
+
+def _common_root(paths: List[str]) -> str:
+    if not paths:
+        return ""
+    root = posixpath.commonpath(paths) if len(paths) > 1 else posixpath.dirname(paths[0])
+    return root + "/" if root else ""
+
+def summarize_dependency_graph(graph: Dict[str, Set[str]], max_tokens: int = DEPENDENCY_SUMMARY_TOKENS) -> str:
+    edges = {path: targets for path, targets in graph.items() if targets}
+    if not edges:
+        return "No internal imports were detected between project files."
+
+    root = _common_root(sorted(graph))
+    strip = lambda path: path[len(root):] if root and path.startswith(root) else path
+    counts = in_degree(graph)
+
+    central = sorted((path for path in counts if counts[path]), key=lambda path: (-counts[path], path))[:10]
+    lines = [f"Most imported modules: {', '.join(f'{strip(path)} ({counts[path]})' for path in central)}", "Imports (file -> files it imports):"]
+    budget = max_tokens - estimate_tokens("\n".join(lines))
+    # list the most connected files first so truncation drops leaf modules
+    ordered = sorted(edges, key=lambda path: (-(len(edges[path]) + counts.get(path, 0)), path))
+    for index, path in enumerate(ordered):
+        line = f"{strip(path)} -> {', '.join(strip(target) for target in sorted(edges[path]))}"
+        budget -= estimate_tokens(line)
+        if budget < 0:
+            lines.append(f"... {len(ordered) - index} more files with imports omitted")
+            break
+        lines.append(line)
+    return "\n".join(lines)
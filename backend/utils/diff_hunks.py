@@ -0,0 +1,267 @@
+import difflib
+import os
+import re
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from utils.chunking import estimate_tokens
+from utils.source_chunks import DEFINITION_RE
+from utils.static_analysis import analyze_source
+
+DIFF_CONTEXT_LINES = int(os.getenv("DIFF_CONTEXT_LINES", "3")) # unchanged lines kept around each hunk
+DIFF_MAX_ENCLOSING_LINES = int(os.getenv("DIFF_MAX_ENCLOSING_LINES", "150")) # longer functions get context lines only
+DIFF_MAX_FILES = int(os.getenv("DIFF_MAX_FILES", "200"))
+
+_HUNK_RE = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@ ?(.*)$")
+
+class Hunk(NamedTuple):
+    old_start: int
+    new_start: int
+    new_lines: int
+    section: str # text after the closing @@, usually the enclosing definition
+    lines: List[str] # body lines, each starting with " ", "+" or "-"
+
+class FilePatch(NamedTuple):
+    path: str # new path; the old one for deleted files
+    hunks: List[Hunk]
+    deleted: bool
+
+class ChangeRegion(NamedTuple):
+    start_line: int # 1-based, inclusive, in the new version of the file
+    end_line: int
+    text: str
+    scope: str # enclosing definitions above the region, if any
+
+class FileChanges(NamedTuple):
+    path: str
+    regions: List[ChangeRegion]
+    changed_lines: List[int] # added or modified lines, new numbering
+    removed: int # lines only present in the old version
+    file_tokens: int # the whole new file, 0 when only the diff was uploaded
+
+def _strip_prefix(path: str) -> str:
+    path = path.split("\t", 1)[0].strip()
+    return path[2:] if path.startswith(("a/", "b/")) else path
+
+def parse_unified_diff(text: str) -> List[FilePatch]:
+    # git diff / diff -u output; renames and binary files keep only their hunks
+    patches: List[FilePatch] = []
+    old_path = new_path = None
+    hunks: List[Hunk] = []
+    current: Optional[Hunk] = None
+    remaining_old = remaining_new = 0
+
+    def close():
+        if new_path is not None and hunks:
+            deleted = new_path == "/dev/null"
+            patches.append(FilePatch(old_path if deleted else new_path, list(hunks), deleted))
+
+    for line in text.splitlines():
+        if current is not None and (remaining_old > 0 or remaining_new > 0):
+            marker = line[:1] or " " # some tools drop the space on empty context lines
+            if marker in " +-":
+                current.lines.append(marker + line[1:])
+                remaining_old -= marker in " -"
+                remaining_new -= marker in " +"
+                continue
+        if line.startswith("\\"):
+            continue # "\ No newline at end of file"
+        if line.startswith("--- "):
+            close()
+            old_path, new_path, hunks, current = _strip_prefix(line[4:]), None, [], None
+        elif line.startswith("+++ ") and old_path is not None:
+            new_path = _strip_prefix(line[4:])
+        elif new_path is not None and line.startswith("@@"):
+            match = _HUNK_RE.match(line)
+            if match:
+                old_start, old_count, new_start, new_count, section = match.groups()
+                remaining_old = 1 if old_count is None else int(old_count)
+                remaining_new = 1 if new_count is None else int(new_count)
+                current = Hunk(int(old_start), int(new_start), remaining_new, section.strip(), [])
+                hunks.append(current)
+    close()
+    return patches
+
+def diff_file_sets(base: Dict[str, str], head: Dict[str, str]) -> List[FilePatch]:
+    # base/head uploads: zero-context hunks, context is re-added from head
+    patches = []
+    for path in sorted(set(base) | set(head)):
+        old, new = base.get(path), head.get(path)
+        if old == new:
+            continue
+        diff = "\n".join(difflib.unified_diff(
+            (old or "").splitlines(), (new or "").splitlines(),
+            "a/" + path if old is not None else "/dev/null",
+            "b/" + path if new is not None else "/dev/null",
+            n=0, lineterm="",
+        ))
+        patches.extend(parse_unified_diff(diff))
+    return patches
+
+def _hunk_anchors(hunk: Hunk) -> Tuple[List[int], int]:
+    # new-side line numbers the hunk changes; a pure deletion anchors on the line after it
+    changed, removed = [], 0
+    line_number = hunk.new_start
+    for line in hunk.lines:
+        if line.startswith("+"):
+            changed.append(line_number)
+            line_number += 1
+        elif line.startswith("-"):
+            removed += 1
+            if not changed or changed[-1] != line_number:
+                changed.append(line_number)
+        else:
+            line_number += 1
+    return changed, removed
+
+def _indent(line: str) -> int:
+    return len(line) - len(line.lstrip())
+
+def _scope(lines: List[str], start: int, anchor: int) -> str:
+    # signatures of the definitions around the first change that begin
+    # above the region, outermost first
+    anchor = min(anchor, len(lines))
+    signatures = []
+    level = _indent(lines[anchor - 1]) if lines[anchor - 1].strip() else 1 << 16
+    for index in range(anchor - 2, -1, -1):
+        line = lines[index]
+        if line.strip() and _indent(line) < level and DEFINITION_RE.match(line):
+            if index < start - 1:
+                signatures.append(line.strip())
+            level = _indent(line)
+            if not level:
+                break
+    return " > ".join(reversed(signatures))
+
+def _merge(ranges: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    merged: List[List[int]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+def _enclosing_header(lines: List[str], start: int, anchor: int) -> int:
+    # nearest definition above the first change that encloses it, or start
+    level = _indent(lines[anchor - 1]) if lines[anchor - 1].strip() else 1 << 16
+    for index in range(anchor - 1, max(0, anchor - 1 - DIFF_MAX_ENCLOSING_LINES), -1):
+        line = lines[index - 1]
+        if not line.strip() or _indent(line) >= level:
+            continue
+        if DEFINITION_RE.match(line):
+            return min(start, index)
+        level = _indent(line)
+        if not level:
+            break
+    return start
+
+def _hunk_regions(hunk: Hunk, context_lines: int) -> List[ChangeRegion]:
+    # Diff-only counterpart of the head-file path: the hunk's context is cut
+    # to context_lines around the changes and grown to an enclosing header
+    # inside the hunk. The scope is taken from the hunk, falling back on the
+    # section git prints after @@.
+    body: List[str] = []
+    changed: List[int] = [] # 1-based positions in body
+    for line in hunk.lines:
+        if line.startswith("-"):
+            if not changed or changed[-1] != len(body) + 1:
+                changed.append(len(body) + 1)
+            continue
+        if line.startswith("+"):
+            changed.append(len(body) + 1)
+        body.append(line[1:])
+    if not body:
+        return []
+    changed = [min(position, len(body)) for position in changed]
+    ranges = [
+        (_enclosing_header(body, max(1, position - context_lines), position), min(len(body), position + context_lines))
+        for position in changed
+    ]
+
+    regions = []
+    for start, end in _merge(ranges):
+        anchor = next(position for position in changed if position >= start)
+        scope = _scope(body, start, anchor)
+        rooted = any(line.strip() and not _indent(line) for line in body[:anchor]) # the hunk shows its own top level
+        if hunk.section and not rooted:
+            scope = " > ".join(part for part in (hunk.section, scope) if part)
+        offset = hunk.new_start - 1
+        regions.append(ChangeRegion(start + offset, end + offset, "\n".join(body[start - 1:end]) + "\n", scope))
+    return regions
+
+def extract_changes(patch: FilePatch, head_source: Optional[str] = None, context_lines: int = DIFF_CONTEXT_LINES) -> FileChanges:
+    # Each hunk grows to its enclosing function when that is short enough,
+    # otherwise to context_lines either side; overlapping regions merge.
+    changed = set()
+    removed = 0
+    anchors = []
+    for hunk in patch.hunks:
+        hunk_changed, hunk_removed = _hunk_anchors(hunk)
+        changed.update(hunk_changed)
+        removed += hunk_removed
+        anchors.append((hunk, hunk_changed))
+
+    if head_source is None: # diff only: the hunk's own new-side lines are all we have
+        regions = [region for hunk, _ in anchors for region in _hunk_regions(hunk, context_lines)]
+        return FileChanges(patch.path, regions, sorted(changed), removed, 0)
+
+    lines = head_source.splitlines()
+    functions = [f for f in analyze_source(head_source, patch.path).functions if f.name != "<module>"]
+    ranges = []
+    for hunk, hunk_changed in anchors:
+        if not hunk_changed or not lines:
+            continue
+        first, last = min(hunk_changed), min(max(hunk_changed), len(lines))
+        start, end = first - context_lines, last + context_lines
+        enclosing = [f for f in functions if f.start_line <= first and f.end_line >= last and f.length <= DIFF_MAX_ENCLOSING_LINES]
+        if enclosing:
+            innermost = min(enclosing, key=lambda f: f.length)
+            start, end = min(start, innermost.start_line), max(end, innermost.end_line)
+        ranges.append((max(1, start), min(len(lines), end)))
+
+    ordered = sorted(changed)
+    regions = []
+    for start, end in _merge(ranges):
+        anchor = next((line for line in ordered if line >= start), start)
+        regions.append(ChangeRegion(start, end, "\n".join(lines[start - 1:end]) + "\n", _scope(lines, start, anchor)))
+    return FileChanges(patch.path, regions, ordered, removed, estimate_tokens(head_source))
+
+def render_regions(changes: FileChanges) -> str:
+    # what the model sees: each region under its line range in the new file
+    parts = []
+    for region in changes.regions:
+        header = f"L{region.start_line}-{region.end_line}:" + (f" (in {region.scope})" if region.scope else "")
+        parts.append(header + "\n" + region.text)
+    return "\n".join(parts)
+
+def describe_lines(numbers: List[int]) -> str:
+    # [3, 4, 5, 9] -> "3-5, 9"
+    spans: List[List[int]] = []
+    for number in numbers:
+        if spans and number == spans[-1][1] + 1:
+            spans[-1][1] = number
+        else:
+            spans.append([number, number])
+    return ", ".join(str(a) if a == b else f"{a}-{b}" for a, b in spans)
+
+def _head_source(head_files: Dict[str, str], path: str) -> Optional[str]:
+    # ZIPs often wrap the tree in a top-level folder the diff paths lack
+    if path in head_files:
+        return head_files[path]
+    matches = [name for name in head_files if name.endswith("/" + path)]
+    return head_files[min(matches, key=len)] if matches else None
+
+def collect_file_changes(
+    patches: List[FilePatch], head_files: Optional[Dict[str, str]] = None, context_lines: int = DIFF_CONTEXT_LINES,
+) -> Tuple[List[FileChanges], List[str]]:
+    # reviewable changes per file, plus the paths of deleted files
+    changes, deleted = [], []
+    for patch in patches:
+        if patch.deleted:
+            deleted.append(patch.path)
+            continue
+        head_source = _head_source(head_files, patch.path) if head_files else None
+        file_changes = extract_changes(patch, head_source, max(0, context_lines))
+        if file_changes.regions:
+            changes.append(file_changes)
+    return changes, deleted
@@ -0,0 +1,127 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+FILE_INDEX_PATH = os.getenv("FILE_INDEX_PATH", os.path.join(os.getcwd(), "file_index.sqlite3"))
+FILE_INDEX_TTL_SECONDS = int(os.getenv("FILE_INDEX_TTL_SECONDS", str(30 * 24 * 3600))) # since the summary was last used
+FILE_INDEX_MAX_ENTRIES = int(os.getenv("FILE_INDEX_MAX_ENTRIES", "100000")) # least recently used rows go first
+FILE_INDEX_PURGE_SECONDS = int(os.getenv("FILE_INDEX_PURGE_SECONDS", "3600")) # how often writes also evict
+
+_SECTION_RE = re.compile(r"^###\s*FILE:\s*(.+?)\s*$", re.MULTILINE)
+_FINDINGS_RE = re.compile(r"^\s*\**Findings\**\s*:?\s*\**\s*$", re.MULTILINE | re.IGNORECASE)
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+def parse_file_sections(text: str) -> Dict[str, str]:
+    matches = list(_SECTION_RE.finditer(text))
+    sections = {}
+    for index, match in enumerate(matches):
+        end = matches[index + 1].start() if index + 1 < len(matches) else len(text)
+        sections[match.group(1).strip("`'\" ")] = text[match.end():end].strip()
+    return sections
+
+def split_summary_findings(section: str) -> Tuple[str, str]:
+    match = _FINDINGS_RE.search(section)
+    if not match:
+        return section.strip(), ""
+    return section[:match.start()].strip(), section[match.end():].strip()
+
+class FileIndex:
+    def __init__(
+        self, db_path: str, ttl_seconds: int = FILE_INDEX_TTL_SECONDS,
+        max_entries: int = FILE_INDEX_MAX_ENTRIES, purge_seconds: int = FILE_INDEX_PURGE_SECONDS,
+    ):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.purge_seconds = purge_seconds
+        self._last_purge = 0.0
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS file_index ("
+            "content_hash TEXT NOT NULL, model TEXT NOT NULL, path TEXT NOT NULL, "
+            "summary TEXT NOT NULL, findings TEXT NOT NULL, updated_at REAL NOT NULL, "
+            "PRIMARY KEY (content_hash, model))"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS file_index_updated_at ON file_index (updated_at)")
+        conn.commit()
+        self._purge(time.time())
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _purge(self, now: float):
+        # TTL and size eviction on open and then at most every purge_seconds
+        # on write; reused rows are touched by lookup, so this is LRU
+        self._last_purge = now
+        try:
+            conn = self._connect()
+            conn.execute("DELETE FROM file_index WHERE updated_at < ?", (now - self.ttl_seconds,))
+            conn.execute(
+                "DELETE FROM file_index WHERE rowid IN "
+                "(SELECT rowid FROM file_index ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            conn.commit()
+        except sqlite3.Error:
+            pass # stale rows only cost disk space
+
+    def lookup(self, hashes: Iterable[str], model: str) -> Dict[str, Tuple[str, str]]:
+        unique = list(set(hashes))
+        found: Dict[str, Tuple[str, str]] = {}
+        now = time.time()
+        conn = self._connect()
+        for start in range(0, len(unique), 500): # stay under SQLite's variable limit
+            chunk = unique[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            try:
+                rows = conn.execute(
+                    f"SELECT content_hash, summary, findings FROM file_index "
+                    f"WHERE model = ? AND content_hash IN ({placeholders}) AND updated_at >= ?",
+                    (model, *chunk, now - self.ttl_seconds),
+                ).fetchall()
+                if rows: # reuse keeps a summary alive
+                    hits = [digest for digest, _, _ in rows]
+                    conn.execute(
+                        f"UPDATE file_index SET updated_at = ? WHERE model = ? "
+                        f"AND content_hash IN ({','.join('?' * len(hits))})",
+                        (now, model, *hits),
+                    )
+                    conn.commit()
+            except sqlite3.Error:
+                return {}
+            for digest, summary, findings in rows:
+                found[digest] = (summary, findings)
+        return found
+
+    def store(self, entries: Dict[str, Tuple[str, str, str]], model: str):
+        # entries: content hash -> (path, summary, findings)
+        if not entries:
+            return
+        now = time.time()
+        try:
+            conn = self._connect()
+            conn.executemany(
+                "INSERT OR REPLACE INTO file_index "
+                "(content_hash, model, path, summary, findings, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                [(digest, model, path, summary, findings, now) for digest, (path, summary, findings) in entries.items()],
+            )
+            conn.commit()
+        except sqlite3.Error:
+            pass # an index write failure only costs a recompute next time
+        if now - self._last_purge >= self.purge_seconds:
+            self._purge(now)
+
+file_index: Optional[FileIndex] = FileIndex(FILE_INDEX_PATH) if os.getenv("FILE_INDEX_ENABLED", "1") != "0" else None
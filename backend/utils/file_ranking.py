@@ -0,0 +1,117 @@
+import math
+import os
+import posixpath
+import re
+from typing import Dict, List, Mapping, NamedTuple, Tuple
+
+from utils.chunking import estimate_tokens
+from utils.dependency_graph import build_dependency_graph, in_degree
+
+PROJECT_CONTEXT_TOKENS = int(os.getenv("PROJECT_CONTEXT_TOKENS", "60000")) # above this, map-reduce
+# verbatim source kept when the whole project does not fit; the rest of the
+# context holds map-reduce summaries of the remaining files
+PROJECT_FILE_TOKEN_BUDGET = int(os.getenv("PROJECT_FILE_TOKEN_BUDGET", str(PROJECT_CONTEXT_TOKENS // 2)))
+if PROJECT_FILE_TOKEN_BUDGET >= PROJECT_CONTEXT_TOKENS:
+    raise ValueError(
+        f"PROJECT_FILE_TOKEN_BUDGET ({PROJECT_FILE_TOKEN_BUDGET}) must be below PROJECT_CONTEXT_TOKENS ({PROJECT_CONTEXT_TOKENS}), "
+        "or there is no room left for summaries of the other files"
+    )
+
+TYPE_WEIGHTS = {
+    ".py": 1.0, ".js": 1.0, ".ts": 1.0, ".tsx": 1.0, ".jsx": 1.0,
+    ".java": 1.0, ".go": 1.0, ".rs": 1.0, ".cpp": 1.0, ".c": 1.0, ".h": 0.8, ".hpp": 0.8,
+    ".sql": 0.7, ".sh": 0.6, ".toml": 0.6, ".yml": 0.5, ".yaml": 0.5, ".env": 0.4,
+    ".md": 0.5, ".html": 0.4, ".css": 0.3, ".scss": 0.3, ".xml": 0.3,
+    ".json": 0.3, ".txt": 0.3,
+} # how much a file of each type tells the model about the project
+
+ENTRY_POINT_NAMES = {
+    "main.py", "app.py", "__main__.py", "manage.py", "server.py", "wsgi.py", "asgi.py",
+    "index.js", "index.ts", "index.tsx", "main.js", "main.ts", "main.tsx", "main.jsx", "app.js", "app.jsx", "app.tsx", "server.js",
+    "main.go", "main.rs", "lib.rs", "main.java", "application.java", "main.c", "main.cpp",
+    "readme.md", "package.json", "pyproject.toml", "setup.py", "requirements.txt", "cargo.toml", "go.mod",
+    "docker-compose.yml", "docker-compose.yaml",
+}
+
+LOW_VALUE_NAMES = {
+    "package-lock.json", "npm-shrinkwrap.json", "pnpm-lock.yaml", "yarn.lock", "poetry.lock",
+    "pipfile.lock", "composer.lock", "cargo.lock", "gemfile.lock", "go.sum",
+}
+
+LOW_VALUE_PATH_RE = re.compile(
+    r"(^|/)(dist|build|out|vendor|third_party|coverage|\.next|fixtures?|__snapshots__|__fixtures__|migrations)/"
+    r"|\.min\.(js|css)$|\.map$|(^|/)generated/|_pb2\.py$|\.pb\.go$|\.generated\.",
+    re.IGNORECASE,
+)
+
+def is_low_value(path: str, content: str) -> bool:
+    name = posixpath.basename(path).lower()
+    if name in LOW_VALUE_NAMES or LOW_VALUE_PATH_RE.search(path):
+        return True
+    lines = content.count("\n") + 1
+    if len(content) > 2000 and len(content) / lines > 300:
+        return True # minified or machine-generated
+    if name.endswith(".json") and len(content) > 50_000:
+        return True # data dumps, not configuration
+    return False
+
+def score_file(path: str, content: str, importers: int) -> float:
+    if is_low_value(path, content):
+        return 0.0
+    name = posixpath.basename(path).lower()
+    extension = posixpath.splitext(name)[1]
+    score = TYPE_WEIGHTS.get(extension, 0.2)
+    if name in ENTRY_POINT_NAMES:
+        score += 1.0
+    score += math.log1p(importers) # imported by many files -> central module
+    if "test" in path.lower():
+        score *= 0.6
+    depth = path.count("/")
+    score *= 1 / (1 + 0.05 * depth)
+    tokens = estimate_tokens(content)
+    score *= 1 / (1 + tokens / 8000) # very large files cost more than they add
+    return score
+
+def rank_project_files(project_files: Mapping[str, str]) -> List[Tuple[str, float]]:
+    importers = in_degree(build_dependency_graph(project_files))
+    scored = [(path, score_file(path, content, importers.get(path, 0))) for path, content in project_files.items()]
+    return sorted(scored, key=lambda item: (-item[1], item[0]))
+
+class ProjectSelection(NamedTuple):
+    verbatim: Dict[str, str] # sent as source, in archive order
+    summarized: Dict[str, str] # useful files past the budget, sent as map-reduce summaries
+    listed: List[str] # low-value files, listed by path only
+
+def render_listed_files(paths: List[str]) -> str:
+    if not paths:
+        return ""
+    listing = "\n".join(f"- {path}" for path in paths)
+    return f"\n\nOther files in the project (content omitted, lower priority):\n{listing}\n"
+
+def select_project_files(
+    project_files: Mapping[str, str],
+    context_budget: int = PROJECT_CONTEXT_TOKENS,
+    token_budget: int = PROJECT_FILE_TOKEN_BUDGET,
+) -> ProjectSelection:
+    # Every useful file goes verbatim when they all fit context_budget, less
+    # the path listing of low-value files. Otherwise the highest-ranked fill
+    # token_budget and the rest are summarized instead of dropped.
+    ranked = rank_project_files(project_files)
+    listed = sorted(path for path, score in ranked if score <= 0)
+    useful = [(path, estimate_tokens(path) + estimate_tokens(project_files[path])) for path, score in ranked if score > 0]
+    available = context_budget - estimate_tokens(render_listed_files(listed))
+    if sum(tokens for _, tokens in useful) > available:
+        available = min(available, token_budget)
+
+    verbatim = set()
+    for path, tokens in useful:
+        if tokens <= available:
+            verbatim.add(path)
+            available -= tokens
+    # keep archive order so related files stay next to each other in the prompt
+    useful_paths = {path for path, _ in useful}
+    return ProjectSelection(
+        {path: project_files[path] for path in project_files if path in verbatim},
+        {path: project_files[path] for path in project_files if path in useful_paths and path not in verbatim},
+        listed,
+    )
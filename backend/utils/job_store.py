@@ -0,0 +1,55 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, Optional
+
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", os.path.join(os.getcwd(), "job_store.sqlite3"))
+JOB_TTL_SECONDS = int(os.getenv("JOB_TTL_SECONDS", str(24 * 3600)))
+
+def new_job_id() -> str:
+    return uuid.uuid4().hex
+
+class JobStore:
+    def __init__(self, db_path: str, ttl_seconds: int):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "job_id TEXT PRIMARY KEY, kind TEXT NOT NULL, outputs TEXT NOT NULL, "
+            "created_at REAL NOT NULL, expires_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_expires_at ON jobs (expires_at)")
+        conn.commit()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def save(self, job_id: str, kind: str, outputs: Dict[str, str]):
+        now = time.time()
+        conn = self._connect()
+        conn.execute("DELETE FROM jobs WHERE expires_at < ?", (now,)) # TTL eviction on write
+        conn.execute(
+            "INSERT OR REPLACE INTO jobs (job_id, kind, outputs, created_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+            (job_id, kind, json.dumps(outputs, ensure_ascii=False), now, now + self.ttl_seconds),
+        )
+        conn.commit()
+
+    def load(self, job_id: str, kind: str) -> Optional[Dict[str, str]]:
+        row = self._connect().execute(
+            "SELECT outputs FROM jobs WHERE job_id = ? AND kind = ? AND expires_at >= ?",
+            (job_id, kind, time.time()),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+job_store = JobStore(JOB_STORE_PATH, JOB_TTL_SECONDS)
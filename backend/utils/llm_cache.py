@@ -0,0 +1,241 @@
+import asyncio
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import AsyncGenerator, Generator, Optional, Tuple
+
+from utils.chunking import CHARS_PER_TOKEN, estimate_tokens
+from utils.llm_scheduler import llm_scheduler
+from utils.metrics import span
+
+CACHE_DB_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(os.getcwd(), "llm_cache.sqlite3")) # shared by all workers
+CACHE_MEMORY_BYTES = int(os.getenv("LLM_CACHE_MEMORY_BYTES", str(64 * 1024 * 1024))) # in-process LRU size
+CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+CACHE_PURGE_SECONDS = int(os.getenv("LLM_CACHE_PURGE_SECONDS", "3600")) # how often writes also delete expired rows
+CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") != "0"
+
+_REPLAY_TOKEN_RE = re.compile(r"\S+\s*|\s+")
+
+def make_cache_key(model: str, temperature, prompt_text: str) -> str:
+    digest = hashlib.sha256()
+    digest.update(f"{model}\x00{temperature}\x00".encode("utf-8"))
+    digest.update(prompt_text.encode("utf-8"))
+    return digest.hexdigest()
+
+def llm_cache_key(llm, prompt_text: str) -> str:
+    return make_cache_key(llm.model_name, llm.temperature, prompt_text)
+
+def replay_tokens(text: str) -> Generator[str, None, None]:
+    for match in _REPLAY_TOKEN_RE.finditer(text):
+        yield match.group(0) # word-sized chunks, same as a live stream
+
+class LLMCache:
+    def __init__(self, db_path: Optional[str], max_memory_bytes: int, ttl_seconds: int, purge_seconds: int = CACHE_PURGE_SECONDS):
+        self.db_path = db_path
+        self.max_memory_bytes = max_memory_bytes
+        self.ttl_seconds = ttl_seconds
+        self.purge_seconds = purge_seconds
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict() # key -> (response, expires_at)
+        self._memory_bytes = 0
+        self._last_purge = 0.0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.hits = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if self.db_path:
+            self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL") # concurrent readers across uvicorn workers
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self):
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_created_at ON llm_cache (created_at)")
+        conn.commit()
+        self._purge(time.time())
+
+    def _purge(self, now: float):
+        # TTL eviction on open and then at most every purge_seconds on write;
+        # a row expires ttl_seconds after it was created
+        self._last_purge = now
+        try:
+            conn = self._connect()
+            conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+            conn.commit()
+        except sqlite3.Error:
+            pass # expired rows are still never served
+
+    def _forget(self, key: str):
+        # caller holds self._lock
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= len(old[0].encode("utf-8"))
+
+    def _remember(self, key: str, value: str, expires_at: float):
+        size = len(value.encode("utf-8"))
+        if size > self.max_memory_bytes:
+            return # never let one entry flush the whole tier
+        with self._lock:
+            self._forget(key)
+            self._memory[key] = (value, expires_at)
+            self._memory_bytes += size
+            while self._memory_bytes > self.max_memory_bytes and self._memory:
+                _, (evicted, _) = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted.encode("utf-8"))
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[1] < now:
+                self._forget(key) # expired: the disk row is too
+            elif entry is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                self.memory_hits += 1
+                return entry[0]
+
+        if self.db_path:
+            try:
+                row = self._connect().execute(
+                    "SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+            except sqlite3.Error:
+                row = None
+            if row and now - row[1] <= self.ttl_seconds:
+                self._remember(key, row[0], row[1] + self.ttl_seconds)
+                with self._lock:
+                    self.hits += 1
+                    self.disk_hits += 1
+                return row[0]
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key: str, value: str):
+        if not value:
+            return # don't cache empty / failed generations
+        now = time.time()
+        self._remember(key, value, now + self.ttl_seconds)
+        if self.db_path:
+            try:
+                conn = self._connect()
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, response, created_at) VALUES (?, ?, ?)",
+                    (key, value, now),
+                )
+                conn.commit()
+            except sqlite3.Error:
+                pass # the memory tier still serves this worker
+            if now - self._last_purge >= self.purge_seconds:
+                self._purge(now)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+            }
+
+llm_cache = LLMCache(
+    CACHE_DB_PATH if CACHE_ENABLED else None,
+    CACHE_MEMORY_BYTES if CACHE_ENABLED else 0,
+    CACHE_TTL_SECONDS,
+)
+
+# Every provider call goes through the global scheduler; cache hits don't.
+def _invoke(llm, prompt_text: str) -> str:
+    with llm_scheduler.slot(llm.model_name, prompt_text) as usage:
+        text = llm.invoke(prompt_text).content
+        usage["tokens"] = estimate_tokens(prompt_text) + estimate_tokens(text)
+    return text
+
+async def _ainvoke(llm, prompt_text: str) -> str:
+    async with llm_scheduler.aslot(llm.model_name, prompt_text) as usage:
+        text = (await llm.ainvoke(prompt_text)).content
+        usage["tokens"] = estimate_tokens(prompt_text) + estimate_tokens(text)
+    return text
+
+async def _astream(llm, prompt_text: str) -> AsyncGenerator[str, None]:
+    async with llm_scheduler.aslot(llm.model_name, prompt_text) as usage:
+        output_chars = 0
+        async for chunk in llm.astream(prompt_text):
+            token = chunk.content or ""
+            if token:
+                output_chars += len(token)
+                yield token
+        usage["tokens"] = estimate_tokens(prompt_text) + output_chars // CHARS_PER_TOKEN
+
+def _cached_invoke(llm, prompt_text: str) -> str:
+    if not CACHE_ENABLED:
+        return _invoke(llm, prompt_text)
+    key = llm_cache_key(llm, prompt_text)
+    cached = llm_cache.get(key)
+    if cached is not None:
+        return cached
+    text = _invoke(llm, prompt_text)
+    llm_cache.set(key, text)
+    return text
+
+def cached_invoke(llm, prompt_text: str) -> str:
+    with span(f"llm.{llm.model_name}", prompt_text) as current:
+        text = _cached_invoke(llm, prompt_text)
+        current.add_output(text, streamed=False)
+    return text
+
+async def _cached_ainvoke(llm, prompt_text: str) -> str:
+    if not CACHE_ENABLED:
+        return await _ainvoke(llm, prompt_text)
+    key = llm_cache_key(llm, prompt_text)
+    cached = await asyncio.to_thread(llm_cache.get, key)
+    if cached is not None:
+        return cached
+    text = await _ainvoke(llm, prompt_text)
+    await asyncio.to_thread(llm_cache.set, key, text)
+    return text
+
+async def cached_ainvoke(llm, prompt_text: str) -> str:
+    with span(f"llm.{llm.model_name}", prompt_text) as current:
+        text = await _cached_ainvoke(llm, prompt_text)
+        current.add_output(text, streamed=False)
+    return text
+
+async def cached_astream(llm, prompt_text: str) -> AsyncGenerator[str, None]:
+    if not CACHE_ENABLED:
+        async for token in _astream(llm, prompt_text):
+            yield token
+        return
+    key = llm_cache_key(llm, prompt_text)
+    cached = await asyncio.to_thread(llm_cache.get, key)
+    if cached is not None:
+        for token in replay_tokens(cached):
+            yield token
+        return
+    parts = []
+    async for token in _astream(llm, prompt_text):
+        parts.append(token)
+        yield token
+    await asyncio.to_thread(llm_cache.set, key, "".join(parts))
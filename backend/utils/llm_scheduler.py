@@ -0,0 +1,235 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Optional
+
+from utils.chunking import estimate_tokens
+from utils.metrics import span
+
+PRIORITY_INTERACTIVE = 0 # streaming endpoints
+PRIORITY_BATCH = 10 # PDF regeneration, offline jobs
+
+DEFAULT_RPM = int(os.getenv("LLM_RPM_LIMIT", "500"))
+DEFAULT_TPM = int(os.getenv("LLM_TPM_LIMIT", "200000"))
+DEFAULT_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+OUTPUT_TOKEN_ESTIMATE = int(os.getenv("LLM_OUTPUT_TOKEN_ESTIMATE", "2000")) # reserved per call, settled afterwards
+QUEUE_CAPACITY_MINUTES = float(os.getenv("LLM_QUEUE_CAPACITY_MINUTES", "2")) # admission limit, in minutes of TPM
+
+MODEL_LIMITS = {
+    "gpt-4o": {"rpm": DEFAULT_RPM, "tpm": DEFAULT_TPM, "concurrency": DEFAULT_CONCURRENCY},
+    "gpt-4o-mini": {"rpm": DEFAULT_RPM * 2, "tpm": DEFAULT_TPM * 5, "concurrency": DEFAULT_CONCURRENCY * 2},
+}
+MODEL_LIMITS.update(json.loads(os.getenv("LLM_MODEL_LIMITS", "{}"))) # e.g. {"gpt-4o": {"rpm": 60, "tpm": 30000}}
+
+llm_priority: contextvars.ContextVar[int] = contextvars.ContextVar("llm_priority", default=PRIORITY_INTERACTIVE)
+
+class SchedulerOverloaded(Exception):
+    pass
+
+class _ModelQueue:
+    def __init__(self, rpm: int, tpm: int, concurrency: int):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.concurrency = concurrency
+        self.request_tokens = float(rpm) # token buckets start full
+        self.token_tokens = float(tpm)
+        self.updated_at = time.monotonic()
+        self.in_flight = 0
+        self.waiting = [] # heap of (priority, seq, ticket)
+        self.queued_tokens = 0
+        self.granted = 0
+        self.rejected = 0
+        self.wait_seconds = deque(maxlen=1000)
+
+    def refill(self, now: float):
+        elapsed = now - self.updated_at
+        self.updated_at = now
+        self.request_tokens = min(self.rpm, self.request_tokens + elapsed * self.rpm / 60)
+        self.token_tokens = min(self.tpm, self.token_tokens + elapsed * self.tpm / 60)
+
+    def seconds_until_ready(self, cost: int) -> float:
+        # how long until both buckets can cover the head of the queue
+        missing_requests = max(0.0, 1 - self.request_tokens) * 60 / self.rpm
+        missing_tokens = max(0.0, cost - self.token_tokens) * 60 / self.tpm
+        return max(missing_requests, missing_tokens)
+
+class _Ticket:
+    __slots__ = ("model", "cost", "priority", "enqueued_at", "event", "future", "loop", "cancelled")
+
+    def __init__(self, model: str, cost: int, priority: int):
+        self.model = model
+        self.cost = cost
+        self.priority = priority
+        self.enqueued_at = time.monotonic()
+        self.event: Optional[threading.Event] = None
+        self.future: Optional[asyncio.Future] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.cancelled = False
+
+class LLMScheduler:
+    def __init__(self, limits: Dict[str, dict]):
+        self.limits = limits
+        self._queues: Dict[str, _ModelQueue] = {}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._dispatcher: Optional[threading.Thread] = None
+
+    def _queue(self, model: str) -> _ModelQueue:
+        queue = self._queues.get(model)
+        if queue is None:
+            limits = self.limits.get(model, {})
+            queue = _ModelQueue(
+                limits.get("rpm", DEFAULT_RPM),
+                limits.get("tpm", DEFAULT_TPM),
+                limits.get("concurrency", DEFAULT_CONCURRENCY),
+            )
+            self._queues[model] = queue
+        return queue
+
+    def _ensure_dispatcher(self):
+        if self._dispatcher is None or not self._dispatcher.is_alive():
+            self._dispatcher = threading.Thread(target=self._dispatch_loop, name="llm-scheduler", daemon=True)
+            self._dispatcher.start()
+
+    def _admit(self, queue: _ModelQueue, cost: int):
+        capacity = queue.tpm * QUEUE_CAPACITY_MINUTES
+        if queue.waiting and queue.queued_tokens + cost > capacity:
+            queue.rejected += 1
+            raise SchedulerOverloaded("LLM queue is full, please retry shortly")
+
+    def check_admission(self, model: str, cost: int):
+        # lets endpoints reject with 429 before they start streaming
+        with self._cond:
+            self._admit(self._queue(model), cost)
+
+    def _enqueue(self, ticket: _Ticket):
+        with self._cond:
+            queue = self._queue(ticket.model)
+            self._admit(queue, ticket.cost)
+            heapq.heappush(queue.waiting, (ticket.priority, next(self._seq), ticket))
+            queue.queued_tokens += ticket.cost
+            self._ensure_dispatcher()
+            self._cond.notify()
+
+    def _grant(self, queue: _ModelQueue, ticket: _Ticket):
+        if ticket.event is not None:
+            ticket.event.set()
+        else:
+            try:
+                ticket.loop.call_soon_threadsafe(self._resolve_future, ticket)
+            except RuntimeError:
+                return # event loop is gone, nobody will use the slot
+        queue.request_tokens -= 1
+        queue.token_tokens -= min(ticket.cost, queue.tpm)
+        queue.in_flight += 1
+        queue.granted += 1
+        queue.wait_seconds.append(time.monotonic() - ticket.enqueued_at)
+
+    def _resolve_future(self, ticket: _Ticket):
+        if ticket.future.done():
+            self.release(ticket.model, ticket.cost, ticket.cost) # cancelled while being granted
+        else:
+            ticket.future.set_result(None)
+
+    def _dispatch_loop(self):
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                timeout = None
+                for queue in self._queues.values():
+                    queue.refill(now)
+                    while queue.waiting:
+                        _, _, ticket = queue.waiting[0]
+                        if ticket.cancelled:
+                            heapq.heappop(queue.waiting)
+                            queue.queued_tokens -= ticket.cost
+                            continue
+                        if queue.in_flight >= queue.concurrency:
+                            break # woken again by release()
+                        cost = min(ticket.cost, queue.tpm) # a huge prompt must not wait forever
+                        delay = queue.seconds_until_ready(cost)
+                        if delay > 0:
+                            timeout = delay if timeout is None else min(timeout, delay)
+                            break # strict priority order, no overtaking the head
+                        heapq.heappop(queue.waiting)
+                        queue.queued_tokens -= ticket.cost
+                        self._grant(queue, ticket)
+                self._cond.wait(timeout)
+
+    def acquire(self, model: str, cost: int, priority: Optional[int] = None):
+        ticket = _Ticket(model, cost, llm_priority.get() if priority is None else priority)
+        ticket.event = threading.Event()
+        self._enqueue(ticket)
+        ticket.event.wait()
+
+    async def aacquire(self, model: str, cost: int, priority: Optional[int] = None):
+        ticket = _Ticket(model, cost, llm_priority.get() if priority is None else priority)
+        ticket.loop = asyncio.get_running_loop()
+        ticket.future = ticket.loop.create_future()
+        self._enqueue(ticket)
+        try:
+            await ticket.future
+        except asyncio.CancelledError:
+            if ticket.future.done() and not ticket.future.cancelled():
+                self.release(model, cost, cost) # granted just before we were cancelled
+            else:
+                with self._cond:
+                    ticket.cancelled = True
+                    self._cond.notify()
+            raise
+
+    def release(self, model: str, cost: int, used_tokens: int):
+        with self._cond:
+            queue = self._queue(model)
+            queue.in_flight -= 1
+            # settle the reservation against what the call actually used
+            queue.token_tokens = min(queue.tpm, queue.token_tokens + cost - used_tokens)
+            self._cond.notify()
+
+    @contextmanager
+    def slot(self, model: str, prompt_text: str):
+        cost = estimate_tokens(prompt_text) + OUTPUT_TOKEN_ESTIMATE
+        with span("llm.queue_wait", attach=False):
+            self.acquire(model, cost)
+        usage = {"tokens": cost}
+        try:
+            yield usage
+        finally:
+            self.release(model, cost, usage["tokens"])
+
+    @asynccontextmanager
+    async def aslot(self, model: str, prompt_text: str):
+        cost = estimate_tokens(prompt_text) + OUTPUT_TOKEN_ESTIMATE
+        with span("llm.queue_wait", attach=False):
+            await self.aacquire(model, cost)
+        usage = {"tokens": cost}
+        try:
+            yield usage
+        finally:
+            self.release(model, cost, usage["tokens"])
+
+    def stats(self) -> dict:
+        with self._cond:
+            result = {}
+            for model, queue in self._queues.items():
+                waits = sorted(queue.wait_seconds)
+                result[model] = {
+                    "queue_depth": sum(1 for _, _, t in queue.waiting if not t.cancelled),
+                    "queued_tokens": queue.queued_tokens,
+                    "in_flight": queue.in_flight,
+                    "granted": queue.granted,
+                    "rejected": queue.rejected,
+                    "wait_p50_seconds": round(waits[len(waits) // 2], 4) if waits else 0.0,
+                    "wait_p95_seconds": round(waits[int(len(waits) * 0.95)], 4) if waits else 0.0,
+                    "wait_max_seconds": round(waits[-1], 4) if waits else 0.0,
+                }
+            return result
+
+llm_scheduler = LLMScheduler(MODEL_LIMITS)
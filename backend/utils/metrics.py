@@ -0,0 +1,228 @@
+import contextvars
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from utils.chunking import estimate_tokens
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+class Span:
+    __slots__ = ("name", "started", "seconds", "prompt_tokens", "output_tokens", "ttft", "parent")
+
+    def __init__(self, name: str, parent: Optional["Span"]):
+        self.name = name
+        self.started = time.perf_counter()
+        self.seconds = 0.0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+        self.ttft: Optional[float] = None
+        self.parent = parent
+
+    def add_prompt(self, text: str):
+        self.prompt_tokens += estimate_tokens(text)
+
+    def add_output(self, text: str, streamed: bool = True):
+        if streamed:
+            if self.ttft is None:
+                self.ttft = time.perf_counter() - self.started
+            self.output_tokens += estimate_tokens(text) if len(text) > 8 else 1 # ~1 token per streamed chunk
+        else:
+            self.output_tokens += estimate_tokens(text)
+
+class _Histogram:
+    def __init__(self):
+        self.buckets = [0] * len(DURATION_BUCKETS)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.total += value
+        for index, bound in enumerate(DURATION_BUCKETS):
+            if value <= bound:
+                self.buckets[index] += 1
+
+class _StageStats:
+    def __init__(self):
+        self.duration = _Histogram()
+        self.ttft = _Histogram()
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+        self.generation_seconds = 0.0 # time after the first token, for tokens/sec
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages: Dict[str, _StageStats] = {}
+
+    def record(self, span: Span):
+        with self._lock:
+            stats = self._stages.setdefault(span.name, _StageStats())
+            stats.duration.observe(span.seconds)
+            stats.prompt_tokens += span.prompt_tokens
+            stats.output_tokens += span.output_tokens
+            if span.ttft is not None:
+                stats.ttft.observe(span.ttft)
+                stats.generation_seconds += max(0.0, span.seconds - span.ttft)
+
+    def snapshot(self) -> Dict[str, _StageStats]:
+        with self._lock:
+            return dict(self._stages)
+
+metrics_registry = MetricsRegistry()
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+_request_spans: contextvars.ContextVar[Optional[List[Span]]] = contextvars.ContextVar("request_spans", default=None)
+
+def _finish(span: Span):
+    span.seconds = time.perf_counter() - span.started
+    metrics_registry.record(span)
+    if span.parent is not None:
+        # token counts roll up so a node span shows what its model calls used
+        span.parent.prompt_tokens += span.prompt_tokens
+        span.parent.output_tokens += span.output_tokens
+    spans = _request_spans.get()
+    if spans is not None:
+        spans.append(span)
+
+@contextmanager
+def span(name: str, prompt_text: Optional[str] = None, attach: bool = True):
+    # attach=False inside generators: a context var set across a yield
+    # would leak into whatever the consumer does between tokens
+    current = Span(name, _current_span.get())
+    if prompt_text:
+        current.add_prompt(prompt_text)
+    token = _current_span.set(current) if attach else None
+    try:
+        yield current
+    finally:
+        if token is not None:
+            _current_span.reset(token)
+        _finish(current)
+
+def timed(name: str):
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+async def timed_astream(name: str, prompt_text: str, tokens):
+    with span(name, prompt_text, attach=False) as current:
+        async for token in tokens:
+            current.add_output(token)
+            yield token
+
+def start_request_timings():
+    _request_spans.set([])
+
+def request_timing_summary() -> Optional[dict]:
+    spans = _request_spans.get()
+    if spans is None:
+        return None
+    summary: Dict[str, dict] = {}
+    for item in list(spans):
+        entry = summary.setdefault(item.name, {"count": 0, "seconds": 0.0, "prompt_tokens": 0, "output_tokens": 0})
+        entry["count"] += 1
+        entry["seconds"] = round(entry["seconds"] + item.seconds, 4)
+        entry["prompt_tokens"] += item.prompt_tokens
+        entry["output_tokens"] += item.output_tokens
+        if item.ttft is not None:
+            entry["ttft_seconds"] = round(min(entry.get("ttft_seconds", item.ttft), item.ttft), 4)
+            if item.seconds > item.ttft:
+                entry["tokens_per_second"] = round(item.output_tokens / (item.seconds - item.ttft), 1)
+    return summary
+
+def _labels(**labels) -> str:
+    escaped = ",".join(f'{key}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"' for key, value in labels.items())
+    return "{" + escaped + "}"
+
+def _histogram_lines(metric: str, histogram: _Histogram, **labels) -> List[str]:
+    lines = []
+    for bound, count in zip(DURATION_BUCKETS, histogram.buckets):
+        lines.append(f"{metric}_bucket{_labels(**labels, le=bound)} {count}")
+    lines.append(f"{metric}_bucket{_labels(**labels, le='+Inf')} {histogram.count}")
+    lines.append(f"{metric}_sum{_labels(**labels)} {histogram.total:.6f}")
+    lines.append(f"{metric}_count{_labels(**labels)} {histogram.count}")
+    return lines
+
+def render_prometheus(
+    cache_stats: dict, scheduler_stats: dict,
+    router_stats: Optional[dict] = None, compaction_stats: Optional[dict] = None,
+) -> str:
+    stages = metrics_registry.snapshot()
+    lines = [
+        "# HELP codexa_stage_duration_seconds Wall-clock time per pipeline stage.",
+        "# TYPE codexa_stage_duration_seconds histogram",
+    ]
+    for name, stats in sorted(stages.items()):
+        lines.extend(_histogram_lines("codexa_stage_duration_seconds", stats.duration, stage=name))
+
+    lines += ["# HELP codexa_stage_ttft_seconds Time to first model token per streaming stage.",
+              "# TYPE codexa_stage_ttft_seconds histogram"]
+    for name, stats in sorted(stages.items()):
+        if stats.ttft.count:
+            lines.extend(_histogram_lines("codexa_stage_ttft_seconds", stats.ttft, stage=name))
+
+    lines += ["# HELP codexa_stage_prompt_tokens_total Estimated prompt tokens per stage.",
+              "# TYPE codexa_stage_prompt_tokens_total counter"]
+    lines += [f"codexa_stage_prompt_tokens_total{_labels(stage=name)} {stats.prompt_tokens}" for name, stats in sorted(stages.items())]
+    lines += ["# HELP codexa_stage_output_tokens_total Estimated output tokens per stage.",
+              "# TYPE codexa_stage_output_tokens_total counter"]
+    lines += [f"codexa_stage_output_tokens_total{_labels(stage=name)} {stats.output_tokens}" for name, stats in sorted(stages.items())]
+    lines += ["# HELP codexa_stage_tokens_per_second Average generation speed after the first token.",
+              "# TYPE codexa_stage_tokens_per_second gauge"]
+    for name, stats in sorted(stages.items()):
+        if stats.generation_seconds > 0:
+            lines.append(f"codexa_stage_tokens_per_second{_labels(stage=name)} {stats.output_tokens / stats.generation_seconds:.2f}")
+
+    lines += ["# HELP codexa_llm_cache_lookups_total LLM response cache lookups by result.",
+              "# TYPE codexa_llm_cache_lookups_total counter",
+              f'codexa_llm_cache_lookups_total{{result="memory_hit"}} {cache_stats.get("memory_hits", 0)}',
+              f'codexa_llm_cache_lookups_total{{result="disk_hit"}} {cache_stats.get("disk_hits", 0)}',
+              f'codexa_llm_cache_lookups_total{{result="miss"}} {cache_stats.get("misses", 0)}']
+
+    for metric, key, kind, help_text in (
+        ("codexa_llm_queue_depth", "queue_depth", "gauge", "Calls waiting for a scheduler slot."),
+        ("codexa_llm_in_flight", "in_flight", "gauge", "Model calls currently running."),
+        ("codexa_llm_granted_total", "granted", "counter", "Scheduler slots granted."),
+        ("codexa_llm_rejected_total", "rejected", "counter", "Calls rejected by admission control."),
+        ("codexa_llm_queue_wait_p95_seconds", "wait_p95_seconds", "gauge", "p95 scheduler wait over recent calls."),
+    ):
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {kind}"]
+        lines += [f"{metric}{_labels(model=model)} {stats[key]}" for model, stats in sorted(scheduler_stats.items())]
+
+    router_stats = router_stats or {}
+    lines += ["# HELP codexa_router_requests_total Routed model calls by task and first model.",
+              "# TYPE codexa_router_requests_total counter"]
+    for task, stats in sorted(router_stats.items()):
+        for model, count in sorted(stats["first_model"].items()):
+            lines.append(f"codexa_router_requests_total{_labels(task=task, model=model)} {count}")
+    lines += ["# HELP codexa_router_escalations_total Small-model outputs that failed a quality check.",
+              "# TYPE codexa_router_escalations_total counter"]
+    for task, stats in sorted(router_stats.items()):
+        for reason, count in sorted(stats["escalations"].items()):
+            lines.append(f"codexa_router_escalations_total{_labels(task=task, reason=reason)} {count}")
+    lines += ["# HELP codexa_router_escalation_rate Escalations per cascaded call.",
+              "# TYPE codexa_router_escalation_rate gauge"]
+    lines += [f"codexa_router_escalation_rate{_labels(task=task)} {stats['escalation_rate']}" for task, stats in sorted(router_stats.items())]
+
+    compaction_stats = compaction_stats or {}
+    lines += ["# HELP codexa_prompt_compaction_tokens_total Estimated source tokens before and after prompt compaction.",
+              "# TYPE codexa_prompt_compaction_tokens_total counter",
+              f'codexa_prompt_compaction_tokens_total{{kind="original"}} {compaction_stats.get("original_tokens", 0)}',
+              f'codexa_prompt_compaction_tokens_total{{kind="compacted"}} {compaction_stats.get("compacted_tokens", 0)}']
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,202 @@
+import asyncio
+import os
+import re
+import threading
+from typing import AsyncGenerator, Callable, Dict, NamedTuple, Optional, Union
+
+from utils.chunking import estimate_tokens
+from utils.llm_cache import cached_ainvoke, cached_invoke
+from utils.source_chunks import parse_python
+
+ROUTER_ENABLED = os.getenv("MODEL_ROUTER_ENABLED", "1") != "0"
+ROUTER_LARGE_PROMPT_TOKENS = int(os.getenv("ROUTER_LARGE_PROMPT_TOKENS", "24000")) # bigger prompts start on the large model
+ROUTER_LARGE_COMPLEXITY = int(os.getenv("ROUTER_LARGE_COMPLEXITY", "15")) # static analysis score
+ROUTER_LARGE_TASKS = {t for t in os.getenv("ROUTER_LARGE_TASKS", "").split(",") if t} # always the large model
+ROUTER_SMALL_TASKS = {t for t in os.getenv("ROUTER_SMALL_TASKS", "INTERVIEW").split(",") if t} # small first, whatever the size
+ROUTER_MIN_OUTPUT_CHARS = int(os.getenv("ROUTER_MIN_OUTPUT_CHARS", "40"))
+
+_NUMBERED_RE = re.compile(r"(?m)^\s*(\d{1,2})\s*[.)\-]")
+_FENCE_RE = re.compile(r"^```[\w+-]*\n|\n?```\s*$")
+_NO_ISSUES_RE = re.compile(r"(?i)\s*no issues found\.?\s*") # the reviewer prompt's whole answer for clean code
+
+class Route(NamedTuple):
+    models: tuple # cheapest first; later ones are escalation targets
+    reason: str
+
+class Escalation(NamedTuple):
+    # yielded by the cascade streams when an attempt fails its check: the
+    # consumer drops the last `discard` characters and the next model starts
+    discard: int
+    model: str
+    reason: str
+
+# --- local quality checks: None when the output looks complete ---
+
+def _numbered_sections(text: str, expected: int) -> Optional[str]:
+    found = {int(number) for number in _NUMBERED_RE.findall(text)}
+    missing = [n for n in range(1, expected + 1) if n not in found]
+    return f"missing sections {missing[0]}-{missing[-1]} of {expected}" if missing else None
+
+def _check_review(text: str, source: Optional[str]) -> Optional[str]:
+    issues = text.count("Severity:")
+    if not issues:
+        return None if _NO_ISSUES_RE.fullmatch(text) else "no issue sections"
+    if text.count("Recommended Fix:") < issues:
+        return "last issue truncated"
+    return None
+
+def _check_test(text: str, source: Optional[str]) -> Optional[str]:
+    if "STATUS:" not in text:
+        return "no test results"
+    if "ALL TESTS PASSED" not in text and "TESTS COMPLETED" not in text:
+        return "missing summary line"
+    return None
+
+def _parses(code: str) -> bool:
+    try:
+        parse_python(code)
+        return True
+    except (SyntaxError, ValueError):
+        return False
+
+def _check_refactor(text: str, source: Optional[str]) -> Optional[str]:
+    if not source:
+        return None
+    code = _FENCE_RE.sub("", text.strip())
+    if len(code) < 0.3 * len(source.strip()):
+        return "much shorter than the input"
+    if _parses(source) and not _parses(code):
+        return "refactored Python does not parse"
+    if source.count("{") == source.count("}") and code.count("{") != code.count("}"):
+        return "unbalanced braces"
+    return None
+
+def _check_interview(text: str, source: Optional[str]) -> Optional[str]:
+    answers = len(re.findall(r"(?i)\banswer\s*:", text))
+    if answers < 20:
+        return f"{answers} of 20 answers"
+    return None
+
+def _check_documentation(text: str, source: Optional[str]) -> Optional[str]:
+    if text.count("```") % 2:
+        return "unclosed code block"
+    headings = re.findall(r"(?m)^#{1,3}\s.*$", text)
+    if not any("install" in h.lower() for h in headings) or not any("usage" in h.lower() for h in headings):
+        return "missing installation or usage section"
+    return None
+
+QUALITY_CHECKS: Dict[str, Callable[[str, Optional[str]], Optional[str]]] = {
+    "review": _check_review,
+    "test": _check_test,
+    "refactor": _check_refactor,
+    "PROJECT_REVIEW": lambda text, source: _numbered_sections(text, 15),
+    "PROJECT_EXPLAIN": lambda text, source: _numbered_sections(text, 20),
+    "INTERVIEW": _check_interview,
+    "DOCUMENTATION": _check_documentation,
+}
+
+def check_output(task: str, text: str, source: Optional[str] = None) -> Optional[str]:
+    minimum = min(ROUTER_MIN_OUTPUT_CHARS, len(source.strip()) // 2) if source else ROUTER_MIN_OUTPUT_CHARS
+    if len(text.strip()) < minimum and not (task == "review" and _NO_ISSUES_RE.fullmatch(text)):
+        return "empty output"
+    check = QUALITY_CHECKS.get(task)
+    return check(text, source) if check else None
+
+class ModelRouter:
+    # Picks the first model per call and records how often the cheap model
+    # had to be escalated, per task, so the thresholds can be tuned.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, dict] = {}
+
+    def route(self, task: str, prompt_tokens: int, small, large, complexity: int = 0) -> Route:
+        if not ROUTER_ENABLED:
+            return Route((small,) if task in ROUTER_SMALL_TASKS else (large,), "disabled")
+        if task in ROUTER_LARGE_TASKS:
+            return Route((large,), "task")
+        if task in ROUTER_SMALL_TASKS:
+            return Route((small, large), "task")
+        if prompt_tokens > ROUTER_LARGE_PROMPT_TOKENS:
+            return Route((large,), "prompt_size")
+        if complexity >= ROUTER_LARGE_COMPLEXITY:
+            return Route((large,), "complexity")
+        return Route((small, large), "default")
+
+    def _task(self, task: str) -> dict:
+        return self._stats.setdefault(task, {"requests": 0, "cascaded": 0, "first_model": {}, "route_reasons": {}, "final_model": {}, "escalations": {}})
+
+    def record_route(self, task: str, route: Route):
+        with self._lock:
+            stats = self._task(task)
+            stats["requests"] += 1
+            stats["cascaded"] += len(route.models) > 1 # started small with a fallback
+            first = route.models[0].model_name
+            stats["first_model"][first] = stats["first_model"].get(first, 0) + 1
+            stats["route_reasons"][route.reason] = stats["route_reasons"].get(route.reason, 0) + 1
+
+    def record_attempt(self, task: str, model: str, failure: Optional[str], final: bool):
+        with self._lock:
+            stats = self._task(task)
+            if final:
+                stats["final_model"][model] = stats["final_model"].get(model, 0) + 1
+            elif failure:
+                stats["escalations"][failure] = stats["escalations"].get(failure, 0) + 1
+
+    def stats(self) -> Dict[str, dict]:
+        with self._lock:
+            result = {}
+            for task, stats in self._stats.items():
+                escalated = sum(stats["escalations"].values())
+                result[task] = {
+                    **{key: dict(value) if isinstance(value, dict) else value for key, value in stats.items()},
+                    "escalation_rate": round(escalated / stats["cascaded"], 4) if stats["cascaded"] else 0.0,
+                }
+            return result
+
+model_router = ModelRouter()
+
+def _attempts(task: str, prompt_text: str, small, large, complexity: int):
+    route = model_router.route(task, estimate_tokens(prompt_text), small, large, complexity)
+    model_router.record_route(task, route)
+    return route.models
+
+def cascade_invoke(task: str, prompt_text: str, small, large, complexity: int = 0, source: Optional[str] = None) -> str:
+    models = _attempts(task, prompt_text, small, large, complexity)
+    for attempt, llm in enumerate(models):
+        text = cached_invoke(llm, prompt_text)
+        failure = check_output(task, text, source)
+        final = failure is None or attempt == len(models) - 1
+        model_router.record_attempt(task, llm.model_name, failure, final)
+        if final:
+            return text
+
+async def cascade_ainvoke(task: str, prompt_text: str, small, large, complexity: int = 0, source: Optional[str] = None) -> str:
+    models = _attempts(task, prompt_text, small, large, complexity)
+    for attempt, llm in enumerate(models):
+        text = await cached_ainvoke(llm, prompt_text)
+        failure = await asyncio.to_thread(check_output, task, text, source) # the refactor check parses Python
+        final = failure is None or attempt == len(models) - 1
+        model_router.record_attempt(task, llm.model_name, failure, final)
+        if final:
+            return text
+
+async def cascade_astream(
+    task: str, prompt_text: str, small, large, stream: Callable,
+    complexity: int = 0, source: Optional[str] = None,
+) -> AsyncGenerator[Union[str, Escalation], None]:
+    models = _attempts(task, prompt_text, small, large, complexity)
+    for attempt, llm in enumerate(models):
+        parts = []
+        async for token in stream(llm, prompt_text):
+            parts.append(token)
+            yield token
+        text = "".join(parts)
+        failure = await asyncio.to_thread(check_output, task, text, source) # parse_python serializes on a lock
+        final = failure is None or attempt == len(models) - 1
+        model_router.record_attempt(task, llm.model_name, failure, final)
+        if final:
+            return
+        yield Escalation(len(text), models[attempt + 1].model_name, failure)
+
+def escalation_event(stage: str, escalation: Escalation) -> dict:
+    return {"type": "escalate", "stage": stage, "discard": escalation.discard, "model": escalation.model, "reason": escalation.reason}
@@ -1,86 +1,35 @@
-from fastapi.responses import FileResponse
 from reportlab.platypus import (
-    SimpleDocTemplate,
     Paragraph,
     Spacer,
-    Preformatted,
     PageBreak
 )
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.units import inch
-import uuid
-import os
+from xml.sax.saxutils import escape
+from utils.pdf_renderer import build_pdf, code_blocks, pdf_styles
 
-def generate_single_review_pdf(review, tests, refactored):
-    filename = f"single_review_{uuid.uuid4().hex}.pdf"
-    path = f"/tmp/{filename}"
-
-    doc = SimpleDocTemplate(
-        path,
-        pagesize=A4,
-        rightMargin=40,
-        leftMargin=40,
-        topMargin=40,
-        bottomMargin=40
-    )
-
-    styles = getSampleStyleSheet()
-
-    title = ParagraphStyle(
-        "Title",
-        fontSize=18,
-        spaceAfter=20,
-        alignment=1
-    )
-
-    header = ParagraphStyle(
-        "Header",
-        fontSize=14,
-        spaceBefore=20,
-        spaceAfter=10
-    )
-
-    body = ParagraphStyle(
-        "Body",
-        fontSize=10,
-        leading=14
-    )
-
-    code = ParagraphStyle(
-        "Code",
-        fontName="Courier",
-        fontSize=9,
-        leading=12
-    )
+def render_single_review_pdf(review: str, tests: str, refactored: str) -> bytes:
+    # runs in a render worker process, see utils/pdf_renderer.render_pdf
+    styles = pdf_styles()
 
     content = []
 
-    content.append(Paragraph("AI Code Review Report", title))
+    content.append(Paragraph("AI Code Review Report", styles["title"]))
     content.append(Spacer(1, 12))
 
-    content.append(Paragraph("Review Report", header))
+    content.append(Paragraph("Review Report", styles["header"]))
     for para in review.split("\n\n"):
-        content.append(Paragraph(para.replace("&", "&amp;"), body))
+        content.append(Paragraph(escape(para), styles["body"]))
         content.append(Spacer(1, 6))
 
     content.append(PageBreak())
 
-    content.append(Paragraph("Test Suggestions", header))
+    content.append(Paragraph("Test Suggestions", styles["header"]))
     for para in tests.split("\n\n"):
-        content.append(Paragraph(para.replace("&", "&amp;"), body))
+        content.append(Paragraph(escape(para), styles["body"]))
         content.append(Spacer(1, 6))
 
     content.append(PageBreak())
 
-    content.append(Paragraph("Refactored Code", header))
-    content.append(
-        Preformatted(
-            refactored,
-            style=code,
-            maxLineLength=100
-        )
-    )
+    content.append(Paragraph("Refactored Code", styles["header"]))
+    content.extend(code_blocks(refactored, styles["code"]))
 
-    doc.build(content)
-    return path
+    return build_pdf(content)
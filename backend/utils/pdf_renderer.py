@@ -0,0 +1,141 @@
+import asyncio
+import functools
+import hashlib
+import io
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, List, Optional
+
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.platypus import Preformatted, SimpleDocTemplate
+
+from utils.metrics import span
+
+PDF_CACHE_MAX_ENTRIES = int(os.getenv("PDF_CACHE_MAX_ENTRIES", "64"))
+PDF_CACHE_MAX_BYTES = int(os.getenv("PDF_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))
+PDF_RENDER_PROCESSES = int(os.getenv("PDF_RENDER_PROCESSES", str(min(4, os.cpu_count() or 1)))) # 0 renders in a thread
+PDF_POOL_MIN_CHARS = int(os.getenv("PDF_POOL_MIN_CHARS", "65536")) # smaller reports are not worth the IPC
+PDF_CODE_BLOCK_LINES = int(os.getenv("PDF_CODE_BLOCK_LINES", "60")) # lines per Preformatted flowable
+
+@functools.lru_cache(maxsize=1)
+def pdf_styles() -> Dict[str, ParagraphStyle]:
+    # built once per process instead of on every render
+    sample = getSampleStyleSheet()
+    return {
+        "title": ParagraphStyle("Title", fontSize=18, spaceAfter=20, alignment=1),
+        "header": ParagraphStyle("Header", fontSize=14, spaceBefore=20, spaceAfter=10),
+        "body": ParagraphStyle("Body", fontSize=10, leading=14),
+        "code": ParagraphStyle("Code", fontName="Courier", fontSize=9, leading=12),
+        "report_title": sample["Title"],
+    }
+
+def code_blocks(text: str, style: ParagraphStyle, max_line_length: int = 100) -> List[Preformatted]:
+    # One Preformatted per few dozen lines: ReportLab re-splits a single
+    # flowable at every page break, which is quadratic on long reports.
+    lines = text.split("\n")
+    return [
+        Preformatted("\n".join(lines[start:start + PDF_CODE_BLOCK_LINES]), style, maxLineLength=max_line_length)
+        for start in range(0, len(lines), PDF_CODE_BLOCK_LINES)
+    ]
+
+def build_pdf(story: list) -> bytes:
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=A4,
+        rightMargin=40,
+        leftMargin=40,
+        topMargin=40,
+        bottomMargin=40
+    )
+    doc.build(story)
+    return buffer.getvalue()
+
+class PdfCache:
+    # rendered bytes by content hash, LRU-evicted by count and total size
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._entries.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key: str, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            self._bytes -= len(previous) if previous else 0
+            self._entries[key] = data
+            self._bytes += len(data)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "hits": self.hits, "misses": self.misses}
+
+pdf_cache = PdfCache(PDF_CACHE_MAX_ENTRIES, PDF_CACHE_MAX_BYTES)
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+def _render_pool() -> ProcessPoolExecutor:
+    # spawn, not fork: the server process has threads and open SQLite handles
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(PDF_RENDER_PROCESSES, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+def shutdown_render_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+def pdf_key(render: Callable, args: tuple) -> str:
+    digest = hashlib.sha256(f"{render.__module__}.{render.__qualname__}".encode("utf-8"))
+    for arg in args:
+        digest.update(b"\x00" + str(arg).encode("utf-8", errors="ignore"))
+    return digest.hexdigest()
+
+async def render_pdf(stage: str, render: Callable[..., bytes], *args: str) -> bytes:
+    # cached bytes, else a worker process for big reports (ReportLab holds
+    # the GIL for the whole layout), else a thread
+    key = pdf_key(render, args)
+    data = pdf_cache.get(key)
+    if data is not None:
+        return data
+    with span(stage):
+        if PDF_RENDER_PROCESSES > 0 and sum(len(str(arg)) for arg in args) >= PDF_POOL_MIN_CHARS:
+            try:
+                data = await asyncio.get_running_loop().run_in_executor(_render_pool(), render, *args)
+            except BrokenProcessPool:
+                shutdown_render_pool() # a worker died; render this one locally and respawn next time
+                data = await asyncio.to_thread(render, *args)
+        else:
+            data = await asyncio.to_thread(render, *args)
+    if len(data) < 1000:
+        raise RuntimeError("PDF generation failed")
+    pdf_cache.put(key, data)
+    return data
@@ -1,40 +1,14 @@
-from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Preformatted
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.platypus import Paragraph, Spacer
 from reportlab.lib.units import inch
 from xml.sax.saxutils import escape
-import uuid, os
+from utils.pdf_renderer import build_pdf, code_blocks, pdf_styles
 
-def generate_project_pdf(title: str, content: str) -> str:
-    filename = f"project_report_{uuid.uuid4().hex}.pdf"
-    path = os.path.join(os.getcwd(), filename)
-
-    doc = SimpleDocTemplate(
-        path,
-        pagesize=A4,
-        rightMargin=40,
-        leftMargin=40,
-        topMargin=40,
-        bottomMargin=40
-    )
-
-    styles = getSampleStyleSheet()
-
-    code_style = ParagraphStyle(
-        "CodeStyle",
-        fontName="Courier",
-        fontSize=9,
-        leading=12
-    )
+def render_project_pdf(title: str, content: str) -> bytes:
+    # runs in a render worker process, see utils/pdf_renderer.render_pdf
+    styles = pdf_styles()
 
     story = []
-    story.append(Paragraph(escape(title), styles["Title"]))
+    story.append(Paragraph(escape(title), styles["report_title"]))
     story.append(Spacer(1, 0.3 * inch))
-    safe_text = escape(content)
-    story.append(Preformatted(safe_text, code_style))
-    doc.build(story)
-
-    if not os.path.exists(path) or os.path.getsize(path) < 1000:
-        raise RuntimeError("PDF generation failed")
-
-    return path
+    story.extend(code_blocks(content, styles["code"])) # Preformatted draws text as-is, no markup escaping
+    return build_pdf(story)
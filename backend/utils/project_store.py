@@ -0,0 +1,118 @@
+import io
+import mmap
+import os
+import tempfile
+from collections.abc import Mapping
+from typing import Dict, Iterator, Optional, TextIO, Tuple, Union
+
+PROJECT_SPOOL_MAX_BYTES = int(os.getenv("PROJECT_SPOOL_MAX_BYTES", str(4 * 1024 * 1024))) # larger uploads move to a memory-mapped temp file
+
+class ProjectFiles(Mapping):
+    # Every file's UTF-8 bytes back to back in one buffer, with an offset
+    # index. Reads as Dict[str, str], but contents are decoded on access and
+    # not kept: passes over the whole project (ranking, hashing, indexing)
+    # hold one file's text at a time instead of a str per file for the
+    # lifetime of the request. Past PROJECT_SPOOL_MAX_BYTES the buffer is a
+    # memory-mapped temp file, so the pages are the kernel's to reclaim.
+    def __init__(self):
+        self._index: Dict[str, Tuple[int, int, int]] = {} # path -> (offset, byte length, text length)
+        self._pending: Optional[bytearray] = bytearray()
+        self._spill = None # temp file once past PROJECT_SPOOL_MAX_BYTES
+        self._view: Optional[memoryview] = None
+        self._map: Optional[mmap.mmap] = None
+        self._size = 0
+
+    def add(self, path: str, data: bytes, text_length: int):
+        # data must be valid UTF-8; text_length is len() of its decoded form
+        if self._view is not None:
+            raise RuntimeError("ProjectFiles is sealed")
+        self._index[path] = (self._size, len(data), text_length)
+        self._size += len(data)
+        if self._spill is None and self._size > PROJECT_SPOOL_MAX_BYTES:
+            self._spill = tempfile.TemporaryFile(prefix="codexa-project-")
+            self._spill.write(self._pending)
+            self._pending = None
+        elif self._spill is None:
+            self._pending += data
+            return
+        self._spill.write(data)
+
+    def add_source(self, path: str, data: bytes) -> bool:
+        # raw file bytes as read from disk or a ZIP; undecodable bytes are
+        # dropped as before, blank files are skipped
+        try:
+            content = data.decode("utf-8")
+        except UnicodeDecodeError:
+            content = data.decode("utf-8", errors="ignore")
+            data = content.encode("utf-8")
+        if not content.strip():
+            return False
+        self.add(path, data, len(content))
+        return True
+
+    def seal(self) -> "ProjectFiles":
+        if self._view is not None:
+            return self
+        if self._spill is not None and self._size:
+            self._spill.flush()
+            self._map = mmap.mmap(self._spill.fileno(), 0, access=mmap.ACCESS_READ)
+            self._view = memoryview(self._map)
+        else:
+            self._view = memoryview(self._pending).toreadonly() # pins the bytearray, no copy
+        self._pending = None
+        return self
+
+    def raw(self, path: str) -> memoryview:
+        # the stored bytes, without decoding or copying
+        offset, length, _ = self._index[path]
+        return self.seal()._view[offset:offset + length]
+
+    def text_length(self, path: str) -> int:
+        return self._index[path][2]
+
+    @property
+    def nbytes(self) -> int:
+        return self._size
+
+    def __getitem__(self, path: str) -> str:
+        return str(self.raw(path), "utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._index)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, path) -> bool:
+        return path in self._index
+
+    def raw_items(self) -> Iterator[Tuple[str, memoryview]]:
+        for path in self._index:
+            yield path, self.raw(path)
+
+def file_bytes(project_files: Mapping, path: str) -> Union[bytes, memoryview]:
+    # for hashing: stored bytes when available, encoded text otherwise
+    if isinstance(project_files, ProjectFiles):
+        return project_files.raw(path)
+    return project_files[path].encode("utf-8", errors="ignore")
+
+def file_text_length(project_files: Mapping, path: str) -> int:
+    if isinstance(project_files, ProjectFiles):
+        return project_files.text_length(path)
+    return len(project_files[path])
+
+def write_project_files(out: TextIO, project_files: Mapping):
+    # the "File:" framing of the project prompts, written piece by piece
+    # instead of building a string per file and joining them
+    for number, (name, content) in enumerate(project_files.items()):
+        out.write("\n\nFile:" if number else "\nFile:")
+        out.write(name)
+        out.write("\n")
+        out.write(content)
+        out.write("\n")
+
+def render_project_files(project_files: Mapping, trailer: str = "") -> str:
+    out = io.StringIO()
+    write_project_files(out, project_files)
+    out.write(trailer)
+    return out.getvalue()
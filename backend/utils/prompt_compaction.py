@@ -0,0 +1,213 @@
+import os
+import re
+import threading
+from typing import Dict, List, NamedTuple
+
+from utils.chunking import estimate_tokens
+
+COMPACTION_ENABLED = os.getenv("PROMPT_COMPACTION_ENABLED", "1") != "0"
+
+DEFAULT_LANGUAGE = "python, go, html, css, java, javascript, typescript, rust, c, cpp" # unknown extensions
+
+LANGUAGES_BY_EXTENSION = {
+    ".py": "Python", ".pyi": "Python",
+    ".js": "JavaScript", ".mjs": "JavaScript", ".cjs": "JavaScript", ".jsx": "JavaScript (React JSX)",
+    ".ts": "TypeScript", ".tsx": "TypeScript (React TSX)",
+    ".go": "Go", ".java": "Java", ".kt": "Kotlin", ".scala": "Scala", ".rs": "Rust",
+    ".c": "C", ".h": "C", ".cpp": "C++", ".cc": "C++", ".hpp": "C++", ".cs": "C#",
+    ".rb": "Ruby", ".php": "PHP", ".swift": "Swift", ".dart": "Dart",
+    ".html": "HTML", ".css": "CSS", ".scss": "SCSS", ".vue": "Vue", ".svelte": "Svelte",
+    ".sql": "SQL", ".sh": "Shell", ".bash": "Shell", ".ps1": "PowerShell",
+    ".json": "JSON", ".yaml": "YAML", ".yml": "YAML", ".toml": "TOML", ".md": "Markdown",
+}
+_SHEBANG_LANGUAGES = (("python", "Python"), ("node", "JavaScript"), ("bash", "Shell"), ("sh", "Shell"), ("ruby", "Ruby"))
+
+_HASH_COMMENT = (".py", ".pyi", ".rb", ".sh", ".bash", ".yaml", ".yml", ".toml", ".ps1")
+_DASH_COMMENT = (".sql",)
+
+_LICENSE_WORDS = ("license", "copyright", "spdx-license-identifier", "permission is hereby granted", "all rights reserved")
+_BANNER_RE = re.compile(r"^\s*(#|//|--)\s*([=\-*#~_+])\2{9,}\s*$") # comment lines of repeated punctuation
+_BASE64_RE = re.compile(r"(?:data:[\w/+.-]+;base64,)?[A-Za-z0-9+/]{120,}={0,2}")
+_LINE_REF_RE = re.compile(r"\b(L\s?|[Ll]ines?\s+)(\d+)(?:(\s*(?:-|–|to)\s*)(\d+))?\b")
+_OPEN_REF_RE = re.compile(r"\b[Ll][\w \-–]*$") # a reference that may continue in the next token
+
+class CompactedSource(NamedTuple):
+    text: str
+    line_map: List[int] # compacted line (index) -> original line number; empty when unchanged
+    original_tokens: int
+    compacted_tokens: int
+
+def detect_language(file_name: str, code: str = "") -> str:
+    extension = os.path.splitext(file_name or "")[1].lower()
+    if extension in LANGUAGES_BY_EXTENSION:
+        return LANGUAGES_BY_EXTENSION[extension]
+    first_line = code[:200].split("\n", 1)[0]
+    if first_line.startswith("#!"):
+        for needle, language in _SHEBANG_LANGUAGES:
+            if needle in first_line:
+                return language
+    return DEFAULT_LANGUAGE
+
+def _comment_prefix(file_name: str) -> str:
+    lower = (file_name or "").lower()
+    if lower.endswith(_HASH_COMMENT):
+        return "#"
+    if lower.endswith(_DASH_COMMENT):
+        return "--"
+    if lower.endswith((".html", ".md", ".vue", ".svelte")):
+        return "<!--"
+    return "//"
+
+def _is_banner(line: str, prefix: str) -> bool:
+    # only in the file's own comment syntax: bare runs are setext underlines,
+    # docstring rules or diff separators, and "--" is code outside SQL
+    match = _BANNER_RE.match(line)
+    return bool(match) and match.group(1) == prefix
+
+def _marker(prefix: str, first: int, last: int, what: str) -> str:
+    text = f"[lines {first}-{last} omitted: {what}]"
+    if prefix == "<!--":
+        return f"<!-- {text} -->"
+    return f"{prefix} {text}"
+
+def _license_header_end(lines: List[str], prefix: str) -> int:
+    # index just past a leading comment block that reads like a license
+    start = 0
+    while start < len(lines) and (lines[start].startswith("#!") or "coding" in lines[start][:40] and lines[start].startswith("#")):
+        start += 1 # shebang / encoding lines stay
+    end = start
+    in_block = False
+    while end < len(lines):
+        stripped = lines[end].strip()
+        if in_block:
+            in_block = "*/" not in stripped and "-->" not in stripped
+        elif stripped.startswith(("/*", "<!--")):
+            in_block = "*/" not in stripped[2:] and "-->" not in stripped[4:]
+        elif not stripped or not stripped.startswith(prefix):
+            break
+        end += 1
+    block = "\n".join(lines[start:end]).lower()
+    if end - start >= 3 and any(word in block for word in _LICENSE_WORDS):
+        return end
+    return 0
+
+def compact_source(code: str, file_name: str = "") -> CompactedSource:
+    # Strips trailing whitespace, repeated blank lines, punctuation banners,
+    # license headers and base64 blobs; line_map keeps original numbering.
+    original_tokens = estimate_tokens(code)
+    if not COMPACTION_ENABLED or not code:
+        return CompactedSource(code, [], original_tokens, original_tokens)
+
+    lines = code.splitlines()
+    prefix = _comment_prefix(file_name)
+    out: List[str] = []
+    line_map: List[int] = []
+    header_end = _license_header_end(lines, prefix)
+    start = 0
+    while start < len(lines) and lines[start].startswith("#!"):
+        out.append(lines[start].rstrip())
+        line_map.append(start + 1)
+        start += 1
+    if header_end:
+        out.append(_marker(prefix, start + 1, header_end, "license header"))
+        line_map.append(start + 1)
+        start = header_end
+
+    for index in range(start, len(lines)):
+        line = lines[index].rstrip()
+        if not line:
+            if out and out[-1] == "":
+                continue # one blank line is enough
+        elif _is_banner(line, prefix):
+            continue
+        elif len(line) >= 120:
+            line = _BASE64_RE.sub(lambda m: f"<base64 blob, {len(m.group(0))} chars>", line)
+        out.append(line)
+        line_map.append(index + 1)
+
+    text = "\n".join(out) + ("\n" if code.endswith("\n") else "")
+    if len(out) == len(lines):
+        line_map = [] # numbering unchanged
+    return CompactedSource(text, line_map, original_tokens, estimate_tokens(text))
+
+def compact_project_files(project_files: Dict[str, str]) -> Dict[str, CompactedSource]:
+    return {name: compact_source(content, name) for name, content in project_files.items()}
+
+def invert_line_map(line_map: List[int], total_lines: int) -> List[int]:
+    # original line -> compacted line, for removed lines the nearest kept one above
+    inverse, compacted = [], 1
+    for original in range(1, total_lines + 1):
+        while compacted < len(line_map) and line_map[compacted] <= original:
+            compacted += 1
+        inverse.append(compacted)
+    return inverse
+
+def map_line_references(text: str, line_map: List[int]) -> str:
+    # rewrites "line 12", "lines 3-8", "L40" through line_map
+    if not line_map:
+        return text
+
+    def to_original(number: str) -> str:
+        n = int(number)
+        return str(line_map[n - 1]) if 1 <= n <= len(line_map) else number
+
+    def replace(match) -> str:
+        label, first, separator, last = match.groups()
+        mapped = label + to_original(first)
+        return mapped + separator + to_original(last) if last else mapped
+
+    return _LINE_REF_RE.sub(replace, text)
+
+class LineReferenceMapper:
+    # streaming map_line_references: holds back a possibly unfinished
+    # reference at the end of the buffer until the next token arrives
+    def __init__(self, line_map: List[int]):
+        self.line_map = line_map
+        self.pending = ""
+
+    def feed(self, token: str) -> str:
+        self.pending += token
+        window = self.pending[-32:]
+        open_ref = _OPEN_REF_RE.search(window)
+        cut = len(self.pending) - len(window) + open_ref.start() if open_ref else len(self.pending)
+        ready, self.pending = self.pending[:cut], self.pending[cut:]
+        return map_line_references(ready, self.line_map)
+
+    def flush(self) -> str:
+        ready, self.pending = self.pending, ""
+        return map_line_references(ready, self.line_map)
+
+class CompactionStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.original_tokens = 0
+        self.compacted_tokens = 0
+
+    def record(self, original_tokens: int, compacted_tokens: int) -> dict:
+        with self._lock:
+            self.requests += 1
+            self.original_tokens += original_tokens
+            self.compacted_tokens += compacted_tokens
+        return compaction_event(original_tokens, compacted_tokens)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "original_tokens": self.original_tokens,
+                "compacted_tokens": self.compacted_tokens,
+                "saved_tokens": self.original_tokens - self.compacted_tokens,
+            }
+
+compaction_stats = CompactionStats()
+
+def compaction_event(original_tokens: int, compacted_tokens: int) -> dict:
+    saved = original_tokens - compacted_tokens
+    return {
+        "type": "compaction",
+        "original_tokens": original_tokens,
+        "compacted_tokens": compacted_tokens,
+        "saved_tokens": saved,
+        "saved_ratio": round(saved / original_tokens, 4) if original_tokens else 0.0,
+    }
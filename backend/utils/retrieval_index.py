@@ -0,0 +1,159 @@
+import functools
+import hashlib
+import heapq
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+from utils.project_store import file_bytes
+from utils.source_chunks import plan_source_chunks
+
+RETRIEVAL_CHUNK_TOKENS = int(os.getenv("RETRIEVAL_CHUNK_TOKENS", "400")) # per indexed chunk
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "8")) # chunks sent with a question
+RETRIEVAL_CACHE_SIZE = int(os.getenv("RETRIEVAL_CACHE_SIZE", "16")) # indexed uploads kept in memory
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+
+_WORD_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+_PART_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by do does for from how i if in is it of on or the this to was what when where which who why with "
+    "self return def class import none true false null var let const function".split()
+)
+
+@functools.lru_cache(maxsize=65536)
+def _word_terms(word: str) -> Tuple[str, ...]:
+    # identifiers count whole and by their camelCase / snake_case parts,
+    # so "getUserToken" matches questions about "user token"
+    lower = word.lower()
+    terms = [lower] if len(lower) > 1 and lower not in _STOPWORDS else []
+    if "_" in word or not (word.islower() or word.isupper()):
+        terms += [
+            part for part in (p.lower() for p in _PART_RE.findall(word))
+            if len(part) > 1 and part != lower and part not in _STOPWORDS
+        ]
+    return tuple(terms)
+
+def tokenize(text: str) -> List[str]:
+    terms: List[str] = []
+    for word in _WORD_RE.findall(text):
+        terms.extend(_word_terms(word))
+    return terms
+
+class RetrievalChunk(NamedTuple):
+    path: str
+    start_line: int
+    end_line: int
+    text: str
+
+class SearchHit(NamedTuple):
+    score: float
+    chunk: RetrievalChunk
+
+def project_hash(project_files: Mapping[str, str]) -> str:
+    digest = hashlib.sha256()
+    for path in sorted(project_files):
+        digest.update(path.encode("utf-8") + b"\x00")
+        digest.update(file_bytes(project_files, path))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+class BM25Index:
+    # Inverted index over function/class-aligned chunks of every file. The
+    # file path is indexed with each chunk so "auth" also finds auth.py.
+    def __init__(self, project_files: Mapping[str, str], chunk_tokens: int = RETRIEVAL_CHUNK_TOKENS):
+        started = time.perf_counter()
+        self.chunks: List[RetrievalChunk] = []
+        self.lengths: List[int] = []
+        self.postings: Dict[str, List[Tuple[int, int]]] = {} # term -> [(chunk id, term frequency)]
+        for path, content in project_files.items():
+            path_terms = tokenize(path)
+            for chunk in plan_source_chunks(content, path, chunk_tokens, parse=False).chunks:
+                chunk_id = len(self.chunks)
+                terms = tokenize(chunk.text) + path_terms
+                self.chunks.append(RetrievalChunk(path, chunk.start_line, chunk.end_line, chunk.text))
+                self.lengths.append(len(terms))
+                for term, count in Counter(terms).items():
+                    self.postings.setdefault(term, []).append((chunk_id, count))
+        self.average_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0.0
+        self.build_seconds = time.perf_counter() - started
+
+    def _idf(self, term: str) -> float:
+        documents = len(self.postings.get(term, ()))
+        return math.log(1 + (len(self.chunks) - documents + 0.5) / (documents + 0.5))
+
+    def search(self, query: str, k: int = RETRIEVAL_TOP_K) -> List[SearchHit]:
+        scores: Dict[int, float] = {}
+        average = self.average_length or 1.0
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self._idf(term)
+            for chunk_id, frequency in postings:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[chunk_id] / average)
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [SearchHit(score, self.chunks[chunk_id]) for chunk_id, score in best]
+
+class RetrievalCache:
+    # bounded LRU of built indexes, keyed by upload content hash
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, BM25Index]" = OrderedDict()
+        self._building: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.builds = 0
+
+    def get_or_build(self, project_files: Mapping[str, str], key: Optional[str] = None) -> Tuple[BM25Index, bool]:
+        # (index, cached); concurrent requests for one upload share a single build
+        key = key or project_hash(project_files)
+        while True:
+            with self._lock:
+                index = self._entries.get(key)
+                if index is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return index, True
+                pending = self._building.get(key)
+                if pending is None:
+                    pending = self._building[key] = threading.Event()
+                    break
+            pending.wait()
+
+        try:
+            index = BM25Index(project_files)
+            with self._lock:
+                self.builds += 1
+                self._entries[key] = index
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            return index, False
+        finally:
+            with self._lock:
+                self._building.pop(key, None)
+            pending.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "indexes": len(self._entries),
+                "chunks": sum(len(index.chunks) for index in self._entries.values()),
+                "hits": self.hits,
+                "builds": self.builds,
+            }
+
+retrieval_cache = RetrievalCache(RETRIEVAL_CACHE_SIZE)
+
+def render_hits(hits: List[SearchHit]) -> str:
+    # same "File:" framing as the full-context actions, plus the line range
+    return "\n".join(f"\nFile:{hit.chunk.path} (lines {hit.chunk.start_line}-{hit.chunk.end_line})\n{hit.chunk.text}\n" for hit in hits)
+
+def retrieval_tokens(top_k: int = RETRIEVAL_TOP_K) -> int:
+    # upper bound on the context a question sends, for admission control
+    return top_k * RETRIEVAL_CHUNK_TOKENS
@@ -0,0 +1,152 @@
+import asyncio
+import contextlib
+import hashlib
+import json
+import os
+import time
+import traceback
+from collections import OrderedDict
+from typing import AsyncGenerator, AsyncIterator, Dict, Iterable, List, Optional
+
+RUN_LOG_TTL_SECONDS = int(os.getenv("RUN_LOG_TTL_SECONDS", "900")) # finished runs stay resumable this long
+RUN_LOG_MAX_BYTES = int(os.getenv("RUN_LOG_MAX_BYTES", str(64 * 1024 * 1024))) # across all runs
+RUN_DETACH_GRACE_SECONDS = float(os.getenv("RUN_DETACH_GRACE_SECONDS", "5")) # time to resume before an abandoned run is cancelled
+
+def run_key(*parts: str, files: Optional[Iterable] = None) -> str:
+    # identity of a request for singleflight: options plus content
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8") + b"\x00")
+    for path, content in sorted(files or ()):
+        digest.update(path.encode("utf-8") + b"\x00")
+        digest.update(content.encode("utf-8", errors="ignore") if isinstance(content, str) else content) # str or stored bytes
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+class RunLog:
+    # Every event a run produces, in order; an event's "seq" is its index.
+    # The producer task is decoupled from connections, so a dropped client
+    # can re-attach and replay from its last seq while generation continues.
+    def __init__(self, run_id: str, kind: str, framing: str):
+        self.run_id = run_id
+        self.kind = kind
+        self.framing = framing
+        self.events: List[dict] = []
+        self.size = 0
+        self.finished = False
+        self.finished_at: Optional[float] = None
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._updated = asyncio.Event()
+        self._grace: Optional[asyncio.TimerHandle] = None
+
+    def append(self, event: dict):
+        event = {**event, "seq": len(self.events)}
+        self.events.append(event)
+        self.size += len(json.dumps(event, ensure_ascii=False))
+        self._updated.set()
+        self._updated = asyncio.Event()
+
+    def finish(self):
+        self.finished = True
+        self.finished_at = time.monotonic()
+        self._updated.set()
+        if self._grace is not None:
+            self._grace.cancel()
+
+    async def produce(self, events: AsyncIterator[dict]):
+        try:
+            async with contextlib.aclosing(events) as stream:
+                async for event in stream:
+                    self.append(event)
+        except asyncio.CancelledError:
+            self.append({"type": "error", "message": "Run cancelled: no client attached"})
+            raise
+        except Exception as e:
+            traceback.print_exc()
+            self.append({"type": "error", "message": f"{type(e).__name__}: {str(e)}"})
+        finally:
+            self.finish()
+
+    def _detached(self):
+        self._grace = None
+        if self.subscribers == 0 and not self.finished and self.task is not None:
+            self.task.cancel() # nobody came back, stop paying for tokens
+
+    def _start_grace(self):
+        self._grace = asyncio.get_running_loop().call_later(RUN_DETACH_GRACE_SECONDS, self._detached)
+
+    async def follow(self, after: int = -1) -> AsyncGenerator[dict, None]:
+        offset = max(0, after + 1)
+        self.subscribers += 1
+        if self._grace is not None:
+            self._grace.cancel()
+            self._grace = None
+        try:
+            while True:
+                updated = self._updated
+                while offset < len(self.events):
+                    yield self.events[offset]
+                    offset += 1
+                if self.finished:
+                    return
+                await updated.wait()
+        finally:
+            self.subscribers -= 1
+            if self.subscribers == 0 and not self.finished:
+                self._start_grace()
+
+class RunRegistry:
+    def __init__(self, ttl_seconds: int, max_bytes: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._runs: "OrderedDict[str, RunLog]" = OrderedDict()
+        self._inflight: Dict[str, RunLog] = {} # run_key -> run still generating
+        self.coalesced = 0
+
+    def _evict(self):
+        now = time.monotonic()
+        for run_id, run in list(self._runs.items()):
+            if run.finished and now - run.finished_at > self.ttl_seconds:
+                del self._runs[run_id]
+        total = sum(run.size for run in self._runs.values())
+        for run_id, run in list(self._runs.items()): # oldest first, in-flight runs are never dropped
+            if total <= self.max_bytes:
+                break
+            if run.finished:
+                total -= run.size
+                del self._runs[run_id]
+
+    def start(self, run_id: str, kind: str, framing: str, events: AsyncIterator[dict], key: Optional[str] = None) -> RunLog:
+        self._evict()
+        run = RunLog(run_id, kind, framing)
+        run.task = asyncio.create_task(run.produce(events)) # copies the request's context vars
+        run._start_grace() # until the first follower attaches
+        self._runs[run_id] = run
+        if key is not None:
+            self._inflight[key] = run
+            run.task.add_done_callback(lambda _: self._inflight.pop(key, None) if self._inflight.get(key) is run else None)
+        return run
+
+    def join(self, key: str) -> Optional[RunLog]:
+        # singleflight: an identical request still generating is followed
+        # from seq 0 instead of paying for a second generation
+        run = self._inflight.get(key)
+        if run is None or run.finished:
+            return None
+        self.coalesced += 1
+        return run
+
+    def get(self, run_id: str) -> Optional[RunLog]:
+        self._evict()
+        return self._runs.get(run_id)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "runs": len(self._runs),
+            "in_flight": sum(1 for run in self._runs.values() if not run.finished),
+            "coalesced": self.coalesced,
+            "bytes": sum(run.size for run in self._runs.values()),
+        }
+
+run_registry = RunRegistry(RUN_LOG_TTL_SECONDS, RUN_LOG_MAX_BYTES)
@@ -0,0 +1,194 @@
+import ast
+import contextlib
+import os
+import re
+import sys
+import threading
+from typing import List, NamedTuple, Optional
+
+from utils.chunking import estimate_tokens
+
+SOURCE_CHUNK_TOKENS = int(os.getenv("SOURCE_CHUNK_TOKENS", "3000")) # per reviewed segment
+SOURCE_OUTLINE_TOKENS = int(os.getenv("SOURCE_OUTLINE_TOKENS", "1500")) # shared file-level context
+
+BRACE_EXTENSIONS = (".js", ".ts", ".tsx", ".jsx", ".java", ".go", ".rs", ".cpp", ".c", ".h", ".hpp", ".css", ".scss", ".json", ".sql")
+
+STRING_RE = re.compile(r"\"(?:\\.|[^\"\\])*\"|'(?:\\.|[^'\\])*'|`[^`]*`")
+LINE_COMMENT_RE = re.compile(r"//.*$")
+DEFINITION_RE = re.compile(
+    r"^\s*(?:export\s+)?(?:default\s+)?(?:(?:pub(?:\(\w+\))?|public|private|protected|static|final|abstract|async|override)\s+)*"
+    r"(?:def|class|function\*?|func|fn|interface|struct|enum|trait|impl|type|object)\b"
+    r"|^\s*(?:export\s+)?(?:const|let|var)\s+\w+\s*=\s*(?:async\s*)?(?:\([^)]*\)|\w+)\s*=>"
+    r"|^(?!\s*(?:if|for|while|switch|catch|else|return|do|try)\b)\s*[\w:<>\[\],*&~\s]+?\s[\w:~]+\s*\([^;]*\)\s*(?:const\s*)?(?:throws\s+[\w.,\s]+)?\{?\s*$"
+) # function / class / type definitions, for the outline
+_CLOSERS = ("}", ")", "]")
+_LEADING_TRIVIA = ("#", "//", "/*", "*", "@")
+
+_parse_lock = threading.Lock() if sys.version_info < (3, 12) else contextlib.nullcontext()
+
+def parse_python(code: str) -> ast.Module:
+    # CPython 3.11 keeps the AST converter's recursion depth in shared state:
+    # two threads parsing at once can fail with "AST constructor recursion
+    # depth mismatch". Analysis runs in worker threads and on the loop.
+    with _parse_lock:
+        return ast.parse(code)
+
+class SourceChunk(NamedTuple):
+    start_line: int # 1-based, inclusive
+    end_line: int
+    text: str
+
+class SourcePlan(NamedTuple):
+    chunks: List[SourceChunk]
+    outline: str
+    total_lines: int
+
+# A "level" per line marks where a unit (function, class, block) may start:
+# 0 for top-level starts, 1 for members of a top-level unit, and so on.
+# None means the line never starts a unit (blank, continuation, closer).
+
+def _python_levels(code: str, lines: List[str]) -> Optional[List[Optional[int]]]:
+    try:
+        tree = parse_python(code)
+    except SyntaxError:
+        return None
+    levels: List[Optional[int]] = [None] * len(lines)
+
+    def mark(nodes, depth):
+        for node in nodes:
+            decorators = getattr(node, "decorator_list", [])
+            start = min([node.lineno] + [d.lineno for d in decorators]) - 1
+            if 0 <= start < len(levels) and levels[start] is None:
+                levels[start] = depth
+            if isinstance(node, ast.ClassDef):
+                mark(node.body, depth + 1) # methods are the natural split points of a big class
+
+    mark(tree.body, 0)
+    return levels
+
+def _brace_levels(lines: List[str]) -> List[Optional[int]]:
+    levels: List[Optional[int]] = []
+    depth = 0
+    in_block_comment = False
+    for line in lines:
+        stripped = line.strip()
+        starts_unit = bool(stripped) and not stripped.startswith(_CLOSERS) and not in_block_comment
+        levels.append(depth if starts_unit else None)
+
+        code = LINE_COMMENT_RE.sub("", STRING_RE.sub('""', line))
+        if in_block_comment:
+            end = code.find("*/")
+            if end == -1:
+                continue
+            code = code[end + 2:]
+            in_block_comment = False
+        while "/*" in code:
+            before, _, after = code.partition("/*")
+            end = after.find("*/")
+            if end == -1:
+                code = before
+                in_block_comment = True
+                break
+            code = before + after[end + 2:]
+        depth += sum(code.count(c) for c in "{([") - sum(code.count(c) for c in "})]")
+        depth = max(depth, 0)
+    return levels
+
+def _indent_levels(lines: List[str]) -> List[Optional[int]]:
+    levels: List[Optional[int]] = []
+    for line in lines:
+        stripped = line.lstrip()
+        levels.append(len(line) - len(stripped) if stripped.strip() else None)
+    return levels
+
+def _line_levels(code: str, lines: List[str], file_name: str, parse: bool = True) -> List[Optional[int]]:
+    lower = file_name.lower()
+    if lower.endswith(".py") and parse:
+        levels = _python_levels(code, lines)
+        if levels is not None:
+            return levels
+    if lower.endswith(BRACE_EXTENSIONS):
+        return _brace_levels(lines)
+    return _indent_levels(lines)
+
+def _attach_trivia(lines: List[str], start: int, floor: int) -> int:
+    # comments, decorators and annotations go with the unit below them
+    while start - 1 > floor and lines[start - 1].strip().startswith(_LEADING_TRIVIA):
+        start -= 1
+    return start
+
+def _tokens(lines: List[str], lo: int, hi: int) -> int:
+    return estimate_tokens("".join(lines[lo:hi]))
+
+def _split_lines(lines: List[str], lo: int, hi: int, max_tokens: int) -> List[tuple]:
+    # last resort inside one huge function: cut on blank lines when possible
+    pieces, start, size, last_blank = [], lo, 0, None
+    for index in range(lo, hi):
+        size += estimate_tokens(lines[index])
+        if not lines[index].strip():
+            last_blank = index
+        if size > max_tokens and index > start:
+            cut = last_blank + 1 if last_blank is not None and last_blank > start else index
+            pieces.append((start, cut))
+            start, last_blank = cut, None
+            size = _tokens(lines, start, index + 1)
+    pieces.append((start, hi))
+    return pieces
+
+def _split_range(lines: List[str], levels: List[Optional[int]], lo: int, hi: int, level: int, max_tokens: int) -> List[tuple]:
+    if _tokens(lines, lo, hi) <= max_tokens:
+        return [(lo, hi)]
+    deeper = sorted({levels[i] for i in range(lo + 1, hi) if levels[i] is not None and levels[i] >= level})
+    for candidate in deeper:
+        starts = sorted({_attach_trivia(lines, i, lo) for i in range(lo + 1, hi) if levels[i] == candidate})
+        starts = [start for start in starts if lo < start < hi]
+        if not starts:
+            continue
+        bounds = [lo] + starts + [hi]
+        pieces = []
+        for a, b in zip(bounds, bounds[1:]):
+            pieces.extend(_split_range(lines, levels, a, b, candidate + 1, max_tokens))
+        return pieces
+    return _split_lines(lines, lo, hi, max_tokens)
+
+def _outline(lines: List[str], levels: List[Optional[int]], max_tokens: int) -> str:
+    top = min((level for level in levels if level is not None), default=0)
+    entries = []
+    for depth in (top, top + 1):
+        entries.extend(
+            (index, depth) for index, level in enumerate(levels)
+            if level == depth and DEFINITION_RE.match(lines[index])
+        )
+        if depth == top and estimate_tokens("".join(lines[i] for i, _ in entries)) > max_tokens // 2:
+            break # members only if the top level leaves room
+    outline, budget = [], max_tokens
+    for index, depth in sorted(entries):
+        line = f"L{index + 1}: {'  ' * (depth - top)}{lines[index].strip()[:160]}"
+        budget -= estimate_tokens(line)
+        if budget < 0:
+            outline.append("...")
+            break
+        outline.append(line)
+    return "\n".join(outline)
+
+def plan_source_chunks(code: str, file_name: str = "", max_tokens: int = SOURCE_CHUNK_TOKENS, parse: bool = True) -> SourcePlan:
+    # Splits at function/class boundaries (ast for Python, bracket depth or
+    # indentation otherwise), then packs neighbouring units up to max_tokens.
+    # parse=False trades ast precision for speed when indexing many files.
+    lines = code.splitlines(keepends=True)
+    levels = _line_levels(code, lines, file_name, parse)
+    top = min((level for level in levels if level is not None), default=0)
+    pieces = _split_range(lines, levels, 0, len(lines), top, max_tokens) if lines else []
+
+    chunks: List[SourceChunk] = []
+    lo = hi = None
+    for a, b in pieces:
+        if lo is not None and _tokens(lines, lo, b) <= max_tokens:
+            hi = b
+            continue
+        if lo is not None:
+            chunks.append(SourceChunk(lo + 1, hi, "".join(lines[lo:hi])))
+        lo, hi = a, b
+    if lo is not None:
+        chunks.append(SourceChunk(lo + 1, hi, "".join(lines[lo:hi])))
+    return SourcePlan(chunks, _outline(lines, levels, SOURCE_OUTLINE_TOKENS), len(lines))
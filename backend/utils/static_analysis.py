@@ -0,0 +1,259 @@
+import ast
+import os
+import re
+from typing import List, NamedTuple, Optional, Tuple
+
+from utils.chunking import estimate_tokens
+from utils.source_chunks import DEFINITION_RE, LINE_COMMENT_RE, STRING_RE, parse_python
+
+STATIC_COMPLEXITY_LIMIT = int(os.getenv("STATIC_COMPLEXITY_LIMIT", "10")) # cyclomatic complexity per function
+STATIC_LENGTH_LIMIT = int(os.getenv("STATIC_LENGTH_LIMIT", "60")) # lines per function
+STATIC_NESTING_LIMIT = int(os.getenv("STATIC_NESTING_LIMIT", "4")) # nested blocks per function
+STATIC_SKIP_SCORE = int(os.getenv("STATIC_SKIP_SCORE", "1")) # with skip_clean, files scoring below this skip model review
+STATIC_FOCUS_RATIO = float(os.getenv("STATIC_FOCUS_RATIO", "0.6")) # send only hotspots when they are this much smaller
+
+HEURISTIC_EXTENSIONS = (".js", ".ts", ".tsx", ".jsx", ".java", ".go", ".rs", ".cpp", ".c", ".h", ".hpp", ".cs", ".kt", ".swift", ".php")
+
+_SECRET_RE = re.compile(r"""(?i)\b\w*(?:password|passwd|secret|api_?key|access_?token|private_?key)\w*\s*[:=]\s*["'][^"'\s]{8,}["']""")
+_NAME_RE = re.compile(r"([A-Za-z_$][\w$]*)\s*(?:=\s*(?:async\s*)?)?\(")
+_BRANCH_RE = re.compile(r"\b(?:if|for|while|case|catch)\b|&&|\|\||\?\?")
+_JS_IMPORT_RE = re.compile(r"^\s*import\s+(?:type\s+)?(.+?)\s+from\s+[\"']", re.M)
+_BRACE_SMELLS = (
+    (re.compile(r"\beval\s*\("), "eval() call"),
+    (re.compile(r"\bcatch\s*(?:\([^)]*\))?\s*\{\s*\}"), "empty catch block swallows errors"),
+    (re.compile(r"^\s*debugger\s*;?\s*$"), "debugger statement left in"),
+)
+_MUTABLE_DEFAULTS = (ast.List, ast.Dict, ast.Set, ast.ListComp, ast.DictComp, ast.SetComp)
+_BLOCKS = (ast.If, ast.For, ast.AsyncFor, ast.While, ast.With, ast.AsyncWith, ast.Try)
+
+class FunctionMetrics(NamedTuple):
+    name: str
+    start_line: int
+    end_line: int
+    complexity: int
+    length: int
+    nesting: int
+
+    @property
+    def is_hotspot(self) -> bool:
+        return (
+            self.complexity > STATIC_COMPLEXITY_LIMIT
+            or (self.length > STATIC_LENGTH_LIMIT and self.name != "<module>") # long scripts are not a smell on their own
+            or self.nesting > STATIC_NESTING_LIMIT
+        )
+
+class Finding(NamedTuple):
+    line: int
+    message: str
+
+class StaticReport(NamedTuple):
+    language: str # "python" or "heuristic"; empty when the file type is not analyzed
+    total_lines: int
+    functions: List[FunctionMetrics]
+    unused_imports: List[Finding]
+    smells: List[Finding]
+
+    @property
+    def hotspots(self) -> List[FunctionMetrics]:
+        return [function for function in self.functions if function.is_hotspot]
+
+    @property
+    def score(self) -> int:
+        moderate = sum(1 for f in self.functions if not f.is_hotspot and f.complexity > STATIC_COMPLEXITY_LIMIT // 2)
+        return 3 * len(self.hotspots) + 2 * len(self.smells) + len(self.unused_imports) + moderate
+
+    @property
+    def needs_review(self) -> bool:
+        # unknown file types always go to the model
+        return not self.language or self.score >= STATIC_SKIP_SCORE
+
+# --- Python, via ast ---
+
+def _complexity(node: ast.AST) -> int:
+    # 1 + decision points, not descending into nested functions or classes
+    count = 1
+    stack = list(ast.iter_child_nodes(node))
+    while stack:
+        child = stack.pop()
+        if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda)):
+            continue
+        if isinstance(child, (ast.If, ast.For, ast.AsyncFor, ast.While, ast.IfExp, ast.ExceptHandler, ast.Assert)):
+            count += 1
+        elif isinstance(child, ast.BoolOp):
+            count += len(child.values) - 1
+        elif isinstance(child, ast.comprehension):
+            count += 1 + len(child.ifs)
+        elif isinstance(child, ast.match_case):
+            count += 1
+        stack.extend(ast.iter_child_nodes(child))
+    return count
+
+def _nesting(statements, depth: int = 0) -> int:
+    deepest = depth
+    for statement in statements:
+        if isinstance(statement, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            continue
+        inner = depth + 1 if isinstance(statement, _BLOCKS) else depth
+        for field in ("body", "orelse", "finalbody"):
+            body = getattr(statement, field, [])
+            elif_chain = field == "orelse" and len(body) == 1 and isinstance(body[0], ast.If) and isinstance(statement, ast.If)
+            deepest = max(deepest, _nesting(body, depth if elif_chain else inner))
+        for handler in getattr(statement, "handlers", []):
+            deepest = max(deepest, _nesting(handler.body, inner))
+    return deepest
+
+def _python_smells(tree: ast.AST) -> List[Finding]:
+    smells = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ExceptHandler):
+            if node.type is None:
+                smells.append(Finding(node.lineno, "bare except catches everything, including KeyboardInterrupt"))
+            elif len(node.body) == 1 and isinstance(node.body[0], ast.Pass):
+                smells.append(Finding(node.lineno, "exception silently swallowed"))
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            if any(isinstance(default, _MUTABLE_DEFAULTS) for default in node.args.defaults + node.args.kw_defaults):
+                smells.append(Finding(node.lineno, f"mutable default argument in {node.name}()"))
+            params = len(node.args.args) + len(node.args.posonlyargs) + len(node.args.kwonlyargs)
+            if params > 6:
+                smells.append(Finding(node.lineno, f"{node.name}() takes {params} parameters"))
+        elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in ("eval", "exec"):
+            smells.append(Finding(node.lineno, f"{node.func.id}() call"))
+        elif isinstance(node, ast.Global):
+            smells.append(Finding(node.lineno, f"global statement ({', '.join(node.names)})"))
+    return smells
+
+def _python_unused_imports(tree: ast.Module, file_name: str) -> List[Finding]:
+    if os.path.basename(file_name) == "__init__.py":
+        return [] # imports there are re-exports
+    imported = {}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                imported.setdefault((alias.asname or alias.name).split(".")[0], node.lineno)
+        elif isinstance(node, ast.ImportFrom) and node.module != "__future__":
+            for alias in node.names:
+                if alias.name != "*":
+                    imported.setdefault(alias.asname or alias.name, node.lineno)
+
+    used = {node.id for node in ast.walk(tree) if isinstance(node, ast.Name)}
+    for node in ast.walk(tree): # names listed in __all__ count as used
+        if isinstance(node, ast.Assign) and any(isinstance(t, ast.Name) and t.id == "__all__" for t in node.targets):
+            used.update(c.value for c in ast.walk(node.value) if isinstance(c, ast.Constant) and isinstance(c.value, str))
+    return [Finding(line, f"unused import {name}") for name, line in sorted(imported.items(), key=lambda item: item[1]) if name not in used]
+
+def _analyze_python(code: str, lines: List[str], file_name: str) -> StaticReport:
+    try:
+        tree = parse_python(code)
+    except SyntaxError as e:
+        return StaticReport("python", len(lines), [], [], [Finding(e.lineno or 0, f"syntax error: {e.msg}")])
+
+    functions = []
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            end = node.end_lineno or node.lineno
+            functions.append(FunctionMetrics(
+                node.name, node.lineno, end, _complexity(node), end - node.lineno + 1, _nesting(node.body),
+            ))
+    top_level = [statement for statement in tree.body if not isinstance(statement, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))]
+    if top_level: # scripts keep their logic at module level
+        module = ast.Module(body=top_level, type_ignores=[])
+        functions.append(FunctionMetrics(
+            "<module>", top_level[0].lineno, top_level[-1].end_lineno or top_level[-1].lineno,
+            _complexity(module), sum((s.end_lineno or s.lineno) - s.lineno + 1 for s in top_level), _nesting(top_level),
+        ))
+
+    smells = _python_smells(tree)
+    smells += [Finding(index + 1, "hard-coded credential") for index, line in enumerate(lines) if _SECRET_RE.search(line)]
+    functions.sort(key=lambda function: function.start_line)
+    return StaticReport("python", len(lines), functions, _python_unused_imports(tree, file_name), sorted(smells))
+
+# --- other languages, via brace heuristics ---
+
+def _analyze_braces(code: str, lines: List[str]) -> StaticReport:
+    cleaned = [LINE_COMMENT_RE.sub("", STRING_RE.sub('""', line)) for line in lines]
+    functions, open_functions, smells = [], [], []
+    depth = 0
+    for index, line in enumerate(cleaned):
+        if DEFINITION_RE.match(lines[index]) and "(" in line:
+            name = _NAME_RE.search(line)
+            open_functions.append([name.group(1) if name else lines[index].strip()[:60], index, depth, 0, False]) # name, start, base depth, max depth, opened
+        depth += line.count("{") - line.count("}")
+        for function in open_functions:
+            function[3] = max(function[3], depth)
+            function[4] = function[4] or depth > function[2]
+        while open_functions and (
+            (open_functions[-1][4] and depth <= open_functions[-1][2])
+            or (not open_functions[-1][4] and line.rstrip().endswith(";")) # a declaration, not a body
+        ):
+            name, start, base, deepest, opened = open_functions.pop()
+            if opened:
+                body = cleaned[start:index + 1]
+                complexity = 1 + sum(len(_BRANCH_RE.findall(part)) for part in body)
+                functions.append(FunctionMetrics(name, start + 1, index + 1, complexity, index - start + 1, max(0, deepest - base - 1)))
+
+        for pattern, message in _BRACE_SMELLS:
+            if pattern.search(line):
+                smells.append(Finding(index + 1, message))
+        if _SECRET_RE.search(lines[index]):
+            smells.append(Finding(index + 1, "hard-coded credential"))
+
+    unused = []
+    for match in _JS_IMPORT_RE.finditer(code):
+        clause = match.group(1).replace("{", ",").replace("}", ",")
+        names = [part.split()[-1] for part in clause.split(",") if part.strip()] # local name, after any "as"
+        line = code.count("\n", 0, match.start()) + 1
+        rest = code[:match.start()] + code[match.end():]
+        for name in names:
+            if not re.search(rf"(?<![\w$]){re.escape(name)}(?![\w$])", rest):
+                unused.append(Finding(line, f"unused import {name}"))
+    functions.sort(key=lambda function: function.start_line)
+    return StaticReport("heuristic", len(lines), functions, unused, smells)
+
+def analyze_source(code: str, file_name: str = "") -> StaticReport:
+    lines = code.splitlines()
+    lower = file_name.lower()
+    if lower.endswith(".py"):
+        return _analyze_python(code, lines, file_name)
+    if lower.endswith(HEURISTIC_EXTENSIONS):
+        return _analyze_braces(code, lines)
+    return StaticReport("", len(lines), [], [], [])
+
+def summarize_report(report: StaticReport) -> str:
+    # compact, model-friendly metrics; also the "parsed summary" of the file
+    if not report.language:
+        return f"{report.total_lines} lines; no static analysis for this file type."
+    complexities = [function.complexity for function in report.functions]
+    lines = [
+        f"{report.total_lines} lines, {len(report.functions)} functions, "
+        f"max complexity {max(complexities, default=0)}, "
+        f"max nesting {max((f.nesting for f in report.functions), default=0)}, "
+        f"score {report.score} (model review from {STATIC_SKIP_SCORE})."
+    ]
+    for function in report.hotspots:
+        lines.append(
+            f"Hotspot {function.name} L{function.start_line}-{function.end_line}: "
+            f"complexity {function.complexity}, {function.length} lines, nesting {function.nesting}"
+        )
+    lines += [f"L{finding.line}: {finding.message}" for finding in report.smells + report.unused_imports]
+    return "\n".join(lines)
+
+def focused_source(code: str, report: StaticReport) -> Optional[str]:
+    # hotspot functions and smell sites only, labelled with file line numbers;
+    # None when the excerpt would not be meaningfully smaller than the file
+    if not report.language or not (report.hotspots or report.smells):
+        return None
+    ranges: List[Tuple[int, int]] = [(f.start_line, f.end_line) for f in report.hotspots if f.name != "<module>"]
+    ranges += [(max(1, finding.line - 2), finding.line + 2) for finding in report.smells]
+    merged: List[List[int]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+
+    lines = code.splitlines(keepends=True)
+    parts = [f"L{start}-{min(end, len(lines))}:\n" + "".join(lines[start - 1:end]) for start, end in merged]
+    excerpt = "\n".join(part if part.endswith("\n") else part + "\n" for part in parts)
+    if estimate_tokens(excerpt) > STATIC_FOCUS_RATIO * estimate_tokens(code):
+        return None
+    return excerpt
@@ -0,0 +1,138 @@
+import asyncio
+import contextlib
+import json
+import os
+import zlib
+from typing import AsyncGenerator, AsyncIterator, Dict, List, Optional, Union
+
+STREAM_FRAME_SECONDS = float(os.getenv("STREAM_FRAME_MS", "40")) / 1000 # max time a token waits in a frame
+STREAM_FRAME_BYTES = int(os.getenv("STREAM_FRAME_BYTES", "8192")) # flush earlier once a frame gets this big
+STREAM_GZIP_LEVEL = int(os.getenv("STREAM_GZIP_LEVEL", "6"))
+
+FRAMING_TOKEN = "token" # one NDJSON line per model token (legacy)
+FRAMING_FRAME = "frame" # coalesced frames, gzip when accepted
+FRAMING_MODES = (FRAMING_TOKEN, FRAMING_FRAME)
+
+_END = object()
+
+def is_token_event(event: dict) -> bool:
+    # {"type": <stage or action>, "content": <text>} and nothing else
+    return len(event) == 2 and isinstance(event.get("content"), str) and "type" in event
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        if coding.strip().lower() in ("gzip", "*"):
+            return params.replace(" ", "").lower() not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+async def coalesce_events(
+    events: AsyncIterator[dict],
+    window: float = STREAM_FRAME_SECONDS,
+    max_bytes: int = STREAM_FRAME_BYTES,
+) -> AsyncGenerator[dict, None]:
+    # Token events are merged per type until the window expires or the frame
+    # is big enough; any other event flushes what is pending and passes
+    # through, so per-stage ordering is preserved.
+    queue: asyncio.Queue = asyncio.Queue(maxsize=1024)
+
+    async def pump():
+        try:
+            async for event in events:
+                await queue.put(event)
+            await queue.put(_END)
+        except Exception as e:
+            await queue.put(e)
+
+    loop = asyncio.get_running_loop()
+    pump_task = asyncio.create_task(pump())
+    getter: Optional[asyncio.Future] = None
+    pending: Dict[str, List[str]] = {} # type -> parts, in first-seen order
+    pending_bytes = 0
+    deadline: Optional[float] = None
+
+    def flush() -> List[dict]:
+        nonlocal pending, pending_bytes, deadline
+        frames = [{"type": kind, "content": "".join(parts)} for kind, parts in pending.items()]
+        pending, pending_bytes, deadline = {}, 0, None
+        return frames
+
+    try:
+        while True:
+            if getter is None:
+                getter = asyncio.ensure_future(queue.get()) # kept across timeouts, so no event is lost
+            timeout = None if deadline is None else max(0.0, deadline - loop.time())
+            done, _ = await asyncio.wait({getter}, timeout=timeout)
+            if not done:
+                for frame in flush():
+                    yield frame
+                continue
+
+            item, getter = getter.result(), None
+            if isinstance(item, Exception):
+                for frame in flush():
+                    yield frame
+                raise item
+            if item is _END:
+                break
+            if is_token_event(item):
+                pending.setdefault(item["type"], []).append(item["content"])
+                pending_bytes += len(item["content"])
+                if deadline is None:
+                    deadline = loop.time() + window
+                if pending_bytes >= max_bytes:
+                    for frame in flush():
+                        yield frame
+                continue
+
+            for frame in flush():
+                yield frame
+            yield item
+
+        for frame in flush():
+            yield frame
+    finally:
+        if getter is not None:
+            getter.cancel()
+        pump_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError, Exception):
+            await pump_task
+        if hasattr(events, "aclose"):
+            await events.aclose() # cancels the pipeline's in-flight model calls
+
+async def frame_events(events: AsyncIterator[dict], framing: str) -> AsyncGenerator[dict, None]:
+    if framing == FRAMING_FRAME:
+        async with contextlib.aclosing(coalesce_events(events)) as frames:
+            async for frame in frames:
+                yield frame
+        return
+    try:
+        async for event in events:
+            yield event
+    finally:
+        if hasattr(events, "aclose"):
+            await events.aclose()
+
+class StreamEncoder:
+    # Serializes events to NDJSON. In frame mode the body is one gzip stream
+    # (when the client accepts it), flushed after every frame so nothing
+    # sits in the compressor.
+    def __init__(self, framing: str = FRAMING_TOKEN, accept_encoding: Optional[str] = None):
+        self.compressor = None
+        if framing == FRAMING_FRAME and accepts_gzip(accept_encoding):
+            self.compressor = zlib.compressobj(STREAM_GZIP_LEVEL, zlib.DEFLATED, 31) # 31 = gzip container
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        if self.compressor is None:
+            return {}
+        return {"Content-Encoding": "gzip", "Vary": "Accept-Encoding"}
+
+    def encode(self, event: dict) -> Union[str, bytes]:
+        line = json.dumps(event, ensure_ascii=False) + "\n"
+        if self.compressor is None:
+            return line
+        return self.compressor.compress(line.encode("utf-8")) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self.compressor.flush() if self.compressor is not None else b""
@@ -9,6 +9,8 @@ const TAB_IDS = [
   "DOCUMENTATION",
 ];
 
+const MAX_STREAM_RESUMES = 3;
+
 const EMPTY_RESULTS = {
   PROJECT_REVIEW: { review_report: "" },
   PROJECT_EXPLAIN: { project_explanation: "" },
@@ -45,6 +47,7 @@ export default function ProjectAgent() {
   const timersRef = useRef(createPerTabStore(() => null));
   const controllersRef = useRef(createPerTabStore(() => null));
   const runIdsRef = useRef(createPerTabStore(() => 0));
+  const jobIdsRef = useRef(createPerTabStore(() => null));
 
   function getStreamConfig(tab) {
     return {
@@ -115,6 +118,31 @@ export default function ProjectAgent() {
     timersRef.current[tab] = setTimeout(flush, randomBetween(40, 80));
   }
 
+  function discardStreamed(tab, count) {
+    // the server escalated to a larger model: drop the attempt it replaces
+    const config = getStreamConfig(tab);
+    const queue = queuesRef.current[tab];
+    if (!config || !count) return;
+
+    const fromQueue = Math.min(count, queue.length);
+    queue.splice(queue.length - fromQueue, fromQueue);
+
+    const rest = count - fromQueue;
+    if (rest > 0) {
+      setResults((prev) => {
+        const current = prev[tab] || EMPTY_RESULTS[tab];
+        const chars = Array.from(current[config.key] || "");
+        return {
+          ...prev,
+          [tab]: {
+            ...current,
+            [config.key]: chars.slice(0, Math.max(0, chars.length - rest)).join(""),
+          },
+        };
+      });
+    }
+  }
+
   function stopFlusher(tab) {
     if (timersRef.current[tab]) {
       clearTimeout(timersRef.current[tab]);
@@ -154,6 +182,7 @@ export default function ProjectAgent() {
     abortTabRequest(tab);
     stopFlusher(tab);
     queuesRef.current[tab] = [];
+    jobIdsRef.current[tab] = null;
     setResults((prev) => ({
       ...prev,
       [tab]: { ...EMPTY_RESULTS[tab] },
@@ -167,18 +196,42 @@ export default function ProjectAgent() {
     const controller = new AbortController();
     controllersRef.current[tab] = controller;
 
-    try {
-      const response = await fetch(
-        "http://localhost:8000/project-review-stream",
-        {
-          method: "POST",
-          body: form,
-          signal: controller.signal,
-        }
-      );
+    let lastSeq = -1;
+    let resumes = 0;
+
+    function handleLine(line) {
+      if (!line.trim()) return;
+
+      const data = JSON.parse(line);
+      if (typeof data.seq === "number") {
+        lastSeq = data.seq;
+      }
+
+      if (data.type === "job") {
+        jobIdsRef.current[tab] = data.job_id;
+      }
+
+      if (data.type === tab && typeof data.content === "string") {
+        queuesRef.current[tab].push(...Array.from(data.content));
+        scheduleFlush(tab);
+      }
+
+      if (data.type === "escalate" && data.stage === tab) {
+        discardStreamed(tab, data.discard);
+      }
 
+      if (data.type === "error") {
+        const streamError = new Error(data.message || "Streaming error");
+        streamError.fromServer = true;
+        throw streamError;
+      }
+    }
+
+    async function readStream(response) {
       if (!response.ok || !response.body) {
-        throw new Error("Streaming request failed");
+        const requestError = new Error("Streaming request failed");
+        requestError.fromServer = true;
+        throw requestError;
       }
 
       const reader = response.body.getReader();
@@ -191,34 +244,44 @@ export default function ProjectAgent() {
 
         if (runIdsRef.current[tab] !== currentRunId) {
           await reader.cancel().catch(() => {});
-          return;
+          return false;
         }
 
         buffer += decoder.decode(value, { stream: true });
         const lines = buffer.split("\n");
         buffer = lines.pop() || "";
+        lines.forEach(handleLine);
+      }
 
-        for (const line of lines) {
-          if (!line.trim()) continue;
-
-          const data = JSON.parse(line);
-
-          if (data.type === tab && typeof data.content === "string") {
-            queuesRef.current[tab].push(...data.content.split(""));
-            scheduleFlush(tab);
-          }
+      handleLine(buffer);
+      return true;
+    }
 
-          if (data.type === "error") {
-            throw new Error(data.message || "Streaming error");
-          }
+    try {
+      let response = await fetch(
+        "http://localhost:8000/project-review-stream?framing=frame",
+        {
+          method: "POST",
+          body: form,
+          signal: controller.signal,
         }
-      }
+      );
 
-      if (buffer.trim()) {
-        const data = JSON.parse(buffer);
-        if (data.type === tab && typeof data.content === "string") {
-          queuesRef.current[tab].push(...data.content.split(""));
-          scheduleFlush(tab);
+      while (true) {
+        try {
+          if (!(await readStream(response))) return;
+          break;
+        } catch (error) {
+          const jobId = jobIdsRef.current[tab];
+          if (error.name === "AbortError" || error.fromServer || !jobId || resumes >= MAX_STREAM_RESUMES) {
+            throw error;
+          }
+          // network blip: the run keeps going server-side, pick up after the last event we saw
+          resumes += 1;
+          response = await fetch(
+            `http://localhost:8000/runs/${jobId}/events?after=${lastSeq}`,
+            { signal: controller.signal }
+          );
         }
       }
 
@@ -259,6 +322,9 @@ export default function ProjectAgent() {
     const form = new FormData();
     form.append("file", file);
     form.append("action", activeTab);
+    if (jobIdsRef.current[activeTab]) {
+      form.append("job_id", jobIdsRef.current[activeTab]);
+    }
 
     try {
       const res = await axios.post(
@@ -13,6 +13,7 @@ export default function SingleFile() {
   const reviewTimerRef = useRef(null);
   const testTimerRef = useRef(null);
   const refactorTimerRef = useRef(null);
+  const jobIdRef = useRef(null);
 
   function startFlusher(type) {
     const refMap = {
@@ -55,6 +56,28 @@ export default function SingleFile() {
     }, target.speed);
   }
 
+  function discardStreamed(type, count) {
+    // the server escalated to a larger model: drop the attempt it replaces
+    const targets = {
+      review: [reviewQueueRef, "review_code"],
+      test: [testQueueRef, "test_report"],
+      refactor: [refactorQueueRef, "refactored_code"],
+    };
+    if (!targets[type] || !count) return;
+
+    const [queueRef, key] = targets[type];
+    const fromQueue = Math.min(count, queueRef.current.length);
+    queueRef.current.splice(queueRef.current.length - fromQueue, fromQueue);
+
+    const rest = count - fromQueue;
+    if (rest > 0) {
+      setResult((prev) => {
+        const chars = Array.from(prev[key]);
+        return { ...prev, [key]: chars.slice(0, Math.max(0, chars.length - rest)).join("") };
+      });
+    }
+  }
+
   function stopAllFlushers() {
     [reviewTimerRef, testTimerRef, refactorTimerRef].forEach((timerRef) => {
       if (timerRef.current) {
@@ -77,6 +100,7 @@ export default function SingleFile() {
     reviewQueueRef.current = [];
     testQueueRef.current = [];
     refactorQueueRef.current = [];
+    jobIdRef.current = null;
 
     setResult({
       review_code: "",
@@ -89,7 +113,7 @@ export default function SingleFile() {
 
     try {
       const response = await fetch(
-        "http://localhost:8000/single-review-stream",
+        "http://localhost:8000/single-review-stream?framing=frame",
         {
           method: "POST",
           body: form,
@@ -119,6 +143,10 @@ export default function SingleFile() {
 
           const data = JSON.parse(line);
 
+          if (data.type === "job") {
+            jobIdRef.current = data.job_id;
+          }
+
           if (data.type === "review") {
             for (const char of data.content) {
               reviewQueueRef.current.push(char);
@@ -140,6 +168,10 @@ export default function SingleFile() {
             startFlusher("refactor");
           }
 
+          if (data.type === "escalate") {
+            discardStreamed(data.stage, data.discard);
+          }
+
           if (data.type === "error") {
             throw new Error(data.message || "Streaming error");
           }
@@ -179,6 +211,9 @@ export default function SingleFile() {
 
     const form = new FormData();
     form.append("file", file);
+    if (jobIdRef.current) {
+      form.append("job_id", jobIdRef.current);
+    }
 
     try {
       const res = await axios.post(